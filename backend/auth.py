@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import RedirectResponse
 from authlib.integrations.starlette_client import OAuth
 from starlette.requests import Request
-from db import users_collection
+from user_store import users
 from models import UserSignup, UserLogin, TokenData
-from utils import create_access_token, hash_password, verify_password
+from utils import create_access_token, hash_password_async, verify_password_async, PasswordHasherBusy
+from metrics import timed_db
 import os
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -19,13 +20,20 @@ oauth.register(
     client_kwargs={"scope": "openid email profile"},
 )
 
+def _busy():
+    return HTTPException(status_code=429, detail="Too many login attempts, retry shortly",
+                         headers={"Retry-After": "1"})
+
 # Signup (Email + Password)
 @router.post("/signup", response_model=TokenData)
-def signup(user: UserSignup):
-    if users_collection.find_one({"email": user.email}):
+async def signup(user: UserSignup):
+    if await timed_db("users.find_by_email", users.find_by_email(user.email, {"_id": 1})):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_pw = hash_password(user.password)
+    try:
+        hashed_pw = await hash_password_async(user.password)
+    except PasswordHasherBusy:
+        raise _busy()
     new_user = {
         "firstName": user.firstName,
         "lastName": user.lastName,
@@ -33,17 +41,25 @@ def signup(user: UserSignup):
         "password": hashed_pw,
         "role": user.role,
     }
-    users_collection.insert_one(new_user)
+    # The unique email index settles concurrent signups for the same address
+    if not await timed_db("users.insert", users.insert(new_user)):
+        raise HTTPException(status_code=400, detail="Email already registered")
 
     token = create_access_token({"sub": user.email, "role": user.role})
     return {"access_token": token}
 
 # Login (Email + Password)
 @router.post("/login", response_model=TokenData)
-def login(user: UserLogin):
-    db_user = users_collection.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+async def login(user: UserLogin):
+    db_user = await timed_db("users.find_by_email",
+                             users.find_by_email(user.email, {"email": 1, "password": 1, "role": 1}))
+    if not db_user or "password" not in db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        if not await verify_password_async(user.password, db_user["password"]):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+    except PasswordHasherBusy:
+        raise _busy()
 
     if db_user["role"] != user.role:
         raise HTTPException(status_code=403, detail="Role mismatch")
@@ -70,7 +86,7 @@ async def google_callback(request: Request):
     name = user_info["name"]
     picture = user_info.get("picture", "")
 
-    db_user = users_collection.find_one({"email": email})
+    db_user = await timed_db("users.find_by_email", users.find_by_email(email, {"role": 1}))
     if not db_user:
         db_user = {
             "email": email,
@@ -78,7 +94,8 @@ async def google_callback(request: Request):
             "avatar": picture,
             "role": "user",  # default role
         }
-        users_collection.insert_one(db_user)
+        if not await timed_db("users.insert", users.insert(db_user)):  # lost a race with another first login
+            db_user = await timed_db("users.find_by_email", users.find_by_email(email, {"role": 1}))
 
     jwt_token = create_access_token({"sub": email, "role": db_user["role"]})
     response = RedirectResponse(url=f"{os.getenv('FRONTEND_URL')}/?token={jwt_token}")
@@ -0,0 +1,83 @@
+"""Latency and throughput of concurrent /analyze calls with and without the micro-batcher.
+
+    python benchmarks/bench_analyze_batching.py --clients 32 --requests 2000 --products 200
+
+Drives the same path as POST /analyze (InferenceExecutor, plus MicroBatcher
+when on) from `--clients` concurrent callers. The result cache is disabled
+unless --cache is given, so every request that isn't coalesced is computed.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from inference_pool import InferenceExecutor  # noqa: E402
+from main1 import ProductOptimizer  # noqa: E402
+from micro_batcher import ANALYZE_BATCH_MAX, ANALYZE_BATCH_WINDOW_MS, MicroBatcher  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+
+
+async def drive(call, product_ids, clients, requests):
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client():
+        for _ in remaining:
+            product_id = random.choice(product_ids)
+            start = time.perf_counter()
+            await call(product_id)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "mode": name,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+async def main(args):
+    optimizer = ProductOptimizer()
+    if not args.cache:
+        optimizer.result_cache = ResultCache(maxsize=0)
+    inference = InferenceExecutor(optimizer, backend="thread")
+    inference.start()
+    product_ids = optimizer.feature_store.sorted_ids[:args.products].tolist()
+
+    await drive(lambda pid: inference.submit("run", pid), product_ids, args.clients, args.clients)  # warm-up
+    off = summarize("batcher off", *await drive(
+        lambda pid: inference.submit("run", pid), product_ids, args.clients, args.requests))
+
+    batcher = MicroBatcher(lambda ids: inference.submit("run_many", ids), args.window_ms, args.max_batch)
+    on = summarize("batcher on", *await drive(batcher.submit, product_ids, args.clients, args.requests))
+    on["batcher"] = batcher.stats()
+
+    for row in (off, on):
+        print(row)
+    print(f"throughput: {on['throughput_rps'] / off['throughput_rps']:.2f}x")
+    inference.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=200, help="distinct product ids to draw from")
+    parser.add_argument("--window-ms", type=float, default=ANALYZE_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=ANALYZE_BATCH_MAX)
+    parser.add_argument("--cache", action="store_true", help="keep the result cache enabled")
+    asyncio.run(main(parser.parse_args()))
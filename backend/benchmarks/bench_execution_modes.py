@@ -0,0 +1,63 @@
+"""Compare the LangGraph runtime (self.app.invoke) with the fused agent chain.
+
+    python benchmarks/bench_execution_modes.py --repeat 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from main1 import ProductOptimizer  # noqa: E402
+
+
+def time_calls(fn, product_ids, repeat):
+    samples = []
+    for _ in range(repeat):
+        for product_id in product_ids:
+            start = time.perf_counter()
+            fn({"product_id": product_id})
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    return {
+        "mode": name,
+        "calls": len(samples),
+        "mean_us": round(statistics.fmean(samples) * 1e6, 1),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 1),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--products", type=int, default=10, help="number of distinct product ids")
+    args = parser.parse_args()
+
+    optimizer = ProductOptimizer()
+    product_ids = optimizer.super_dataset["Product_ID"].drop_duplicates().tolist()[:args.products]
+
+    # Both modes must agree before their timings mean anything
+    for product_id in product_ids:
+        state = {"product_id": product_id}
+        assert optimizer.app.invoke(dict(state)) == optimizer.invoke_fused(dict(state)), product_id
+
+    time_calls(optimizer.app.invoke, product_ids, 1)  # warm-up
+    graph = summarize("graph", time_calls(optimizer.app.invoke, product_ids, args.repeat))
+    fused = summarize("fused", time_calls(optimizer.invoke_fused, product_ids, args.repeat))
+
+    for row in (graph, fused):
+        print(row)
+    print(f"speedup (mean): {graph['mean_us'] / fused['mean_us']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Broadcast to thousands of mock WebSockets on one workflow.
+
+    python benchmarks/bench_ws_fanout.py --clients 5000 --messages 50 --slow 10
+
+Compares the old sequential broadcaster (json.dumps and await send_text per
+connection) with ConnectionManager's per-connection outboxes. A few clients
+are slow (--slow-delay seconds per send) to show that they no longer hold
+up everyone else.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from multi_agent.websocket import ConnectionManager  # noqa: E402
+
+
+class MockSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = 0
+        self.last_at = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        self.last_at = time.perf_counter()
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_sockets(clients, slow, slow_delay):
+    return [MockSocket(slow_delay if i < slow else 0.0) for i in range(clients)]
+
+
+def message(i):
+    return {"type": "task_completed", "task_id": str(i), "result": {"status": "success", "n": i}}
+
+
+async def sequential(sockets, messages):
+    """The previous ConnectionManager.send_to_workflow loop."""
+    start = time.perf_counter()
+    for i in range(messages):
+        for socket in sockets:
+            await socket.send_text(json.dumps(message(i)))
+    return time.perf_counter() - start
+
+
+async def fanout(sockets, messages):
+    manager = ConnectionManager()
+    for socket in sockets:
+        await manager.connect(socket, "bench")
+    start = time.perf_counter()
+    for i in range(messages):
+        await manager.send_to_workflow("bench", message(i))
+    publish = time.perf_counter() - start
+
+    fast = [s for s in sockets if not s.delay]
+    # +1 for the welcome message; clients cut off by the slow-consumer policy stop early
+    while any(s.received < messages + 1 and s in manager._outboxes for s in fast):
+        await asyncio.sleep(0.001)
+    delivered = max((s.last_at for s in fast if s.last_at), default=start) - start
+    stats = manager.stats()
+    for socket in sockets:
+        manager.disconnect(socket, "bench")
+    return publish, delivered, stats
+
+
+async def main(args):
+    messages = args.messages
+    if args.clients * messages <= args.sequential_limit:
+        elapsed = await sequential(make_sockets(args.clients, args.slow, args.slow_delay), messages)
+        print(f"sequential: {elapsed:.3f}s for {messages} messages "
+              f"({elapsed / messages * 1000:.2f} ms per broadcast)")
+    else:
+        print("sequential: skipped (raise --sequential-limit to run it)")
+
+    publish, delivered, stats = await fanout(make_sockets(args.clients, args.slow, args.slow_delay), messages)
+    print(f"fan-out:    publish {publish * 1000:.1f} ms total "
+          f"({publish / messages * 1000:.3f} ms per broadcast), "
+          f"all fast clients done after {delivered:.3f}s")
+    print(f"            {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--slow", type=int, default=10, help="number of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.05)
+    parser.add_argument("--sequential-limit", type=int, default=1_000_000,
+                        help="skip the sequential baseline above clients*messages")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,368 @@
+"""Offline benchmark suite for the backend, with JSON results to compare across commits.
+
+    python benchmarks/suite.py run --products 5000 --out results/$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py compare results/old.json results/new.json
+
+Generates a synthetic dataset and stand-in models (see synthetic.py) in a
+scratch directory and runs every scenario against them:
+
+    cold_start    ProductOptimizer() in a fresh interpreter, Arrow cache cold and warm
+    run_single    ProductOptimizer.run, one product at a time
+    run_batch     ProductOptimizer.run_many at a few batch sizes
+    agent_nodes   each LangGraph node on its own
+    http_analyze  POST /analyze over real HTTP from concurrent clients
+    auth_login    POST /auth/login throughput (bcrypt-bound)
+    ws_fanout     ConnectionManager broadcast to thousands of mock sockets
+
+MongoDB is replaced by mongomock-motor (pip install -r
+benchmarks/requirements.txt), so nothing outside the process is needed.
+The result cache is off unless --cache is given, so repeated products are
+recomputed.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+SCENARIOS = ["cold_start", "run_single", "run_batch", "agent_nodes", "http_analyze", "auth_login", "ws_fanout"]
+
+
+# ---------- helpers ----------
+def latency_summary(samples, elapsed=None) -> dict:
+    samples = sorted(samples)
+    summary = {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(samples) / elapsed, 1)
+    return summary
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.check_output(["git", *args], cwd=BACKEND_DIR, text=True,
+                                           stderr=subprocess.DEVNULL).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ---------- scenarios ----------
+def bench_cold_start(ctx):
+    code = ("import sys, time; t = time.perf_counter(); sys.path.insert(0, %r); "
+            "from main1 import ProductOptimizer; ProductOptimizer(); print(time.perf_counter() - t)") % BACKEND_DIR
+    cache_dir = os.path.join(ctx["workspace"], ".dataset_cache")
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+
+    def once():
+        out = subprocess.check_output([sys.executable, "-c", code], cwd=ctx["workspace"], text=True,
+                                      stderr=subprocess.DEVNULL)
+        return round(float(out.strip().splitlines()[-1]), 3)
+
+    return {"cold_cache_s": once(), "warm_cache_s": min(once() for _ in range(ctx["repeat_cold"]))}
+
+
+def bench_run_single(ctx):
+    optimizer, ids = ctx["optimizer"], ctx["sample_ids"]
+    timed(optimizer.run, [(pid,) for pid in ids[:20]])  # warm-up
+    start = time.perf_counter()
+    samples = timed(optimizer.run, [(pid,) for pid in ids])
+    return latency_summary(samples, time.perf_counter() - start)
+
+
+def bench_run_batch(ctx):
+    optimizer, all_ids = ctx["optimizer"], ctx["all_ids"]
+    results = {}
+    for size in ctx["batch_sizes"]:
+        if size > len(all_ids):
+            continue
+        batches = [(random.sample(all_ids, size),) for _ in range(ctx["batch_repeat"])]
+        samples = timed(optimizer.run_many, batches)
+        summary = latency_summary(samples)
+        summary["per_product_us"] = round(statistics.fmean(samples) / size * 1e6, 2)
+        results[str(size)] = summary
+    return results
+
+
+def bench_agent_nodes(ctx):
+    optimizer, ids = ctx["optimizer"], ctx["sample_ids"]
+    nodes = [
+        ("fetch_product_features", optimizer.fetch_product_features),
+        ("demand_forecasting_agent", optimizer.demand_forecasting_agent),
+        ("price_optimization_agent", optimizer.price_optimization_agent),
+        ("inventory_management_agent", optimizer.inventory_management_agent),
+        ("final_summary_agent", optimizer.final_summary_agent),
+    ]
+    # Each node is timed on the state the previous nodes actually produce
+    states = [{"product_id": pid} for pid in ids]
+    results = {}
+    for name, node in nodes:
+        samples, next_states = [], []
+        for state in states:
+            start = time.perf_counter()
+            out = node(dict(state))
+            samples.append(time.perf_counter() - start)
+            next_states.append(out)
+        results[name] = latency_summary(samples)
+        states = next_states
+    return results
+
+
+async def _http_load(url, make_request, clients, requests):
+    import httpx
+
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                method, path, body = make_request()
+                start = time.perf_counter()
+                response = await client.request(method, path, json=body)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies, elapsed)
+    summary["errors"] = errors
+    summary["clients"] = clients
+    return summary
+
+
+class AppServer:
+    """main.app under uvicorn in a background thread, on an in-memory Mongo."""
+
+    def __init__(self):
+        import uvicorn
+        from mongomock_motor import AsyncMongoMockClient
+
+        from database import mongo
+        import main
+
+        mongo.client = AsyncMongoMockClient()  # mongo.connect() reuses an existing client
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=self.port,
+                                                    log_level="warning", lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        import httpx
+
+        self.thread.start()
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(self.url + "/health").json().get("models_loaded"):
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError("backend did not become ready")
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+def bench_http_analyze(ctx):
+    ids = ctx["all_ids"]
+    with AppServer() as app:
+        make = lambda: ("POST", "/analyze", {"product_id": random.choice(ids)})  # noqa: E731
+        asyncio.run(_http_load(app.url, make, ctx["clients"], ctx["clients"]))  # warm-up
+        return asyncio.run(_http_load(app.url, make, ctx["clients"], ctx["http_requests"]))
+
+
+def bench_auth_login(ctx):
+    user = {"firstName": "Bench", "lastName": "User", "email": "bench@example.com",
+            "password": "bench-password", "role": "user"}
+    with AppServer() as app:
+        import httpx
+
+        httpx.post(app.url + "/auth/signup", json=user, timeout=60).raise_for_status()
+        body = {k: user[k] for k in ("email", "password", "role")}
+        return asyncio.run(_http_load(app.url, lambda: ("POST", "/auth/login", body),
+                                      ctx["clients"], ctx["login_requests"]))
+
+
+def bench_ws_fanout(ctx):
+    from bench_ws_fanout import fanout, make_sockets
+
+    logging.getLogger("multi_agent.websocket").setLevel(logging.WARNING)  # one line per dropped socket
+    async def run():
+        sockets = make_sockets(ctx["ws_clients"], ctx["ws_slow"], 0.02)
+        return await fanout(sockets, ctx["ws_messages"])
+
+    publish, delivered, stats = asyncio.run(run())
+    return {"clients": ctx["ws_clients"], "messages": ctx["ws_messages"],
+            "publish_ms_per_broadcast": round(publish / ctx["ws_messages"] * 1000, 3),
+            "all_delivered_s": round(delivered, 3), "dropped": stats["dropped_messages"]}
+
+
+# ---------- runner ----------
+def run(args):
+    # Settings are read at import time, so they go in before any backend module
+    # loads (synthetic.py already imports model_bundle and result_cache)
+    os.environ.setdefault("TASK_QUEUE_EMBEDDED", "false")
+    os.environ.setdefault("INFERENCE_BACKEND", "thread")
+    if not args.cache:
+        os.environ["RESULT_CACHE_SIZE"] = "0"
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix="backend-bench-")
+    from synthetic import write_workspace
+
+    data = write_workspace(workspace, args.products, args.rows_per_product, args.seed)
+    os.chdir(workspace)
+
+    selected = args.only.split(",") if args.only else SCENARIOS
+    random.seed(args.seed)
+    ctx = {
+        "workspace": workspace,
+        "repeat_cold": 3,
+        "batch_sizes": [1, 10, 100, 1000],
+        "batch_repeat": 20,
+        "clients": args.clients,
+        "http_requests": args.http_requests,
+        "login_requests": args.login_requests,
+        "ws_clients": args.ws_clients,
+        "ws_messages": 50,
+        "ws_slow": 10,
+    }
+    if {"run_single", "run_batch", "agent_nodes", "http_analyze"} & set(selected):
+        from main1 import ProductOptimizer
+
+        ctx["optimizer"] = ProductOptimizer()
+        if not args.cache:
+            from result_cache import ResultCache
+
+            ctx["optimizer"].result_cache = ResultCache(maxsize=0)
+        ctx["all_ids"] = ctx["optimizer"].feature_store.sorted_ids.tolist()
+        ctx["sample_ids"] = random.choices(ctx["all_ids"], k=args.samples)
+
+    results = {}
+    for name in SCENARIOS:
+        if name not in selected:
+            continue
+        print(f"… {name}", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        try:
+            results[name] = globals()[f"bench_{name}"](ctx)
+        except ImportError as e:
+            results[name] = {"skipped": f"missing dependency: {e.name}"}
+        results[name]["wall_s"] = round(time.perf_counter() - start, 2)
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "dataset": data,
+            "result_cache": args.cache,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        out = os.path.join(BACKEND_DIR, args.out) if not os.path.isabs(args.out) else args.out
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w") as f:
+            f.write(text)
+        print(f"wrote {out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def flatten(tree, prefix=""):
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, path + ".")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    old_metrics = dict(flatten(base["results"]))
+    print(f"base {base['meta'].get('commit', '?')[:10]}  ->  new {new['meta'].get('commit', '?')[:10]}")
+    print(f"{'metric':60} {'base':>12} {'new':>12} {'ratio':>8}")
+    for path, value in flatten(new["results"]):
+        if path not in old_metrics or path.endswith("wall_s"):
+            continue
+        old = old_metrics[path]
+        ratio = f"{value / old:.2f}x" if old else "-"
+        print(f"{path:60} {old:>12} {value:>12} {ratio:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and write JSON results")
+    run_parser.add_argument("--products", type=int, default=5000)
+    run_parser.add_argument("--rows-per-product", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--samples", type=int, default=500, help="products timed in single-run scenarios")
+    run_parser.add_argument("--clients", type=int, default=32, help="concurrent HTTP clients")
+    run_parser.add_argument("--http-requests", type=int, default=3000)
+    run_parser.add_argument("--login-requests", type=int, default=200)
+    run_parser.add_argument("--ws-clients", type=int, default=5000)
+    run_parser.add_argument("--cache", action="store_true", help="keep the result cache enabled")
+    run_parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    run_parser.add_argument("--workspace", help="directory for the synthetic files (default: a temp dir)")
+    run_parser.add_argument("--out", help="JSON output path (default: stdout)")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+
+    args = parser.parse_args()
+    run(args) if args.command == "run" else compare(args)
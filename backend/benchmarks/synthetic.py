@@ -0,0 +1,110 @@
+"""Synthetic dataset and small stand-in models with the shapes the backend expects.
+
+    python benchmarks/synthetic.py --products 10000 --rows-per-product 3 --out /tmp/bench
+
+Writes cleaned_sample_with_price_v3.csv, demand_trend_classifier.pkl and
+price_optimization.joblib into --out. Running the backend from that
+directory loads them in place of the real artifacts. Everything is seeded,
+so the same arguments give the same data and models.
+"""
+import argparse
+import os
+import pickle
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from model_bundle import DATASET_PATH, DEMAND_MODEL_PATH, PRICE_MODEL_PATH  # noqa: E402
+
+CATEGORIES = {
+    "Promotions": ["Yes", "No"],
+    "Seasonality Factors": ["Holiday", "Festival", "Carbon Neutral", "Eco-friendly Materials",
+                            "Energy Efficient Production", "Recyclable Packaging", "Water Conservation"],
+    "External Factors": ["Economic Indicator", "Weather", "Competitor Pricing"],
+    "Customer Segments": ["Budget", "Regular", "Premium"],
+}
+
+
+def generate_dataset(products=1000, rows_per_product=3, seed=0) -> pd.DataFrame:
+    """A frame with the columns (and raw, space-separated names) of the real CSV."""
+    rng = np.random.default_rng(seed)
+    n = products * rows_per_product
+    product_ids = np.repeat(np.arange(1000, 1000 + products), rows_per_product)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")
+    price = rng.uniform(5, 100, n).round(2)
+    sales_volume = rng.integers(20, 400, n)
+
+    frame = pd.DataFrame({
+        "Product ID": product_ids,
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Sales Quantity": (sales_volume * rng.uniform(0.6, 1.0, n)).astype(int),
+        **{column: rng.choice(values, n) for column, values in CATEGORIES.items()},
+        "Competitor Prices": (price * rng.uniform(0.8, 1.25, n)).round(2),
+        "Sales Volume": sales_volume,
+        "Customer Reviews": rng.integers(1, 6, n),
+        "Storage Cost": rng.uniform(0.5, 10, n).round(2),
+        "Stock Levels": rng.integers(0, 1000, n),
+        "Supplier Lead Time (days)": rng.integers(1, 30, n),
+        "Stockout Frequency": rng.integers(0, 20, n),
+        "Warehouse Capacity": rng.integers(500, 5000, n),
+        "Order Fulfillment Time (days)": rng.integers(1, 15, n),
+        "Price": price,
+    })
+    # Same column order as the real file
+    columns = ["Product ID", "Date", "Sales Quantity", "Promotions", "Seasonality Factors", "External Factors",
+               "Customer Segments", "Competitor Prices", "Sales Volume", "Customer Reviews", "Storage Cost",
+               "Stock Levels", "Supplier Lead Time (days)", "Stockout Frequency", "Warehouse Capacity",
+               "Order Fulfillment Time (days)", "Price"]
+    return frame[columns]
+
+
+def train_stand_in_models(dataset: pd.DataFrame, seed=0):
+    """(demand classifier, price model) fitted on `dataset` through the app's own feature schemas."""
+    from sklearn.linear_model import Ridge
+    from xgboost import XGBClassifier
+
+    from dataset_cache import normalize_columns
+    from feature_schema import DEMAND_FEATURES, PRICE_FEATURES, FeatureSchema
+
+    frame = normalize_columns(dataset.copy())
+    rng = np.random.default_rng(seed)
+
+    X_demand = FeatureSchema(DEMAND_FEATURES, frame).transform(frame)
+    # 0 = decreasing, 1 = increasing, 2 = stable, loosely tied to promotions and price
+    score = X_demand[:, 1] * -0.8 + (frame["Price"].to_numpy() < 40) * 0.6 + rng.normal(0, 0.5, len(frame))
+    y_demand = np.digitize(score, [-0.3, 0.3])
+    demand_model = XGBClassifier(n_estimators=20, max_depth=3, random_state=seed, n_jobs=1)
+    demand_model.fit(X_demand, y_demand)
+
+    X_price = FeatureSchema(PRICE_FEATURES, frame).transform(frame)
+    y_price = X_price[:, 0] * 0.9 + X_price[:, 1] * 0.1 + rng.normal(0, 1, len(frame))
+    price_model = Ridge(alpha=1.0).fit(X_price, y_price)
+    return demand_model, price_model
+
+
+def write_workspace(out_dir, products=1000, rows_per_product=3, seed=0) -> dict:
+    """Write the CSV and both models into `out_dir` under the app's file names."""
+    os.makedirs(out_dir, exist_ok=True)
+    dataset = generate_dataset(products, rows_per_product, seed)
+    dataset.to_csv(os.path.join(out_dir, DATASET_PATH), index=False)
+
+    demand_model, price_model = train_stand_in_models(dataset, seed)
+    with open(os.path.join(out_dir, DEMAND_MODEL_PATH), "wb") as f:
+        pickle.dump(demand_model, f)
+    joblib.dump(price_model, os.path.join(out_dir, PRICE_MODEL_PATH))
+    return {"dir": out_dir, "products": products, "rows": len(dataset), "seed": seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--rows-per-product", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    print(write_workspace(args.out, args.products, args.rows_per_product, args.seed))
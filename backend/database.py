@@ -0,0 +1,143 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "multi_agent_system")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300_000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5_000))
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so pool utilization can be reported."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump(pool_clears=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump(open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._bump(checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._bump(in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._bump(in_use=-1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+
+class MongoConnections:
+    """The process's Mongo clients, opened and closed by the app lifespan.
+
+    Auth and the Beanie models share one async client. Code that runs in
+    worker threads (e.g. the shared result cache) gets a sync client with
+    the same pool settings, created only on first use.
+    """
+
+    def __init__(self):
+        self.client = None
+        self._sync_client = None
+        self.pool_stats = PoolStats()
+        self._sync_pool_stats = PoolStats()
+
+    @staticmethod
+    def options() -> dict:
+        return {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        }
+
+    def connect(self):
+        """Open the async client if needed and return the app database."""
+        if self.client is None:
+            self.client = AsyncIOMotorClient(MONGO_URI, event_listeners=[self.pool_stats], **self.options())
+        return self.client[DB_NAME]
+
+    @property
+    def database(self):
+        if self.client is None:
+            raise RuntimeError("Mongo client is not connected")
+        return self.client[DB_NAME]
+
+    def sync_database(self):
+        if self._sync_client is None:
+            self._sync_client = MongoClient(MONGO_URI, event_listeners=[self._sync_pool_stats], **self.options())
+        return self._sync_client[DB_NAME]
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    def stats(self) -> dict:
+        async_pool = self.pool_stats.snapshot()
+        return {
+            "connected": self.client is not None,
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "utilization": round(async_pool["in_use"] / MONGO_MAX_POOL_SIZE, 4) if MONGO_MAX_POOL_SIZE else None,
+            "async_pool": async_pool,
+            "sync_pool": self._sync_pool_stats.snapshot() if self._sync_client is not None else None,
+        }
+
+
+mongo = MongoConnections()
@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional: without pyarrow we always parse the CSV
+    pa = None
+
+
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", ".dataset_cache")
+# "mtime" (size + mtime), "hash" (sha256 of the CSV) or "off"
+CACHE_VALIDATE = os.getenv("DATASET_CACHE_VALIDATE", "mtime")
+
+SIGNATURE_KEY = b"source_signature"
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [c.strip().replace(" ", "_") for c in df.columns]
+    return df
+
+
+def source_signature(csv_path: str, validate: str = CACHE_VALIDATE) -> str:
+    stat = os.stat(csv_path)
+    if validate == "hash":
+        digest = hashlib.sha256()
+        with open(csv_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return f"sha256:{digest.hexdigest()}"
+    return f"mtime:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def cache_path_for(csv_path: str, cache_dir: str = CACHE_DIR) -> str:
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), cache_dir, base + ".arrow")
+
+
+def _read_cache(path: str, signature: str):
+    if not os.path.exists(path):
+        return None
+    try:
+        # Kept open on purpose: zero-copy columns keep pointing into the mapping.
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        metadata = reader.schema.metadata or {}
+        if metadata.get(SIGNATURE_KEY) != signature.encode():
+            return None
+        return reader.read_all().to_pandas()
+    except Exception as e:
+        print("⚠️ Ignoring unreadable dataset cache:", e)
+        return None
+
+
+def _write_cache(path: str, df: pd.DataFrame, signature: str):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), SIGNATURE_KEY: signature.encode()})
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)  # atomic, so concurrent workers never see a partial file
+    except Exception as e:
+        print("⚠️ Could not write dataset cache:", e)
+
+
+def load_dataset(csv_path: str, validate: str = CACHE_VALIDATE) -> pd.DataFrame:
+    """Load the cleaned dataset, going through a memory-mapped Arrow cache when possible.
+
+    The cache is rewritten whenever the CSV's signature changes.
+    """
+    if pa is None or validate == "off":
+        return normalize_columns(pd.read_csv(csv_path))
+
+    signature = source_signature(csv_path, validate)
+    path = cache_path_for(csv_path)
+
+    df = _read_cache(path, signature)
+    if df is not None:
+        return df
+
+    df = normalize_columns(pd.read_csv(csv_path))
+    _write_cache(path, df, signature)
+    return df
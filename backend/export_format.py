@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+
+
+CSV_COLUMNS = [
+    "status",
+    "product_id",
+    "demand_forecast",
+    "optimized_price",
+    "avg_daily_demand",
+    "safety_stock",
+    "reorder_point",
+    "current_stock",
+    "action",
+    "suggested_reorder_qty",
+    "bundle_version",
+    "message",
+]
+
+
+def to_item(product_id, result: dict) -> dict:
+    """Shape one ProductOptimizer result like an /analyze response."""
+    if "final_summary" not in result:
+        return {"status": "error", "product_id": product_id, "message": result.get("error"),
+                "bundle_version": result.get("bundle_version")}
+    return {
+        "status": "success",
+        "product_id": result["final_summary"]["product_id"],
+        "demand_forecast": result["final_summary"]["demand_forecast"],
+        "optimized_price": result["final_summary"]["optimized_price"],
+        "inventory": result["final_summary"]["inventory"],
+        "message": result["message"],
+        "bundle_version": result.get("bundle_version")
+    }
+
+
+def ndjson_line(item: dict) -> str:
+    return json.dumps(item) + "\n"
+
+
+def csv_header() -> str:
+    return ",".join(CSV_COLUMNS) + "\r\n"
+
+
+def csv_line(item: dict) -> str:
+    row = {**item, **item.get("inventory", {})}
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore").writerow(row)
+    return buffer.getvalue()
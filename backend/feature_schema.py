@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+# Model input column -> dataset column names it may appear under
+DEMAND_FEATURES = {
+    "Price": ["Price"],
+    "Promotions": ["Promotions"],
+    "Seasonality Factors": ["Seasonality_Factors", "Seasonality Factors"],
+    "External Factors": ["External_Factors", "External Factors"],
+    "Customer Segments": ["Customer_Segments", "Customer Segments"],
+}
+
+PRICE_FEATURES = {
+    "Price": ["Price"],
+    "Competitor Prices": ["Competitor_Prices", "Competitor Prices"],
+    "Sales Volume": ["Sales_Volume", "Sales Volume"],
+    "Reviews": ["Reviews", "Customer_Reviews", "Customer Reviews"],
+    "Storage Cost": ["Storage_Cost", "Storage Cost"],
+}
+
+MISSING_CODE = -1.0
+
+
+class FeatureSchema:
+    """Model input columns resolved against the dataset once, with fixed category codes.
+
+    Text columns are coded by their sorted distinct values over the whole
+    dataset, the same codes `astype("category").cat.codes` gives on the full
+    column. Unseen or missing text values and unresolved columns get -1;
+    missing or non-numeric numbers stay NaN, as they reached the models
+    before (the price model rejects them, so those products report an error).
+    """
+
+    def __init__(self, spec: dict, dataset: pd.DataFrame):
+        self.columns = list(spec)
+        self.sources = {}
+        self.mappings = {}
+        for column, candidates in spec.items():
+            source = next((c for c in candidates if c in dataset.columns), None)
+            self.sources[column] = source
+            if source is not None and not pd.api.types.is_numeric_dtype(dataset[source]):
+                categories = sorted(dataset[source].dropna().unique())
+                self.mappings[column] = {value: float(code) for code, value in enumerate(categories)}
+
+    def transform(self, frame: pd.DataFrame) -> np.ndarray:
+        """Encode every row of `frame` into a float matrix in model column order."""
+        matrix = np.full((len(frame), len(self.columns)), MISSING_CODE)
+        for j, column in enumerate(self.columns):
+            source = self.sources[column]
+            if source is None or source not in frame.columns:
+                continue
+            if column in self.mappings:
+                matrix[:, j] = frame[source].map(self.mappings[column]).fillna(MISSING_CODE).to_numpy(dtype=float)
+            else:
+                matrix[:, j] = pd.to_numeric(frame[source], errors="coerce").to_numpy(dtype=float)
+        return matrix
+
+    def transform_one(self, features: dict) -> np.ndarray:
+        """Encode a single feature dict, for rows that are not in the feature store."""
+        row = np.full(len(self.columns), MISSING_CODE)
+        for j, column in enumerate(self.columns):
+            source = self.sources[column]
+            if source is None:
+                continue
+            value = features.get(source)
+            if column in self.mappings:
+                row[j] = self.mappings[column].get(value, MISSING_CODE)
+            else:
+                try:
+                    row[j] = float(value)
+                except (TypeError, ValueError):
+                    row[j] = np.nan
+        return row
+
+    def describe(self) -> dict:
+        return {
+            "columns": self.columns,
+            "sources": self.sources,
+            "categories": {column: list(mapping) for column, mapping in self.mappings.items()},
+        }
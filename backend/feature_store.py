@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from feature_schema import DEMAND_FEATURES, PRICE_FEATURES, FeatureSchema
+
+
+class ProductFeatureStore:
+    """Latest row per Product_ID, indexed once when the dataset is loaded.
+
+    Lookups are dict hits, so their cost does not depend on how many rows
+    the CSV has.
+    """
+
+    def __init__(self, dataset: pd.DataFrame):
+        latest = dataset.drop_duplicates("Product_ID", keep="last")
+        ids = latest["Product_ID"].tolist()
+
+        self.frame = latest.reset_index(drop=True)
+        self.records = dict(zip(ids, latest.to_dict("records")))
+        self.positions = {pid: i for i, pid in enumerate(ids)}
+        self.sorted_ids = np.sort(np.asarray(ids))
+        # Shown in "not found" errors; computed once instead of on every miss.
+        self.sample_ids = dataset["Product_ID"].unique()[:10]
+
+        # Model inputs encoded once (category codes fit on the full dataset),
+        # so a request only slices a row out of these matrices.
+        self.schemas = {
+            "demand": FeatureSchema(DEMAND_FEATURES, dataset),
+            "price": FeatureSchema(PRICE_FEATURES, dataset),
+        }
+        self.matrices = {name: schema.transform(self.frame) for name, schema in self.schemas.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, product_id):
+        return product_id in self.records
+
+    def get(self, product_id):
+        return self.records.get(product_id)
+
+    def rows(self, product_ids) -> pd.DataFrame:
+        """Latest rows for ids known to be in the store, in the given order."""
+        return self.frame.iloc[[self.positions[pid] for pid in product_ids]]
+
+    def vector(self, name: str, product_id):
+        """One-row model input for `name` ("demand" or "price"), or None if unknown."""
+        position = self.positions.get(product_id)
+        if position is None:
+            return None
+        return self.matrices[name][position:position + 1]
+
+    def matrix(self, name: str, product_ids) -> np.ndarray:
+        """Stacked model inputs for ids known to be in the store, in the given order."""
+        return self.matrices[name][[self.positions[pid] for pid in product_ids]]
+
+    def ids_after(self, after=None, limit=500) -> list:
+        """Up to `limit` product ids greater than `after`, ascending (keyset paging)."""
+        start = 0 if after is None else int(np.searchsorted(self.sorted_ids, after, side="right"))
+        return self.sorted_ids[start:start + limit].tolist()
+
+    def not_found_message(self, product_id) -> str:
+        return f"Product ID {product_id} not found. Available IDs: {self.sample_ids}"
@@ -0,0 +1,189 @@
+import asyncio
+import cProfile
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+import profiling
+
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 64))
+
+
+class InferenceSaturated(Exception):
+    """All workers are busy and the wait queue is full."""
+
+
+# ---------- Process Worker State ----------
+_worker_optimizer = None
+
+
+def _init_worker():
+    # Each worker process loads its own dataset and models once, up front.
+    global _worker_optimizer
+    from main1 import ProductOptimizer
+    _worker_optimizer = ProductOptimizer()
+    _worker_optimizer.watch()
+
+
+def _worker_bundle():
+    return _worker_optimizer.bundle.describe()
+
+
+def _call(optimizer, method, args, profile=False):
+    started_at = time.monotonic()
+    target = optimizer if optimizer is not None else _worker_optimizer
+    stats = None
+    # Timings go back with the result so the caller's process can record them
+    with metrics.collect() as events:
+        if not profile:
+            result = getattr(target, method)(*args)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                result = getattr(target, method)(*args)
+            finally:
+                profiler.disable()
+                stats = profiling.dump_stats(profiler)
+    return started_at, result, events, stats
+
+
+class InferenceExecutor:
+    """Runs ProductOptimizer calls off the event loop with a bounded backlog.
+
+    At most `max_workers` calls run at once and at most `max_queue` more
+    wait for a worker; anything beyond that raises InferenceSaturated.
+    """
+
+    def __init__(self, optimizer, backend=INFERENCE_BACKEND, max_workers=INFERENCE_WORKERS,
+                 max_queue=INFERENCE_QUEUE_SIZE):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.optimizer = optimizer
+        self.backend = backend
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self._pool = None
+        self._warmup = []
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=1024)
+        self._max_wait = 0.0
+
+    def _new_process_pool(self):
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # Spawn every worker now so the first requests don't pay for model loading
+        return pool, [pool.submit(_worker_bundle) for _ in range(self.max_workers)]
+
+    def start(self):
+        if self._pool is not None:
+            return
+        if self.backend == "process":
+            self._pool, self._warmup = self._new_process_pool()
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            self._warmup = [self._pool.submit(self.optimizer.load)]
+            self.optimizer.watch()
+
+    async def reload(self) -> dict:
+        """Load a new model/dataset bundle and switch to it once it is ready.
+
+        Calls already queued or running finish on the previous bundle.
+        """
+        self.start()
+        if self.backend == "thread":
+            bundle = await asyncio.to_thread(self.optimizer.reload)
+            return bundle.describe()
+
+        pool, warmup = self._new_process_pool()
+        try:
+            bundles = await asyncio.gather(*[asyncio.wrap_future(f) for f in warmup])
+        except Exception:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        old_pool, self._pool, self._warmup = self._pool, pool, warmup
+        old_pool.shutdown(wait=False)
+        return bundles[0]
+
+    @property
+    def ready(self) -> bool:
+        """True once the workers have their dataset and models loaded."""
+        return bool(self._warmup) and all(f.done() and f.exception() is None for f in self._warmup)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._warmup = []
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.max_workers)
+
+    async def submit(self, method, *args):
+        """Run optimizer.<method>(*args) in the pool and return its result."""
+        result, _ = await self._submit(method, args, False)
+        return result
+
+    async def submit_profiled(self, method, *args):
+        """Like submit, under cProfile in the worker; returns (result, pstats dump bytes)."""
+        return await self._submit(method, args, True)
+
+    async def _submit(self, method, args, profile):
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise InferenceSaturated(f"Inference queue full ({self.queue_depth} waiting)")
+        self.start()
+
+        optimizer = self.optimizer if self.backend == "thread" else None
+        self._in_flight += 1
+        self._submitted += 1
+        enqueued_at = time.monotonic()
+        try:
+            started_at, result, events, stats = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _call, optimizer, method, args, profile
+            )
+        finally:
+            self._in_flight -= 1
+
+        wait = started_at - enqueued_at
+        metrics.observe(metrics.INFERENCE_WAIT_SECONDS, wait, "inference_wait", method=method)
+        metrics.replay(events)
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        self._completed += 1
+        return result, stats
+
+    def stats(self) -> dict:
+        waits = np.array(self._waits) if self._waits else np.zeros(1)
+        return {
+            "backend": self.backend,
+            "workers": self.max_workers,
+            "queue_capacity": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_seconds": {
+                "mean": round(float(waits.mean()), 6),
+                "p50": round(float(np.percentile(waits, 50)), 6),
+                "p95": round(float(np.percentile(waits, 95)), 6),
+                "max": round(self._max_wait, 6),
+            },
+        }
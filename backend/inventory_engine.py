@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+REPORT_COLUMNS = [
+    "product_id",
+    "demand_forecast",
+    "avg_daily_demand",
+    "safety_stock",
+    "reorder_point",
+    "current_stock",
+    "inventory_action",
+    "suggested_reorder_qty",
+]
+
+
+def _numeric_column(frame: pd.DataFrame, column: str, default: float) -> np.ndarray:
+    # Vector form of `pd.to_numeric(f.get(col) or default)` with NaN -> default.
+    if column not in frame:
+        return np.full(len(frame), default, dtype=float)
+    values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=float)
+    return np.where(np.isnan(values) | (values == 0), default, values)
+
+
+# ---------- Vectorized Inventory Math ----------
+def plan_inventory(sales_volume, stock_levels, lead_time_days, stockout_freq,
+                   warehouse_capacity, fulfillment_time_days, increasing):
+    """Array version of inventory_management_agent's reorder math."""
+    avg_daily_demand = sales_volume / 30.0
+
+    sf = np.clip(stockout_freq, 0, 30)
+    base_multiplier = 0.20 + 0.02 * sf
+    trend_bump = np.where(increasing, 0.20, 0.0)
+    ss_multiplier = base_multiplier + trend_bump
+    risk_window = np.maximum(0.0, lead_time_days + fulfillment_time_days)
+
+    safety_stock = avg_daily_demand * ss_multiplier * np.maximum(1.0, risk_window)
+    reorder_point = (avg_daily_demand * np.maximum(1.0, lead_time_days)) + safety_stock
+
+    reorder = stock_levels < reorder_point
+    monitor = ~reorder & (stock_levels < reorder_point * 1.1)
+    action = np.where(reorder, "Reorder", np.where(monitor, "Monitor Closely", "Hold"))
+    reorder_qty = np.where(reorder, reorder_point - stock_levels,
+                           np.where(monitor, np.maximum(0.0, reorder_point - stock_levels), 0.0))
+
+    max_additional_capacity = np.where(
+        np.isfinite(warehouse_capacity), np.maximum(0.0, warehouse_capacity - stock_levels), np.inf
+    )
+    reorder_qty = np.clip(reorder_qty, 0.0, max_additional_capacity)
+
+    return {
+        "avg_daily_demand": avg_daily_demand,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "current_stock": stock_levels,
+        "inventory_action": action,
+        "suggested_reorder_qty": reorder_qty,
+    }
+
+
+def inventory_columns(frame: pd.DataFrame) -> dict:
+    return {
+        "sales_volume": _numeric_column(frame, "Sales_Volume", 0.0),
+        "stock_levels": _numeric_column(frame, "Stock_Levels", 0.0),
+        "lead_time_days": _numeric_column(frame, "Supplier_Lead_Time_(days)", 0.0),
+        "stockout_freq": _numeric_column(frame, "Stockout_Frequency", 0.0),
+        "warehouse_capacity": _numeric_column(frame, "Warehouse_Capacity", np.inf),
+        "fulfillment_time_days": _numeric_column(frame, "Order_Fulfillment_Time_(days)", 0.0),
+    }
+
+
+
+def _round_like_agent(values: np.ndarray, ndigits: int) -> np.ndarray:
+    # Python's round(), as the single-product agent uses, is correctly rounded;
+    # np.round can land one ulp away on halfway cases.
+    return np.array([round(float(v), ndigits) for v in values], dtype=float)
+
+
+def catalog_inventory_plan(feature_store, demand_model, actions=None) -> pd.DataFrame:
+    """Reorder plan for every product in the feature store.
+
+    Demand is predicted for the whole catalog in one call and the reorder
+    math runs column-wise; the numbers equal inventory_management_agent's
+    for each product. `actions` keeps only rows with those inventory actions.
+    """
+    frame = feature_store.frame
+    increasing = demand_model.predict(feature_store.matrices["demand"]) == 1
+    plan = plan_inventory(increasing=increasing, **inventory_columns(frame))
+
+    report = pd.DataFrame({
+        "product_id": frame["Product_ID"].to_numpy(),
+        "demand_forecast": np.where(increasing, "increasing", "decreasing"),
+        "avg_daily_demand": _round_like_agent(plan["avg_daily_demand"], 2),
+        "safety_stock": _round_like_agent(plan["safety_stock"], 2),
+        "reorder_point": _round_like_agent(plan["reorder_point"], 2),
+        "current_stock": plan["current_stock"],
+        "inventory_action": plan["inventory_action"],
+        "suggested_reorder_qty": _round_like_agent(plan["suggested_reorder_qty"], 0),
+    }, columns=REPORT_COLUMNS)
+
+    if actions:
+        report = report[report["inventory_action"].isin(actions)].reset_index(drop=True)
+    return report
+
+
+def iter_ndjson(report: pd.DataFrame, chunk_size: int = 1000):
+    """Yield the report as newline-delimited JSON, a chunk of rows at a time."""
+    for start in range(0, len(report), chunk_size):
+        records = report.iloc[start:start + chunk_size].to_dict("records")
+        yield "".join(json.dumps(record) + "\n" for record in records)
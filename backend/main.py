@@ -1,35 +1,76 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Depends, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
+from database import mongo
 #changes
 from main1 import ProductOptimizer
+from inference_pool import InferenceExecutor, InferenceSaturated
+from micro_batcher import ANALYZE_BATCHING, MicroBatcher
+from inventory_engine import iter_ndjson
+from export_format import to_item, ndjson_line, csv_header, csv_line
 from pydantic import BaseModel
-# Create instance (no parameters needed)
-optimizer = ProductOptimizer()
+from typing import List, Optional
+import metrics
+from profiling import profile_requested, profile_session, profile_store, router as profiles_router
+import time
+# Dataset and models load in the background from lifespan (see below)
+optimizer = ProductOptimizer(lazy=True)
+# CPU-bound inference runs here, never on the event loop (INFERENCE_* env vars)
+inference = InferenceExecutor(optimizer)
+# Concurrent /analyze calls share one run_many (ANALYZE_BATCH_* env vars)
+analyze_batcher = MicroBatcher(lambda product_ids: inference.submit("run_many", product_ids))
 
 # Your existing imports (unchanged)
 from auth import router as auth_router
+from user_store import users
+from security import current_user, require_role
 
 # New multi-agent imports
 from multi_agent.routes import agent_router, workflow_router
 from multi_agent.websocket import manager
+from multi_agent.executor import workflow_executor
+from multi_agent.scheduler import agent_pool
+from multi_agent.services import agent_service
+from multi_agent.task_queue import TaskWorker
+
+# Run a task queue worker inside the API process too (python -m multi_agent.worker adds more)
+TASK_QUEUE_EMBEDDED = os.getenv("TASK_QUEUE_EMBEDDED", "true").lower() in ("1", "true", "yes")
+task_worker = TaskWorker()
 from multi_agent.models import Agent, Task, Workflow
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def ensure_user_indexes():
+    """Build the unique email index; duplicates from before it existed are logged, not fatal."""
+    try:
+        await users.ensure_indexes()
+    except Exception as e:
+        try:
+            duplicates = await users.duplicate_emails()
+        except Exception:
+            duplicates = []
+        logger.error(f"Unique email index not built ({e}); signup can register an email twice until "
+                     f"these duplicates are removed: {duplicates or 'unknown'}")
+
 # Database connection for multi-agent features
 async def init_multi_agent_db():
     try:
-        client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
-        database = client[os.getenv("DB_NAME", "multi_agent_system")]
+        # One pooled client (see database.py) shared by auth and the Beanie models
+        database = mongo.connect()
+        users.bind(database)
+        await ensure_user_indexes()
         await init_beanie(database=database, document_models=[Agent, Task, Workflow])
+        await agent_pool.start()
+        if TASK_QUEUE_EMBEDDED:
+            task_worker.start()
         logger.info("✅ Multi-agent database initialized")
     except Exception as e:
         logger.warning(f"Multi-agent DB init failed: {e}")
@@ -38,10 +79,20 @@ async def init_multi_agent_db():
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Enhanced FastAPI Auth Backend...")
+    # Models load inside the inference workers; health checks are served meanwhile
+    inference.start()
+    await manager.start()
     await init_multi_agent_db()
     yield
     # Shutdown
     logger.info("👋 Shutting down...")
+    await task_worker.stop()
+    await workflow_executor.shutdown()
+    await agent_pool.stop()
+    await agent_service.aclose()
+    await manager.stop()
+    inference.shutdown()
+    mongo.close()
 
 # Your existing FastAPI app setup
 app = FastAPI(
@@ -64,12 +115,17 @@ app.add_middleware(
 # Your existing session middleware
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET", "SESSION_SECRET"))
 
+# Latency histograms for /metrics (admin token, e.g. Prometheus' `authorization` setting);
+# send `X-Timing: 1` for a per-request breakdown
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Your existing auth routes (unchanged)
 app.include_router(auth_router)
 
 # NEW: Multi-agent routes
 app.include_router(agent_router)
 app.include_router(workflow_router)
+app.include_router(profiles_router)
 
 # NEW: WebSocket for real-time updates
 @app.websocket("/ws/{workflow_id}")
@@ -80,6 +136,8 @@ async def websocket_endpoint(websocket: WebSocket, workflow_id: str):
             data = await websocket.receive_text()
             logger.info(f"WebSocket received: {data}")
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, workflow_id)
 
 # Your existing root endpoint (unchanged)
@@ -92,14 +150,38 @@ def root():
     }
 class ProductRequest(BaseModel):
     product_id: int
+
+class BatchProductRequest(BaseModel):
+    product_ids: List[int]
 # NEW: Health check
 @app.get("/health")
 def health():
-    return {"status": "healthy", "timestamp": "2025-08-25"}
-@app.post("/analyze")
-def analyze_product(request: ProductRequest):
+    return {"status": "healthy", "timestamp": "2025-08-25", "models_loaded": inference.ready}
+@app.get("/health/db")
+def db_health():
+    return mongo.stats()
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_role("admin"))])
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+@app.post("/analyze", dependencies=[Depends(current_user)])
+async def analyze_product(request: ProductRequest, response: Response, profile_user=Depends(profile_requested)):
     try:
-        result = optimizer.run(request.product_id)
+        if profile_user is not None and profile_session.acquire(blocking=False):
+            # Profiled on its own, outside the micro-batcher, so the trace is this product's alone
+            try:
+                profile_id = profile_store.new_id()
+                start = time.perf_counter()
+                result, stats = await inference.submit_profiled("run", request.product_id)
+                profile_store.save(profile_id, stats, kind="analyze", user=profile_user["email"],
+                                   label=f"product {request.product_id}",
+                                   duration_ms=round((time.perf_counter() - start) * 1000, 3))
+            finally:
+                profile_session.release()
+            response.headers["X-Profile-Id"] = profile_id
+        elif ANALYZE_BATCHING:
+            result = await analyze_batcher.submit(request.product_id)
+        else:
+            result = await inference.submit("run", request.product_id)
 
         # unpack final summary cleanly
         return {
@@ -108,12 +190,100 @@ def analyze_product(request: ProductRequest):
             "demand_forecast": result["final_summary"]["demand_forecast"],
             "optimized_price": result["final_summary"]["optimized_price"],
             "inventory": result["final_summary"]["inventory"],
-            "message": result["message"]
+            "message": result["message"],
+            "bundle_version": result.get("bundle_version")
         }
 
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.post("/analyze/batch", dependencies=[Depends(current_user)])
+async def analyze_products(request: BatchProductRequest):
+    try:
+        results = await inference.submit("run_many", request.product_ids)
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    items = [to_item(product_id, result) for product_id, result in zip(request.product_ids, results)]
+    return {"status": "success", "count": len(items), "results": items}
+
+@app.get("/analyze/stream", dependencies=[Depends(current_user)])
+async def analyze_stream(format: str = "ndjson", after: Optional[int] = None,
+                         chunk_size: int = Query(500, ge=1, le=5000)):
+    """Analyze the whole catalog in Product_ID order, one line per product.
+
+    Pass the last product_id received as `after` to resume. Every page
+    uses the bundle of the first one (X-Bundle-Version); if that bundle is
+    dropped midway the response is cut short, and resuming starts on the
+    current bundle.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    line = ndjson_line if format == "ndjson" else csv_line
+
+    async def next_page(cursor, version):
+        while True:
+            try:
+                return await inference.submit("analyze_page", cursor, chunk_size, version)
+            except InferenceSaturated:
+                await asyncio.sleep(0.1)  # mid-stream we can't answer 429, so wait for room
+
+    # First page outside the stream so saturation and load errors still get a status code
+    try:
+        first_page = await inference.submit("analyze_page", after, chunk_size)
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    version, ids, results = first_page
+
+    async def lines():
+        nonlocal ids, results
+        if format == "csv":
+            yield csv_header()
+        while ids:
+            yield "".join(line(to_item(pid, result)) for pid, result in zip(ids, results))
+            if len(ids) < chunk_size:
+                break
+            _, ids, results = await next_page(ids[-1], version)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(lines(), media_type=media_type, headers={"X-Bundle-Version": version})
+
+@app.get("/inventory/reorder-report", dependencies=[Depends(current_user)])
+async def inventory_reorder_report(action: Optional[List[str]] = Query(None), format: str = "json"):
+    try:
+        version, report = await inference.submit("inventory_report", action)
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(report), media_type="application/x-ndjson",
+                                 headers={"X-Bundle-Version": version})
+    return {"status": "success", "bundle_version": version, "count": len(report), "items": report.to_dict("records")}
+
+@app.post("/admin/reload", dependencies=[Depends(require_role("admin"))])
+async def reload_models():
+    try:
+        bundle = await inference.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+    return {"status": "reloaded", "bundle": bundle}
+
+@app.get("/analyze/stats", dependencies=[Depends(require_role("admin"))])
+def analyze_stats():
+    stats = inference.stats()
+    # Process workers each keep their own cache; only the shared optimizer's is visible here
+    stats["cache"] = optimizer.result_cache.stats() if inference.backend == "thread" else None
+    stats["batcher"] = analyze_batcher.stats() if ANALYZE_BATCHING else None
+    stats["prediction_table"] = optimizer.table_stats() if inference.backend == "thread" else None
+    return stats
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,64 +1,221 @@
-import pickle
-import joblib
+import os
 import pandas as pd
 import numpy as np
-import xgboost
-import sys
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
 from langgraph.graph import StateGraph, END
+import metrics
+from inventory_engine import catalog_inventory_plan, inventory_columns, plan_inventory
+from model_bundle import ModelBundle, artifact_versions
+from prediction_table import PREDICTION_TABLE, PredictionTable
+from result_cache import default_result_cache
 
 
-class ProductOptimizer:
-    def __init__(self):
-        # ---------- Load Super Dataset ----------
-        self.super_dataset = pd.read_csv("cleaned_sample_with_price_v3.csv")
-        self.super_dataset.columns = [c.strip().replace(" ", "_") for c in self.super_dataset.columns]
-
-        # ---------- Safe Demand Model Loader ----------
-        self.demand_model = None
-        self.encoder = None
-        try:
-            sys.modules['XGBClassifier'] = xgboost.XGBClassifier  # alias fix
+# Seconds between checks of the artifact files; 0 disables hot reload
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 0))
+# "graph" runs the LangGraph app, "fused" calls the same agents directly
+OPTIMIZER_EXECUTION = os.getenv("OPTIMIZER_EXECUTION", "graph")
+# Seconds a replaced bundle stays loaded after its last use, for exports that started on it
+BUNDLE_RETAIN_SECONDS = float(os.getenv("BUNDLE_RETAIN_SECONDS", 300))
 
-            with open("demand_trend_classifier.pkl", "rb") as f:
-                obj = pickle.load(f)
+# Seconds spent inside agent nodes during the current invoke (the rest is graph overhead)
+_node_seconds = contextvars.ContextVar("node_seconds", default=None)
 
-            if isinstance(obj, dict):
-                self.demand_model = obj.get("model", None)
-                self.encoder = obj.get("encoder", None)
-            else:
-                self.demand_model = obj
 
-        except Exception as e1:
-            try:
-                obj = joblib.load("demand_trend_classifier.pkl")
-                if isinstance(obj, dict):
-                    self.demand_model = obj.get("model", None)
-                    self.encoder = obj.get("encoder", None)
-                else:
-                    self.demand_model = obj
-            except Exception as e2:
-                print("⚠️ Could not load demand model:", e1, e2)
-                self.demand_model = None
-
-        # ---------- Load Price Optimization Model (.joblib) ----------
-        self.price_model = None
+def _bundle_attr(name):
+    return property(lambda self: getattr(self.bundle, name, None))
+
+
+def _timed_node(name, agent):
+    def node(state):
+        start = time.perf_counter()
         try:
-            self.price_model = joblib.load("price_optimization.joblib")
-        except Exception as e:
-            print("⚠️ Could not load price optimization model:", e)
-            self.price_model = None
+            return agent(state)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe(metrics.NODE_SECONDS, elapsed, name, node=name)
+            spent = _node_seconds.get()
+            if spent is not None:
+                spent[0] += elapsed
+    return node
+
+
+class ProductOptimizer:
+    # Agents read artifacts through the bundle pinned for the current run,
+    # so a reload mid-request never mixes two versions.
+    super_dataset = _bundle_attr("super_dataset")
+    feature_store = _bundle_attr("feature_store")
+    demand_model = _bundle_attr("demand_model")
+    encoder = _bundle_attr("encoder")
+    price_model = _bundle_attr("price_model")
+    dataset_version = _bundle_attr("dataset_version")
+    model_fingerprint = _bundle_attr("model_fingerprint")
+
+    def __init__(self, lazy=False, execution=OPTIMIZER_EXECUTION, prediction_table=PREDICTION_TABLE):
+        if execution not in ("graph", "fused"):
+            raise ValueError(f"Unknown execution mode: {execution}")
+        self.execution = execution
+        self.use_prediction_table = prediction_table
+        self.result_cache = default_result_cache()
+        self._table = None
+
+        self._bundle = None
+        self._pinned = contextvars.ContextVar(f"pinned_bundle_{id(self)}", default=None)
+        self._load_lock = threading.Lock()
+        self._retired = {}  # version -> [bundle, last used]
+        self._retired_lock = threading.Lock()
+        self._watcher = None
 
         # ---------- LangGraph Setup ----------
         self._setup_graph()
 
+        # lazy=True defers the dataset and models to load(), e.g. from a
+        # startup task, so importing the app stays cheap.
+        if not lazy:
+            self.load()
+
+    @property
+    def ready(self) -> bool:
+        return self._bundle is not None
+
+    @property
+    def bundle(self) -> ModelBundle:
+        """Bundle pinned by the current run, otherwise the latest one."""
+        return self._pinned.get() or self._bundle
+
+    @contextmanager
+    def pinned_bundle(self, bundle=None):
+        pinned = self._pinned.get()
+        if pinned is not None:
+            yield pinned
+            return
+        bundle = bundle or self._bundle
+        token = self._pinned.set(bundle)
+        try:
+            yield bundle
+        finally:
+            self._pinned.reset(token)
+
+    def load(self):
+        """Load dataset and models once. Safe to call from several threads."""
+        if self._bundle is not None:
+            if self._retired:
+                self._prune_retired()
+            return
+        with self._load_lock:
+            if self._bundle is None:
+                self._bundle = ModelBundle.load()
+                self._refresh_table(self._bundle)
+
+    def reload(self) -> ModelBundle:
+        """Build a fresh bundle from disk and swap it in.
+
+        Runs already in progress finish on the bundle they started with.
+        A bundle whose models failed to load never replaces a working one.
+        """
+        with self._load_lock:
+            bundle = ModelBundle.load()
+            current = self._bundle
+            if current is not None and current.complete and not bundle.complete:
+                raise RuntimeError("Reloaded models failed to load; keeping bundle " + current.version)
+            self._bundle = bundle
+        if current is not None and current.version != bundle.version:
+            with self._retired_lock:
+                self._retired[current.version] = [current, time.monotonic()]
+        self._prune_retired()
+        self.result_cache.invalidate()
+        self._refresh_table(bundle)
+        return bundle
+
+    def bundle_for(self, version=None) -> ModelBundle:
+        """The current bundle, or the one with `version` if it was replaced recently.
+
+        Raises LookupError once a replaced bundle has been dropped.
+        """
+        self.load()
+        bundle = self._bundle
+        if version is None or bundle.version == version:
+            return bundle
+        with self._retired_lock:
+            entry = self._retired.get(version)
+            if entry is None:
+                raise LookupError(f"Bundle {version} is no longer loaded")
+            entry[1] = time.monotonic()
+            return entry[0]
+
+    def _prune_retired(self):
+        now = time.monotonic()
+        with self._retired_lock:
+            for version, (_, last_used) in list(self._retired.items()):
+                if now - last_used >= BUNDLE_RETAIN_SECONDS:
+                    del self._retired[version]
+
+    # ---------- Precomputed Predictions ----------
+    def _refresh_table(self, bundle):
+        """Score `bundle`'s catalog in a background thread; until it's done, runs use the models."""
+        if not self.use_prediction_table or not bundle.complete:
+            return
+
+        def build():
+            try:
+                table = PredictionTable.build(bundle)
+            except Exception as e:
+                print("⚠️ Prediction table build failed:", e)
+                return
+            if self._bundle is bundle:  # not superseded by a newer reload meanwhile
+                self._table = table
+
+        threading.Thread(target=build, name="prediction-table", daemon=True).start()
+
+    def prediction_table(self):
+        """The table for the bundle in use, once built; None otherwise."""
+        table = self._table
+        if table is None or self.bundle is None or table.version != self.bundle.version:
+            return None
+        return table
+
+    def table_stats(self):
+        if not self.use_prediction_table:
+            return None
+        table = self.prediction_table()
+        return table.describe() if table is not None else {"status": "building"}
+
+    def watch(self, interval=MODEL_WATCH_INTERVAL):
+        """Poll the artifact files and reload whenever one of them changes."""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                bundle = self._bundle
+                if bundle is None:
+                    continue
+                try:
+                    if artifact_versions() != (bundle.dataset_version, bundle.model_fingerprint):
+                        print("🔄 Model/dataset files changed, reloading")
+                        self.reload()
+                except Exception as e:
+                    print("⚠️ Hot reload failed:", e)
+
+        self._watcher = threading.Thread(target=poll, name="bundle-watcher", daemon=True)
+        self._watcher.start()
+
     def _setup_graph(self):
         graph = StateGraph(dict)
 
-        graph.add_node("agent1_fetcher", self.fetch_product_features)
-        graph.add_node("agent2_demand", self.demand_forecasting_agent)
-        graph.add_node("agent3_price", self.price_optimization_agent)
-        graph.add_node("agent4_inventory", self.inventory_management_agent)
-        graph.add_node("agent5_summary", self.final_summary_agent)
+        nodes = {
+            "agent1_fetcher": _timed_node("agent1_fetcher", self.fetch_product_features),
+            "agent2_demand": _timed_node("agent2_demand", self.demand_forecasting_agent),
+            "agent3_price": _timed_node("agent3_price", self.price_optimization_agent),
+            "agent4_inventory": _timed_node("agent4_inventory", self.inventory_management_agent),
+            "agent5_summary": _timed_node("agent5_summary", self.final_summary_agent),
+        }
+        for name, node in nodes.items():
+            graph.add_node(name, node)
+        self.nodes = nodes
 
         graph.set_entry_point("agent1_fetcher")
         graph.add_edge("agent1_fetcher", "agent2_demand")
@@ -69,6 +226,32 @@ class ProductOptimizer:
 
         self.app = graph.compile()
 
+        # The same chain as plain calls, for the fused execution mode
+        self.pipeline = list(nodes.values())
+
+    def invoke_fused(self, state: dict) -> dict:
+        """Run the linear agent chain directly, skipping the graph runtime.
+
+        Each node's output replaces the state, exactly as StateGraph(dict)
+        does, so the result matches self.app.invoke(state).
+        """
+        for agent in self.pipeline:
+            state = agent(state)
+        return state
+
+    def invoke(self, state: dict) -> dict:
+        if self.execution == "fused":
+            return self.invoke_fused(state)
+        start = time.perf_counter()
+        spent = [0.0]
+        token = _node_seconds.set(spent)
+        try:
+            return self.app.invoke(state)
+        finally:
+            _node_seconds.reset(token)
+            overhead = time.perf_counter() - start - spent[0]
+            metrics.observe(metrics.NODE_SECONDS, overhead, "langgraph_overhead", node="langgraph_overhead")
+
     # ---------- Agent 1: Data Fetcher ----------
     def fetch_product_features(self, state: dict) -> dict:
         try:
@@ -76,12 +259,18 @@ class ProductOptimizer:
         except:
             return {"error": f"Invalid product_id: {state.get('product_id')}"}
         
-        product_data = self.super_dataset[self.super_dataset["Product_ID"] == product_id]
-        if product_data.empty:
-            return {"error": f"Product ID {product_id} not found. Available IDs: {self.super_dataset['Product_ID'].unique()[:10]}"}
-        
-        features = product_data.iloc[-1].to_dict()
-        return {"features": features, "product_id": product_id}
+        features = self.feature_store.get(product_id)
+        if features is None:
+            return {"error": self.feature_store.not_found_message(product_id)}
+
+        return {"features": dict(features), "product_id": product_id}
+
+    def _model_input(self, name: str, product_id, features: dict) -> np.ndarray:
+        """Pre-encoded row from the feature store; features outside it are encoded on the fly."""
+        X = self.feature_store.vector(name, product_id)
+        if X is None:
+            X = self.feature_store.schemas[name].transform_one(features).reshape(1, -1)
+        return X
 
     # ---------- Agent 2: Demand Forecasting ----------
     def demand_forecasting_agent(self, state: dict) -> dict:
@@ -92,27 +281,11 @@ class ProductOptimizer:
             return {"error": "Demand model not loaded. Please check model file."}
         
         features = state["features"]
+        X = self._model_input("demand", state.get("product_id"), features)
 
-        input_features = [
-            features.get("Price"),
-            features.get("Promotions"),
-            features.get("Seasonality_Factors") or features.get("Seasonality Factors"),
-            features.get("External_Factors") or features.get("External Factors"),
-            features.get("Customer_Segments") or features.get("Customer Segments"),
-        ]
-        
-        df = pd.DataFrame([input_features], columns=[
-            "Price", "Promotions", "Seasonality Factors", "External Factors", "Customer Segments"
-        ])
-        
-        for col in df.columns:
-            if df[col].dtype == object:
-                df[col] = df[col].astype("category").cat.codes
-        
-        df = df.astype(float)
-        
         try:
-            pred = self.demand_model.predict(df)[0]
+            with metrics.timer(metrics.PREDICT_SECONDS, "predict_demand", model="demand", mode="single"):
+                pred = self.demand_model.predict(X)[0]
             demand_status = "increasing" if pred == 1 else "decreasing"
         except Exception as e:
             return {"error": f"Prediction failed: {e}"}
@@ -130,26 +303,11 @@ class ProductOptimizer:
         features = state["features"]
         demand_status = state["demand_forecast"]
 
-        input_features = [
-            features.get("Price"),
-            features.get("Competitor_Prices") or features.get("Competitor Prices"),
-            features.get("Sales_Volume") or features.get("Sales Volume"),
-            features.get("Reviews"),
-            features.get("Storage_Cost") or features.get("Storage Cost"),
-        ]
-        
-        df = pd.DataFrame([input_features], columns=[
-            "Price", "Competitor Prices", "Sales Volume", "Reviews", "Storage Cost"
-        ])
-        
-        for col in df.columns:
-            if df[col].dtype == object:
-                df[col] = df[col].astype("category").cat.codes
-        
-        df = df.astype(float)
+        X = self._model_input("price", state.get("product_id"), features)
 
         try:
-            base_price = float(self.price_model.predict(df)[0])
+            with metrics.timer(metrics.PREDICT_SECONDS, "predict_price", model="price", mode="single"):
+                base_price = float(self.price_model.predict(X)[0])
         except Exception as e:
             return {"error": f"Price prediction failed: {e}"}
         
@@ -270,10 +428,214 @@ class ProductOptimizer:
         return summary
 
     # ---------- Run Method ----------
+    def cache_key(self, product_id) -> str:
+        return f"analyze:{product_id}:{self.dataset_version}:{self.model_fingerprint}"
+
     def run(self, product_id=1985):
-        result = self.app.invoke({"product_id": product_id})
+        self.load()
+        with self.pinned_bundle() as bundle:
+            result = self._run(product_id)
+        result["bundle_version"] = bundle.version
+        return result
+
+    def _run(self, product_id):
+        try:
+            key = self.cache_key(int(product_id))
+        except (TypeError, ValueError):
+            key = None  # let the fetcher report the invalid id
+
+        if key is not None:
+            cached = self.result_cache.get(key)
+            metrics.inc(metrics.CACHE_LOOKUPS, result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
+        result = None
+        table = self.prediction_table()
+        if table is not None and key is not None:
+            result = self._run_from_table(int(product_id), table)
+        if result is None:
+            result = self.invoke({"product_id": product_id})
+        if key is not None and "final_summary" in result:
+            self.result_cache.set(key, result)
         return result
 
+    def _run_from_table(self, product_id: int, table):
+        """Precomputed demand and price plus the inventory and summary agents; None if not in the table."""
+        with metrics.timer(metrics.NODE_SECONDS, "prediction_table", node="prediction_table"):
+            row = table.lookup(product_id)
+        if row is None:
+            return None
+        increasing, base_price = row
+        state = {
+            "features": dict(self.feature_store.get(product_id)),
+            "product_id": product_id,
+            "demand_forecast": "increasing" if increasing else "decreasing",
+            # Same adjustment as price_optimization_agent
+            "optimized_price": round(base_price * (1.10 if increasing else 0.90), 2),
+        }
+        return self.nodes["agent5_summary"](self.nodes["agent4_inventory"](state))
+
+    @staticmethod
+    def _predict_batch(name, model, X: np.ndarray):
+        """Predict all rows at once; fall back to row-by-row only to isolate failures."""
+        try:
+            with metrics.timer(metrics.PREDICT_SECONDS, f"predict_{name}", model=name, mode="batch"):
+                return list(model.predict(X)), {}
+        except Exception:
+            preds, errors = [], {}
+            for i in range(len(X)):
+                try:
+                    preds.append(model.predict(X[i:i + 1])[0])
+                except Exception as e:
+                    preds.append(None)
+                    errors[i] = e
+            return preds, errors
+
+    # ---------- Batch Run Method ----------
+    def run_many(self, product_ids, bundle=None, use_cache=True):
+        """Run the five-agent pipeline for many products with one predict call per model.
+
+        Returns one result per requested id, in order, shaped like `run`.
+        `bundle` pins a specific bundle instead of the current one;
+        use_cache=False neither reads nor fills the result cache.
+        """
+        self.load()
+        with self.pinned_bundle(bundle) as bundle:
+            results = self._run_many(product_ids, use_cache)
+        for result in results:
+            result["bundle_version"] = bundle.version
+        return results
+
+    def _run_many(self, product_ids, use_cache=True):
+        results = [None] * len(product_ids)
+        ids = []
+        for i, raw in enumerate(product_ids):
+            try:
+                ids.append((i, int(raw)))
+            except (TypeError, ValueError):
+                results[i] = {"error": f"Invalid product_id: {raw}"}
+
+        if self.demand_model is None:
+            return [r or {"error": "Demand model not loaded. Please check model file."} for r in results]
+        if self.price_model is None:
+            return [r or {"error": "Price optimization model not loaded"} for r in results]
+
+        rows = []
+        hits = 0
+        for i, pid in ids:
+            cached = self.result_cache.get(self.cache_key(pid)) if use_cache else None
+            if cached is not None:
+                results[i] = cached
+                hits += 1
+                continue
+            if pid in self.feature_store:
+                rows.append((i, pid))
+            else:
+                results[i] = {"error": self.feature_store.not_found_message(pid)}
+        if use_cache:
+            metrics.inc(metrics.CACHE_LOOKUPS, hits, result="hit")
+            metrics.inc(metrics.CACHE_LOOKUPS, len(ids) - hits, result="miss")
+        if not rows:
+            return results
+
+        found_ids = [pid for _, pid in rows]
+
+        table = self.prediction_table()
+        precomputed = None
+        if table is not None:
+            # ---------- Agents 2 and 3 (precomputed) ----------
+            with metrics.timer(metrics.NODE_SECONDS, "prediction_table", node="prediction_table"):
+                precomputed = table.take(found_ids)
+        if precomputed is not None:
+            increasing, price_preds = precomputed
+            demand_errors, price_errors = {}, {}
+        else:
+            # ---------- Agent 2 (batched) ----------
+            demand_preds, demand_errors = self._predict_batch(
+                "demand", self.demand_model, self.feature_store.matrix("demand", found_ids)
+            )
+
+            # ---------- Agent 3 (batched) ----------
+            price_preds, price_errors = self._predict_batch(
+                "price", self.price_model, self.feature_store.matrix("price", found_ids)
+            )
+            increasing = np.array([p == 1 for p in demand_preds])
+
+        optimized = [
+            round(float(p) * (1.10 if up else 0.90), 2) if p is not None else None
+            for p, up in zip(price_preds, increasing)
+        ]
+
+        # ---------- Agent 4 (vectorized) ----------
+        with metrics.timer(metrics.NODE_SECONDS, "batch_inventory", node="batch_inventory"):
+            frame = self.feature_store.rows(found_ids)
+            plan = plan_inventory(increasing=increasing, **inventory_columns(frame))
+
+        # ---------- Agent 5 ----------
+        for j, (i, pid) in enumerate(rows):
+            if j in demand_errors:
+                results[i] = {"error": f"Prediction failed: {demand_errors[j]}"}
+                continue
+            if j in price_errors:
+                results[i] = {"error": f"Price prediction failed: {price_errors[j]}"}
+                continue
+            state = {
+                "product_id": pid,
+                "demand_forecast": "increasing" if increasing[j] else "decreasing",
+                "optimized_price": round(optimized[j], 2),
+                "avg_daily_demand": round(float(plan["avg_daily_demand"][j]), 2),
+                "safety_stock": round(float(plan["safety_stock"][j]), 2),
+                "reorder_point": round(float(plan["reorder_point"][j]), 2),
+                "current_stock": float(plan["current_stock"][j]),
+                "inventory_action": str(plan["inventory_action"][j]),
+                "suggested_reorder_qty": round(float(plan["suggested_reorder_qty"][j]), 0),
+            }
+            results[i] = self.final_summary_agent(state)
+            if use_cache:
+                self.result_cache.set(self.cache_key(pid), results[i])
+        return results
+
+    # ---------- Whole-Catalog Streaming ----------
+    def analyze_page(self, after=None, limit=500, version=None):
+        """(bundle_version, ids, results) for the next `limit` products with Product_ID > after.
+
+        Pass the version the first page returned to keep a whole export on
+        one bundle (see bundle_for). Export pages bypass the result cache,
+        which a catalog walk would only flush.
+        """
+        bundle = self.bundle_for(version)
+        ids = bundle.feature_store.ids_after(after, limit)
+        return bundle.version, ids, self.run_many(ids, bundle=bundle, use_cache=False)
+
+    def iter_catalog(self, after=None, chunk_size=500, bundle=None):
+        """Yield (product_id, result) per product, a chunk at a time, resuming after `after`.
+
+        The whole walk uses `bundle`, by default the one current when it
+        starts, so a reload midway doesn't mix versions in one export. It
+        bypasses the result cache.
+        """
+        bundle = bundle or self.bundle_for()
+        while True:
+            ids = bundle.feature_store.ids_after(after, chunk_size)
+            if not ids:
+                return
+            yield from zip(ids, self.run_many(ids, bundle=bundle, use_cache=False))
+            after = ids[-1]
+
+    # ---------- Whole-Catalog Inventory Report ----------
+    def inventory_report(self, actions=None):
+        """Reorder plan for every product (see inventory_engine.catalog_inventory_plan).
+
+        Returns (bundle_version, DataFrame).
+        """
+        self.load()
+        with self.pinned_bundle() as bundle:
+            if bundle.demand_model is None:
+                raise RuntimeError("Demand model not loaded. Please check model file.")
+            report = catalog_inventory_plan(bundle.feature_store, bundle.demand_model, actions)
+        return bundle.version, report
+
 
 # ---------- Run Example ----------
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds; agent nodes take microseconds, HTTP calls up to seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Spans for the X-Timing header of the current request (None unless asked for)
+_spans = contextvars.ContextVar("timing_spans", default=None)
+# Events recorded inside an inference worker, replayed by the caller (see collect)
+_events = contextvars.ContextVar("metric_events", default=None)
+
+_registry = {}
+_TRUTHY = (b"1", b"true", b"yes")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+        _registry[name] = self
+
+    def _key(self, labels) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            yield f"{self.name}_total{_label_text(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (the last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        yield from super().render()
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_label_text(self.labelnames, key, [le])} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}"
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in _registry.values() for line in metric.render()) + "\n"
+
+
+# ---------- Metrics ----------
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                         ("method", "route", "status"))
+NODE_SECONDS = Histogram("analyze_node_duration_seconds",
+                         "Time in each ProductOptimizer agent node, plus LangGraph's own overhead per run.",
+                         ("node",))
+PREDICT_SECONDS = Histogram("model_predict_duration_seconds", "Model predict() calls.", ("model", "mode"))
+CACHE_LOOKUPS = Counter("result_cache_lookups", "Result cache lookups by outcome.", ("result",))
+INFERENCE_WAIT_SECONDS = Histogram("inference_queue_wait_seconds",
+                                   "Time an inference call waited for a free worker.", ("method",))
+DB_SECONDS = Histogram("db_call_duration_seconds", "MongoDB calls made by request handlers.", ("op",))
+WS_SEND_SECONDS = Histogram("websocket_send_duration_seconds", "WebSocket send_text calls.")
+
+
+# ---------- Recording ----------
+def observe(histogram: Histogram, seconds: float, span=None, **labels):
+    """Record a duration; `span` also names it in the request's X-Timing header."""
+    events = _events.get()
+    if events is not None:
+        events.append((histogram.name, seconds, labels, span))
+        return
+    histogram.observe(seconds, **labels)
+    if span is not None:
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((span, seconds))
+
+
+def inc(counter: Counter, amount=1, **labels):
+    events = _events.get()
+    if events is not None:
+        events.append((counter.name, amount, labels, None))
+    else:
+        counter.inc(amount, **labels)
+
+
+@contextmanager
+def timer(histogram: Histogram, span=None, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(histogram, time.perf_counter() - start, span, **labels)
+
+
+async def timed_db(op: str, awaitable):
+    """Await a database call, recording its latency under `op`."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        observe(DB_SECONDS, time.perf_counter() - start, f"db.{op}", op=op)
+
+
+@contextmanager
+def collect():
+    """Buffer metric events instead of recording them, e.g. in an inference
+    worker process whose registry nobody scrapes. Pass the list to replay()."""
+    events = []
+    token = _events.set(events)
+    try:
+        yield events
+    finally:
+        _events.reset(token)
+
+
+def replay(events):
+    for name, value, labels, span in events:
+        metric = _registry[name]
+        if isinstance(metric, Counter):
+            inc(metric, value, **labels)
+        else:
+            observe(metric, value, span, **labels)
+
+
+@contextmanager
+def capture_spans():
+    """Collect X-Timing spans recorded in this block (for work shared by several requests)."""
+    spans = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+def add_spans(spans):
+    current = _spans.get()
+    if current is not None and spans:
+        current.extend(spans)
+
+
+def timing_header(spans, total: float) -> str:
+    """Server-Timing style value: `total;dur=12.41, agent2_demand;dur=0.32, ...` in ms.
+
+    Repeated spans (e.g. several DB calls) are summed.
+    """
+    merged = {}
+    for name, seconds in spans:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [("total", total)] + list(merged.items())
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in parts)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template.
+
+    A request sent with `X-Timing: 1` gets an X-Timing response header
+    breaking its server time down into the spans recorded while serving it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        wants_timing = any(name == b"x-timing" and value.lower() in _TRUTHY for name, value in scope["headers"])
+        spans = [] if wants_timing else None
+        token = _spans.set(spans)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_timing:
+                    value = timing_header(spans, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _spans.reset(token)
+            route = scope.get("route")
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                 route=getattr(route, "path", "unmatched"), status=status)
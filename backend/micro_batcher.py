@@ -0,0 +1,100 @@
+import asyncio
+import os
+from collections import deque
+
+import metrics
+
+# Collect single /analyze calls for up to this long, or until the batch is full.
+# Off by default: batched calls go through run_many, which skips the LangGraph
+# graph (so no per-node histograms, and OPTIMIZER_EXECUTION doesn't apply).
+ANALYZE_BATCHING = os.getenv("ANALYZE_BATCHING", "false").lower() in ("1", "true", "yes")
+ANALYZE_BATCH_WINDOW_MS = float(os.getenv("ANALYZE_BATCH_WINDOW_MS", 2))
+ANALYZE_BATCH_MAX = int(os.getenv("ANALYZE_BATCH_MAX", 64))
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-key calls into one batched call.
+
+    The distinct keys of a batch go to `run_many(keys)` together (e.g. one
+    feature matrix lookup and one predict per model). When nothing is in
+    flight a batch starts on the next loop tick, so an idle service adds no
+    delay; while a batch runs, new keys collect for up to `window_ms` (or
+    `max_size` keys). A key already waiting or in flight is not computed
+    twice: later callers share its result.
+    """
+
+    def __init__(self, run_many, window_ms=ANALYZE_BATCH_WINDOW_MS, max_size=ANALYZE_BATCH_MAX):
+        self.run_many = run_many
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._pending = []
+        self._futures = {}
+        self._timer = None
+        self._running = 0
+        self._tasks = set()  # strong references: the loop only keeps weak ones
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_keys = 0
+        self._batch_sizes = deque(maxlen=1024)
+
+    async def submit(self, key):
+        self.requests += 1
+        future = self._futures.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            # Mark the result retrieved even if every caller gave up waiting
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._futures[key] = future
+            self._pending.append(key)
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                delay = self.window if self._running else 0
+                self._timer = asyncio.get_running_loop().call_later(delay, self._flush)
+        # One caller cancelling must not cancel the shared computation
+        result, spans = await asyncio.shield(future)
+        metrics.add_spans(spans)  # every caller's X-Timing shows the batch that served it
+        return result
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._pending = self._pending, []
+        if keys:
+            task = asyncio.create_task(self._run(keys))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys):
+        self.batches += 1
+        self.batched_keys += len(keys)
+        self._batch_sizes.append(len(keys))
+        self._running += 1
+        try:
+            with metrics.capture_spans() as spans:
+                results = await self.run_many(keys)
+        except Exception as e:
+            for key in keys:
+                self._futures.pop(key).set_exception(e)
+            return
+        finally:
+            self._running -= 1
+        for key, result in zip(keys, results):
+            self._futures.pop(key).set_result((result, spans))
+
+    def stats(self) -> dict:
+        sizes = sorted(self._batch_sizes)
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_size,
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_keys / self.batches, 2) if self.batches else None,
+            "p99_batch_size": sizes[min(len(sizes) - 1, int(0.99 * len(sizes)))] if sizes else None,
+            "waiting": len(self._pending),
+        }
@@ -0,0 +1,107 @@
+import pickle
+import sys
+from datetime import datetime
+
+import joblib
+
+from dataset_cache import load_dataset, source_signature
+from feature_store import ProductFeatureStore
+from result_cache import file_fingerprint, text_fingerprint
+
+
+DATASET_PATH = "cleaned_sample_with_price_v3.csv"
+DEMAND_MODEL_PATH = "demand_trend_classifier.pkl"
+PRICE_MODEL_PATH = "price_optimization.joblib"
+
+
+def artifact_versions(dataset_path=DATASET_PATH, model_paths=(DEMAND_MODEL_PATH, PRICE_MODEL_PATH)):
+    """(dataset_version, model_fingerprint) of the files currently on disk."""
+    return text_fingerprint(source_signature(dataset_path)), file_fingerprint(model_paths)
+
+
+# ---------- Safe Demand Model Loader ----------
+def load_demand_model(path=DEMAND_MODEL_PATH):
+    import xgboost
+
+    demand_model = None
+    encoder = None
+    try:
+        sys.modules['XGBClassifier'] = xgboost.XGBClassifier  # alias fix
+
+        with open(path, "rb") as f:
+            obj = pickle.load(f)
+
+        if isinstance(obj, dict):
+            demand_model = obj.get("model", None)
+            encoder = obj.get("encoder", None)
+        else:
+            demand_model = obj
+
+    except Exception as e1:
+        try:
+            obj = joblib.load(path)
+            if isinstance(obj, dict):
+                demand_model = obj.get("model", None)
+                encoder = obj.get("encoder", None)
+            else:
+                demand_model = obj
+        except Exception as e2:
+            print("⚠️ Could not load demand model:", e1, e2)
+            demand_model = None
+
+    return demand_model, encoder
+
+
+# ---------- Load Price Optimization Model (.joblib) ----------
+def load_price_model(path=PRICE_MODEL_PATH):
+    try:
+        return joblib.load(path)
+    except Exception as e:
+        print("⚠️ Could not load price optimization model:", e)
+        return None
+
+
+class ModelBundle:
+    """Dataset and models that were loaded together.
+
+    A bundle is never mutated after construction; reloading builds a new
+    one and swaps the reference, so a request holding the old bundle
+    keeps a consistent view until it finishes.
+    """
+
+    def __init__(self, super_dataset, demand_model, encoder, price_model, dataset_version, model_fingerprint):
+        self.super_dataset = super_dataset
+        self.feature_store = ProductFeatureStore(super_dataset)
+        self.demand_model = demand_model
+        self.encoder = encoder
+        self.price_model = price_model
+        self.dataset_version = dataset_version
+        self.model_fingerprint = model_fingerprint
+        # Derived from the artifacts, so every worker process reports the same version
+        self.version = f"{dataset_version}.{model_fingerprint}"
+        self.loaded_at = datetime.utcnow()
+
+    @classmethod
+    def load(cls, dataset_path=DATASET_PATH, demand_model_path=DEMAND_MODEL_PATH,
+             price_model_path=PRICE_MODEL_PATH):
+        # Fingerprint first: a file replaced mid-load then shows up as changed on the next check
+        dataset_version, model_fingerprint = artifact_versions(dataset_path, (demand_model_path, price_model_path))
+        super_dataset = load_dataset(dataset_path)
+        demand_model, encoder = load_demand_model(demand_model_path)
+        price_model = load_price_model(price_model_path)
+        return cls(super_dataset, demand_model, encoder, price_model, dataset_version, model_fingerprint)
+
+    @property
+    def complete(self) -> bool:
+        return self.demand_model is not None and self.price_model is not None
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "dataset_version": self.dataset_version,
+            "model_fingerprint": self.model_fingerprint,
+            "loaded_at": self.loaded_at.isoformat(),
+            "products": len(self.feature_store),
+            "demand_model_loaded": self.demand_model is not None,
+            "price_model_loaded": self.price_model is not None,
+        }
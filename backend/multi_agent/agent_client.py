@@ -0,0 +1,220 @@
+# multi_agent/agent_client.py
+import asyncio
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+AGENT_HTTP_TIMEOUT = float(os.getenv("AGENT_HTTP_TIMEOUT", 30.0))  # seconds
+AGENT_CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", 5.0))
+AGENT_MAX_CONNECTIONS = int(os.getenv("AGENT_MAX_CONNECTIONS", 10))  # per endpoint
+AGENT_MAX_KEEPALIVE = int(os.getenv("AGENT_MAX_KEEPALIVE", 5))
+AGENT_HTTP2 = os.getenv("AGENT_HTTP2", "false").lower() in ("1", "true", "yes")
+AGENT_RETRIES = int(os.getenv("AGENT_RETRIES", 2))
+AGENT_RETRY_BACKOFF = float(os.getenv("AGENT_RETRY_BACKOFF", 0.2))  # seconds, doubled per attempt
+AGENT_HEDGE_AFTER = float(os.getenv("AGENT_HEDGE_AFTER", 0))  # seconds; 0 disables hedging
+AGENT_BREAKER_THRESHOLD = int(os.getenv("AGENT_BREAKER_THRESHOLD", 5))
+AGENT_BREAKER_RESET = float(os.getenv("AGENT_BREAKER_RESET", 30.0))  # seconds
+
+if AGENT_HTTP2:
+    try:
+        import h2  # noqa: F401
+    except ImportError:  # optional: httpx needs h2 for HTTP/2
+        logger.warning("AGENT_HTTP2 is set but the h2 package is missing; using HTTP/1.1")
+        AGENT_HTTP2 = False
+
+RETRYABLE_STATUS = {502, 503, 504}
+# Failures where the request never reached the agent, so a retry can't run a task twice
+NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AgentUnavailable(RuntimeError):
+    """The agent's circuit is open; it is treated as OFFLINE until a probe succeeds."""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failed calls; half-opens after `reset` seconds."""
+
+    def __init__(self, threshold=AGENT_BREAKER_THRESHOLD, reset=AGENT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset else "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> bool:
+        """Count a failure; True when this one opens (or re-opens) the circuit."""
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+class EndpointClient:
+    """Connection pool, concurrency cap and breaker for one agent endpoint."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            http2=AGENT_HTTP2,
+            timeout=httpx.Timeout(AGENT_HTTP_TIMEOUT, connect=AGENT_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=AGENT_MAX_CONNECTIONS,
+                                max_keepalive_connections=AGENT_MAX_KEEPALIVE),
+        )
+        # Callers beyond the pool size wait here instead of timing out in httpx
+        self.slots = asyncio.Semaphore(AGENT_MAX_CONNECTIONS)
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.in_flight = 0
+
+    async def _post_once(self, path: str, payload: dict) -> Dict[str, Any]:
+        async with self.slots:
+            self.in_flight += 1
+            try:
+                response = await self.http.post(path, json=payload)
+            finally:
+                self.in_flight -= 1
+        response.raise_for_status()
+        return response.json()
+
+    async def _post_retrying(self, path: str, payload: dict, idempotent: bool) -> Dict[str, Any]:
+        for attempt in range(AGENT_RETRIES + 1):
+            try:
+                return await self._post_once(path, payload)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, NOT_SENT) or (idempotent and (
+                    isinstance(e, httpx.TransportError) or e.response.status_code in RETRYABLE_STATUS))
+                if not retryable or attempt == AGENT_RETRIES:
+                    raise
+                self.retries += 1
+                # Full jitter, so agents recovering from a blip aren't hit in lockstep
+                await asyncio.sleep(random.uniform(0, AGENT_RETRY_BACKOFF * 2 ** attempt))
+
+    async def _post_hedged(self, path: str, payload: dict) -> Dict[str, Any]:
+        """Send a second copy if the first is slow; the first success wins."""
+        first = asyncio.create_task(self._post_retrying(path, payload, True))
+        done, _ = await asyncio.wait({first}, timeout=AGENT_HEDGE_AFTER)
+        if done:
+            return first.result()
+        self.hedges += 1
+        pending = {first, asyncio.create_task(self._post_retrying(path, payload, True))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+
+    async def post(self, path: str, payload: dict, idempotent: bool = False) -> Dict[str, Any]:
+        if not self.breaker.allow():
+            raise AgentUnavailable(f"Circuit open for {self.base_url}")
+        self.calls += 1
+        try:
+            if idempotent and AGENT_HEDGE_AFTER > 0:
+                result = await self._post_hedged(path, payload)
+            else:
+                result = await self._post_retrying(path, payload, idempotent)
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            self.failures += 1
+            if self.breaker.record_failure():
+                raise AgentUnavailable(f"Circuit opened for {self.base_url}: {e}") from e
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def probe(self) -> bool:
+        try:
+            response = await self.http.get("/health", timeout=AGENT_CONNECT_TIMEOUT)
+            return response.status_code < 500
+        except httpx.HTTPError:
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "hedges": self.hedges,
+        }
+
+
+class AgentClient:
+    """HTTP client for remote agents, with one EndpointClient per endpoint_url.
+
+    When an endpoint's circuit opens, `on_recover` is called once a
+    background probe of its /health succeeds again.
+    """
+
+    def __init__(self, on_recover: Optional[Callable[[str], None]] = None):
+        self.on_recover = on_recover
+        self._endpoints: Dict[str, EndpointClient] = {}
+        self._probes: Dict[str, asyncio.Task] = {}
+
+    def endpoint(self, base_url: str) -> EndpointClient:
+        base_url = base_url.rstrip("/")
+        if base_url not in self._endpoints:
+            self._endpoints[base_url] = EndpointClient(base_url)
+        return self._endpoints[base_url]
+
+    async def post(self, base_url: str, path: str, payload: dict, idempotent: bool = False,
+                   agent_id: Optional[str] = None) -> Dict[str, Any]:
+        endpoint = self.endpoint(base_url)
+        try:
+            return await endpoint.post(path, payload, idempotent)
+        except AgentUnavailable:
+            if agent_id is not None and agent_id not in self._probes:
+                self._probes[agent_id] = asyncio.create_task(self._probe_until_healthy(endpoint, agent_id))
+            raise
+
+    async def _probe_until_healthy(self, endpoint: EndpointClient, agent_id: str):
+        try:
+            while True:
+                await asyncio.sleep(endpoint.breaker.reset)
+                if await endpoint.probe():
+                    endpoint.breaker.record_success()
+                    logger.info(f"Agent endpoint {endpoint.base_url} recovered")
+                    if self.on_recover is not None:
+                        self.on_recover(agent_id)
+                    return
+        finally:
+            self._probes.pop(agent_id, None)
+
+    async def aclose(self):
+        for probe in list(self._probes.values()):
+            probe.cancel()
+        for endpoint in self._endpoints.values():
+            await endpoint.http.aclose()
+        self._endpoints.clear()
+
+    def stats(self) -> dict:
+        return {url: endpoint.stats() for url, endpoint in self._endpoints.items()}
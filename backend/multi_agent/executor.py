@@ -0,0 +1,209 @@
+# multi_agent/executor.py
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+from .agent_client import AgentUnavailable
+from .models import AgentStatus, Task, Workflow
+from .scheduler import NoMatchingAgent, agent_pool
+from .services import agent_service
+from .websocket import manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_MAX_CONCURRENCY = int(os.getenv("WORKFLOW_MAX_CONCURRENCY", 8))
+GLOBAL_TASK_CONCURRENCY = int(os.getenv("GLOBAL_TASK_CONCURRENCY", 64))
+# "queue": durable, via task_queue workers; "inline": WorkflowExecutor in this process
+WORKFLOW_EXECUTION = os.getenv("WORKFLOW_EXECUTION", "queue")
+
+
+class WorkflowCycleError(ValueError):
+    pass
+
+
+def task_keys(tasks: List[Task]) -> Dict[str, Task]:
+    """Lookup for dependency references, which may be a task's id or its name."""
+    by_key = {}
+    for task in tasks:
+        by_key[str(task.id)] = task
+        by_key.setdefault(task.name, task)
+    return by_key
+
+
+def topological_order(tasks: List[Task]) -> List[Task]:
+    """Tasks ordered so every task comes after its dependencies."""
+    by_key = task_keys(tasks)
+
+    indegree = {str(t.id): 0 for t in tasks}
+    dependents: Dict[str, List[Task]] = {str(t.id): [] for t in tasks}
+    for task in tasks:
+        for dep in task.dependencies:
+            if dep not in by_key:
+                raise WorkflowCycleError(f"Task {task.name} depends on unknown task {dep}")
+            dependents[str(by_key[dep].id)].append(task)
+            indegree[str(task.id)] += 1
+
+    order = []
+    ready = [t for t in tasks if indegree[str(t.id)] == 0]
+    while ready:
+        task = ready.pop(0)
+        order.append(task)
+        for child in dependents[str(task.id)]:
+            indegree[str(child.id)] -= 1
+            if indegree[str(child.id)] == 0:
+                ready.append(child)
+    if len(order) != len(tasks):
+        raise WorkflowCycleError("Workflow tasks have a dependency cycle")
+    return order
+
+
+class WorkflowExecutor:
+    """Runs workflows as DAGs of Tasks on the event loop.
+
+    A task starts as soon as all of its dependencies have completed, so
+    independent branches run side by side, bounded per workflow and across
+    all workflows. Agents come from the AgentPool, which runs one task per
+    agent at a time; with more agents, more of a wide workflow runs at once.
+    """
+
+    def __init__(self, service=agent_service, pool=agent_pool, per_workflow=WORKFLOW_MAX_CONCURRENCY,
+                 global_limit=GLOBAL_TASK_CONCURRENCY):
+        self.service = service
+        self.pool = pool
+        self.per_workflow = per_workflow
+        self.global_limit = global_limit
+        self._global = None
+        self._running: Dict[str, asyncio.Task] = {}
+
+    def is_running(self, workflow_id: str) -> bool:
+        return workflow_id in self._running
+
+    def start(self, workflow: Workflow) -> bool:
+        """Schedule `workflow` in the background; False if it is already running."""
+        workflow_id = str(workflow.id)
+        if workflow_id in self._running:
+            return False
+        job = asyncio.create_task(self.run(workflow))
+        self._running[workflow_id] = job
+        job.add_done_callback(lambda _: self._running.pop(workflow_id, None))
+        return True
+
+    async def shutdown(self):
+        jobs = list(self._running.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+
+    async def run(self, workflow: Workflow) -> str:
+        """Execute every task of `workflow`; returns the final workflow status."""
+        workflow_id = str(workflow.id)
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+
+        tasks = await Task.find(Task.workflow_id == workflow_id).to_list()
+        try:
+            order = topological_order(tasks)
+        except WorkflowCycleError as e:
+            logger.error(f"Workflow {workflow_id} cannot start: {e}")
+            await self._finish(workflow, "failed", error=str(e))
+            return workflow.status
+
+        workflow.status = "running"
+        await workflow.save()
+        await manager.send_to_workflow(workflow_id, {
+            "type": "workflow_started",
+            "workflow_id": workflow_id,
+            "total_tasks": len(tasks),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+        loop = asyncio.get_running_loop()
+        done: Dict[str, asyncio.Future] = {str(t.id): loop.create_future() for t in order}
+        by_key = task_keys(tasks)
+        local = asyncio.Semaphore(self.per_workflow)
+
+        async def run_task(task: Task):
+            ok = False
+            try:
+                # Wait for dependencies; any failure upstream skips this task
+                upstream = [done[str(by_key[dep].id)] for dep in task.dependencies]
+                if upstream and not all(await asyncio.gather(*upstream)):
+                    await self._set_status(task, "skipped")
+                    return
+                ok = await self._execute(workflow_id, task, local)
+            finally:
+                if not done[str(task.id)].done():
+                    done[str(task.id)].set_result(ok)
+
+        jobs = [asyncio.ensure_future(run_task(t)) for t in order]
+        try:
+            await asyncio.gather(*jobs)
+        except asyncio.CancelledError:
+            await self._finish(workflow, "cancelled")
+            raise
+        except Exception as e:
+            # e.g. the database went away mid-run: stop the rest and don't leave it "running"
+            logger.error(f"Workflow {workflow_id} aborted: {e}")
+            for job in jobs:
+                job.cancel()
+            await asyncio.gather(*jobs, return_exceptions=True)
+            await self._finish(workflow, "failed", error=str(e))
+            raise
+
+        completed = sum(1 for f in done.values() if f.result())
+        await self._finish(workflow, "completed" if completed == len(tasks) else "failed",
+                           completed=completed, total=len(tasks))
+        return workflow.status
+
+    async def _execute(self, workflow_id: str, task: Task, local) -> bool:
+        # Take the concurrency slots before the agent, so an agent is never
+        # held by a task that isn't allowed to run yet
+        async with local, self._global:
+            try:
+                agent = await self.pool.acquire(str(task.id), task.agent_id, task.agent_type,
+                                                task.required_capabilities)
+            except NoMatchingAgent as e:
+                await self._set_status(task, "failed", output={"error": str(e)})
+                return False
+
+            agent_status = AgentStatus.IDLE
+            try:
+                await self._set_status(task, "running")
+                try:
+                    result = await self.service.execute_task(agent, task)
+                except Exception as e:
+                    agent_status = AgentStatus.OFFLINE if isinstance(e, AgentUnavailable) else AgentStatus.ERROR
+                    logger.error(f"Task {task.id} in workflow {workflow_id} failed: {e}")
+                    await self._set_status(task, "failed", output={"error": str(e)})
+                    await manager.send_to_workflow(workflow_id, {
+                        "type": "task_failed",
+                        "task_id": str(task.id),
+                        "error": str(e),
+                        "timestamp": datetime.utcnow().isoformat()
+                    })
+                    return False
+            finally:
+                self.pool.release(agent, agent_status)
+        await self._set_status(task, "completed", output=result)
+        return True
+
+    async def _set_status(self, task: Task, status: str, output: Optional[dict] = None):
+        task.status = status
+        if output is not None:
+            task.output_data = output
+        await task.save()
+
+    async def _finish(self, workflow: Workflow, status: str, **details):
+        workflow.status = status
+        await workflow.save()
+        await manager.send_to_workflow(str(workflow.id), {
+            "type": f"workflow_{status}",
+            "workflow_id": str(workflow.id),
+            **details,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+
+# Global workflow executor instance
+workflow_executor = WorkflowExecutor()
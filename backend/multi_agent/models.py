@@ -1,5 +1,6 @@
 # multi_agent/models.py
 from beanie import Document
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -25,24 +26,50 @@ class Agent(Document):
     capabilities: List[str] = []
     current_task_id: Optional[str] = None
     endpoint_url: Optional[str] = None
+    # Which process's AgentPool is using the agent, until when (see scheduler.py)
+    claimed_by: Optional[str] = None
+    claim_expires_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "agents"
+        indexes = [
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("agent_type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
 class Task(Document):
     workflow_id: str
-    agent_id: str
+    # Either a specific agent, or any agent of agent_type with required_capabilities
+    agent_id: Optional[str] = None
+    agent_type: Optional[AgentType] = None
+    required_capabilities: List[str] = []
     name: str
     description: str
     status: str = "pending"
     input_data: Dict[str, Any] = {}
     output_data: Dict[str, Any] = {}
     dependencies: List[str] = []
+    # Safe to retry or hedge: running it twice has the same effect as once
+    idempotent: bool = False
+    # Client-supplied; adding a task twice with the same key returns the first one
+    idempotency_key: Optional[str] = None
+    # Task queue lease (see task_queue.py)
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "tasks"
+        indexes = [
+            IndexModel([("workflow_id", ASCENDING), ("status", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+            IndexModel([("workflow_id", ASCENDING), ("idempotency_key", ASCENDING)], unique=True,
+                       partialFilterExpression={"idempotency_key": {"$type": "string"}}),
+        ]
 
 class Workflow(Document):
     name: str
@@ -55,6 +82,10 @@ class Workflow(Document):
     
     class Settings:
         name = "workflows"
+        indexes = [
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
 class AgentCreate(BaseModel):
     name: str
@@ -67,3 +98,14 @@ class WorkflowCreate(BaseModel):
     name: str
     description: str
     goal: str
+
+class TaskCreate(BaseModel):
+    agent_id: Optional[str] = None
+    agent_type: Optional[AgentType] = None
+    required_capabilities: List[str] = []
+    name: str
+    description: str
+    input_data: Dict[str, Any] = {}
+    dependencies: List[str] = []
+    idempotent: bool = False
+    idempotency_key: Optional[str] = None
@@ -0,0 +1,71 @@
+# multi_agent/pagination.py
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pymongo import DESCENDING
+
+# Newest first; _id breaks ties between documents created in the same instant
+SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = json.dumps([doc["created_at"].isoformat(), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        created_at, oid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), ObjectId(oid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed) -> Optional[Dict[str, int]]:
+    """Mongo projection for a comma-separated field list; None means all fields."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # created_at is always needed to build the next cursor
+    return {name: 1 for name in names + ["created_at"]}
+
+
+async def paginate(collection, query: Dict[str, Any], limit: int, cursor: Optional[str] = None,
+                   projection: Optional[Dict[str, int]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One keyset page of `collection`, newest first, plus the cursor for the next page."""
+    if cursor:
+        created_at, oid = decode_cursor(cursor)
+        query = {**query, "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]}
+    docs = await collection.find(query, projection).sort(SORT).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    items = []
+    for doc in docs[:limit]:
+        doc["id"] = str(doc.pop("_id"))
+        items.append(doc)
+    return items, next_cursor
+
+
+def page_response(request: Request, items: List[Dict[str, Any]], next_cursor: Optional[str]) -> Response:
+    """JSON page with an ETag; answers 304 when the client already has this page."""
+    body = json.dumps(jsonable_encoder(items), separators=(",", ":")).encode()
+    etag = 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
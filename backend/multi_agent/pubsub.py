@@ -0,0 +1,232 @@
+# multi_agent/pubsub.py
+import asyncio
+import fcntl
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+# "local": this process only; "unix": relay over a Unix socket between
+# processes on one host; "mongo": tail a capped collection (works across hosts)
+WS_PUBSUB_BACKEND = os.getenv("WS_PUBSUB_BACKEND", "local")
+WS_PUBSUB_SOCKET = os.getenv("WS_PUBSUB_SOCKET", "/tmp/multi_agent_ws.sock")
+WS_PUBSUB_COLLECTION = os.getenv("WS_PUBSUB_COLLECTION", "ws_events")
+WS_PUBSUB_CAPPED_BYTES = int(os.getenv("WS_PUBSUB_CAPPED_BYTES", 16 * 1024 * 1024))
+# A relay peer with more than this much unsent data is dropped rather than buffered forever
+WS_RELAY_MAX_BUFFER = int(os.getenv("WS_RELAY_MAX_BUFFER", 32 * 1024 * 1024))
+MAX_LINE = 8 * 1024 * 1024  # largest single event on the Unix relay
+RELAY_BACKLOG = 1000  # events held while no hub is reachable
+
+ALL = "*"  # channel for send_to_all
+
+Deliver = Callable[[str, str], None]  # (channel, serialized message)
+
+
+class LocalPubSub:
+    """Delivers straight to this process's connections."""
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def publish(self, channel: str, text: str):
+        self.deliver(channel, text)
+
+    async def stop(self):
+        pass
+
+
+class UnixSocketPubSub(LocalPubSub):
+    """Relays events between processes on one host through a Unix socket.
+
+    One process (whoever holds the lock file) is the hub: it listens on the
+    socket and forwards every line it receives to all other processes.
+    The rest connect to it; if the hub exits, they elect a new one and
+    resend the last RELAY_BACKLOG events published meanwhile. Each
+    publisher delivers to its own connections directly, so local delivery
+    never waits on the relay.
+    """
+
+    def __init__(self, path=WS_PUBSUB_SOCKET):
+        super().__init__()
+        self.path = path
+        self._lock_file = None
+        self._server = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._upstream: Optional[asyncio.StreamWriter] = None
+        self._backlog = deque(maxlen=RELAY_BACKLOG)
+        self._runner = None
+
+    @property
+    def is_hub(self) -> bool:
+        return self._server is not None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+        for writer in list(self._peers) + ([self._upstream] if self._upstream else []):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _try_lock(self) -> bool:
+        lock_file = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _run(self):
+        while True:
+            if self._try_lock():
+                if os.path.exists(self.path):
+                    os.unlink(self.path)  # left behind by a hub that died
+                self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path, limit=MAX_LINE)
+                logger.info(f"WebSocket relay hub listening on {self.path}")
+                while self._backlog:
+                    self._forward(self._backlog.popleft())
+                await asyncio.Event().wait()  # serve until stopped
+            try:
+                reader, self._upstream = await asyncio.open_unix_connection(self.path, limit=MAX_LINE)
+            except OSError:
+                await asyncio.sleep(0.1)  # hub starting up
+                continue
+            while self._backlog:
+                self._upstream.write(self._backlog.popleft())
+            await self._read_lines(reader, source=None)
+            self._upstream = None
+            logger.warning("WebSocket relay hub went away; re-electing")
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            await self._read_lines(reader, source=writer)
+        except asyncio.CancelledError:
+            pass  # loop shutting down; end the handler quietly
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _read_lines(self, reader: asyncio.StreamReader, source):
+        while True:
+            try:
+                line = await reader.readline()
+            except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                return
+            if not line:
+                return
+            channel, _, text = line.decode().rstrip("\n").partition("\t")
+            self.deliver(channel, text)
+            if self.is_hub:
+                self._forward(line, skip=source)
+
+    def _forward(self, line: bytes, skip=None):
+        for peer in list(self._peers):
+            if peer is skip:
+                continue
+            if peer.transport.get_write_buffer_size() > WS_RELAY_MAX_BUFFER:
+                logger.warning("Dropping slow WebSocket relay peer")
+                self._peers.discard(peer)
+                peer.close()
+                continue
+            peer.write(line)
+
+    async def publish(self, channel: str, text: str):
+        self.deliver(channel, text)
+        # JSON text never contains a raw newline or tab
+        line = f"{channel.replace(chr(9), ' ')}\t{text}\n".encode()
+        if self.is_hub:
+            self._forward(line)
+        elif self._upstream is not None and not self._upstream.is_closing():
+            self._upstream.write(line)
+        else:
+            self._backlog.append(line)
+
+
+class MongoPubSub(LocalPubSub):
+    """Relays events through a capped collection that every process tails.
+
+    A tailable await cursor returns new documents as soon as they are
+    inserted. Unlike a change stream, it needs no replica set.
+    """
+
+    def __init__(self, collection_name=WS_PUBSUB_COLLECTION):
+        super().__init__()
+        self.collection_name = collection_name
+        self.origin = uuid.uuid4().hex
+        self.collection = None
+        self._tailer = None
+
+    async def start(self, deliver: Deliver):
+        from database import mongo
+
+        await super().start(deliver)
+        database = mongo.connect()
+        if self.collection_name not in await database.list_collection_names():
+            try:
+                await database.create_collection(self.collection_name, capped=True, size=WS_PUBSUB_CAPPED_BYTES)
+            except Exception:
+                pass  # created concurrently by another process
+        self.collection = database[self.collection_name]
+        self._tailer = asyncio.create_task(self._tail(datetime.utcnow()))
+
+    async def stop(self):
+        if self._tailer is not None:
+            self._tailer.cancel()
+            await asyncio.gather(self._tailer, return_exceptions=True)
+
+    async def _tail(self, since: datetime):
+        from pymongo import CursorType
+
+        # Resume by timestamp when the cursor dies; ObjectIds from different
+        # processes aren't ordered, so remember which events at `since` were seen
+        seen = set()
+        while True:
+            cursor = self.collection.find({"at": {"$gte": since}},
+                                          cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=500)
+            try:
+                while cursor.alive:
+                    async for doc in cursor:
+                        if doc["_id"] in seen:
+                            continue
+                        if doc["at"] > since:
+                            since, seen = doc["at"], set()
+                        seen.add(doc["_id"])
+                        if doc["origin"] != self.origin:
+                            self.deliver(doc["channel"], doc["text"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WebSocket relay tail failed: {e}")
+            await asyncio.sleep(0.1)
+
+    async def publish(self, channel: str, text: str):
+        self.deliver(channel, text)
+        await self.collection.insert_one(
+            {"channel": channel, "text": text, "origin": self.origin, "at": datetime.utcnow()})
+
+
+def create_pubsub(backend: str = WS_PUBSUB_BACKEND):
+    if backend == "unix":
+        return UnixSocketPubSub()
+    if backend == "mongo":
+        return MongoPubSub()
+    return LocalPubSub()
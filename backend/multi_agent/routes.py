@@ -1,64 +1,137 @@
 # multi_agent/routes.py
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import List
-from .models import Agent, Workflow, AgentCreate, WorkflowCreate
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Optional
+from .models import Agent, AgentStatus, AgentType, Task, Workflow, AgentCreate, TaskCreate, WorkflowCreate
+from .executor import WORKFLOW_EXECUTION, WorkflowCycleError, workflow_executor
+from .scheduler import agent_pool
+from .services import agent_service
+from .task_queue import task_queue
+from pymongo.errors import DuplicateKeyError
+from .pagination import page_response, paginate, parse_fields
+from security import current_user
+from metrics import timed_db
+from profiling import ProfiledRoute
 import logging
 
 logger = logging.getLogger(__name__)
 
-agent_router = APIRouter(prefix="/api/v1/agents", tags=["agents"])
-workflow_router = APIRouter(prefix="/api/v1/workflows", tags=["workflows"])
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+agent_router = APIRouter(prefix="/api/v1/agents", tags=["agents"], dependencies=[Depends(current_user)])
+workflow_router = APIRouter(prefix="/api/v1/workflows", tags=["workflows"], dependencies=[Depends(current_user)],
+                            route_class=ProfiledRoute)
 
 @agent_router.post("/register", response_model=Agent)
 async def register_agent(agent_data: AgentCreate):
     try:
         agent = Agent(**agent_data.dict())
-        await agent.create()
+        await timed_db("agents.insert", agent.create())
+        agent_pool.add(agent)
         logger.info(f"Agent {agent.name} registered successfully")
         return agent
     except Exception as e:
         logger.error(f"Failed to register agent: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-@agent_router.get("/", response_model=List[Agent])
-async def get_all_agents():
+async def list_page(request: Request, document, query: dict, limit: int, cursor: Optional[str], fields: Optional[str]):
+    """Keyset page of `document`, newest first; the next cursor is in X-Next-Cursor."""
     try:
-        return await Agent.find_all().to_list()
+        projection = parse_fields(fields, document.model_fields)
+        items, next_cursor = await timed_db(f"{document.Settings.name}.page", paginate(
+            document.get_motor_collection(), query, limit, cursor, projection))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Failed to get agents: {e}")
-        return []
+        logger.error(f"Failed to list {document.Settings.name}: {e}")
+        items, next_cursor = [], None
+    return page_response(request, items, next_cursor)
+
+@agent_router.get("/pool")
+async def get_agent_pool_stats():
+    return {**agent_pool.stats(), "endpoints": agent_service.client.stats()}
+
+@agent_router.get("/")
+async def get_all_agents(
+    request: Request,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[AgentStatus] = None,
+    agent_type: Optional[AgentType] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+):
+    query = {}
+    if status:
+        query["status"] = status.value
+    if agent_type:
+        query["agent_type"] = agent_type.value
+    return await list_page(request, Agent, query, limit, cursor, fields)
 
 @workflow_router.post("/", response_model=Workflow)
 async def create_workflow(workflow_data: WorkflowCreate):
     try:
         workflow = Workflow(**workflow_data.dict())
-        await workflow.create()
+        await timed_db("workflows.insert", workflow.create())
         logger.info(f"Workflow {workflow.name} created successfully")
         return workflow
     except Exception as e:
         logger.error(f"Failed to create workflow: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-@workflow_router.get("/", response_model=List[Workflow])
-async def get_workflows():
+@workflow_router.get("/")
+async def get_workflows(
+    request: Request,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+):
+    query = {"status": status} if status else {}
+    return await list_page(request, Workflow, query, limit, cursor, fields)
+
+@workflow_router.post("/{workflow_id}/tasks", response_model=Task)
+async def add_task(workflow_id: str, task_data: TaskCreate):
+    workflow = await timed_db("workflows.get", Workflow.get(workflow_id))
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
     try:
-        return await Workflow.find_all().to_list()
+        task = Task(workflow_id=workflow_id, **task_data.dict())
+        try:
+            await timed_db("tasks.insert", task.create())
+        except DuplicateKeyError:
+            # Retried request with the same idempotency key
+            return await timed_db("tasks.find_one", Task.find_one(
+                Task.workflow_id == workflow_id, Task.idempotency_key == task_data.idempotency_key))
+        workflow.task_ids.append(str(task.id))
+        if task.agent_id and task.agent_id not in workflow.agent_ids:
+            workflow.agent_ids.append(task.agent_id)
+        await timed_db("workflows.save", workflow.save())
+        return task
     except Exception as e:
-        logger.error(f"Failed to get workflows: {e}")
-        return []
+        logger.error(f"Failed to add task: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@workflow_router.get("/{workflow_id}/tasks")
+async def get_workflow_tasks(workflow_id: str):
+    return await timed_db("tasks.find", Task.find(Task.workflow_id == workflow_id).to_list())
 
 @workflow_router.post("/{workflow_id}/start")
-async def start_workflow(workflow_id: str, background_tasks: BackgroundTasks):
-    try:
-        workflow = await Workflow.get(workflow_id)
-        if not workflow:
-            raise HTTPException(status_code=404, detail="Workflow not found")
-        
-        # TODO: Add actual workflow execution logic here
-        workflow.status = "running"
-        await workflow.save()
-        
-        return {"message": "Workflow started", "workflow_id": workflow_id}
-    except Exception as e:
-        logger.error(f"Failed to start workflow: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def start_workflow(workflow_id: str):
+    workflow = await timed_db("workflows.get", Workflow.get(workflow_id))
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    # Tasks run in the background; progress is pushed to /ws/{workflow_id}
+    if WORKFLOW_EXECUTION == "queue":
+        try:
+            started = await timed_db("tasks.start_workflow", task_queue.start_workflow(workflow))
+        except WorkflowCycleError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        started = workflow_executor.start(workflow)
+    if not started:
+        raise HTTPException(status_code=409, detail="Workflow is already running")
+    return {"message": "Workflow started", "workflow_id": workflow_id, "execution": WORKFLOW_EXECUTION}
+
+@workflow_router.get("/queue/stats")
+async def get_task_queue_stats():
+    return await timed_db("tasks.queue_stats", task_queue.stats())
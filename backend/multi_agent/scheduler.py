@@ -0,0 +1,382 @@
+# multi_agent/scheduler.py
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from .models import Agent, AgentStatus, AgentType
+import logging
+
+logger = logging.getLogger(__name__)
+
+AGENT_STATUS_FLUSH_INTERVAL = float(os.getenv("AGENT_STATUS_FLUSH_INTERVAL", 1.0))  # seconds
+AGENT_POOL_REFRESH = float(os.getenv("AGENT_POOL_REFRESH", 30.0))  # seconds
+# A claim not renewed for this long (its process died) can be taken over
+AGENT_CLAIM_TTL = float(os.getenv("AGENT_CLAIM_TTL", 30.0))  # seconds
+# How long a process keeps an agent's claim after releasing it, so its next
+# dispatch to that agent needs no round trip; other processes wait that long
+AGENT_CLAIM_LINGER = float(os.getenv("AGENT_CLAIM_LINGER", 2.0))  # seconds
+
+
+class NoMatchingAgent(LookupError):
+    pass
+
+
+class _Slot:
+    """One agent as seen by the pool."""
+
+    def __init__(self, agent: Agent):
+        self.agent = agent
+        self.busy = False
+        self.busy_since = 0.0
+        self.busy_seconds = 0.0
+        self.dispatched = 0
+        self.tracked_since = time.monotonic()
+        # Another process held the claim last time we tried; don't retry before this
+        self.elsewhere_until = 0.0
+        self.released_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.agent.status != AgentStatus.OFFLINE
+
+    def claimable(self, owner: str, now: float) -> bool:
+        """Idle here and, as far as we know, not claimed by another process."""
+        if self.busy or self.elsewhere_until > now:
+            return False
+        claimed_by, expires_at = self.agent.claimed_by, self.agent.claim_expires_at
+        return claimed_by in (None, owner) or expires_at is None or expires_at < datetime.utcnow()
+
+    def holds_claim(self, owner: str, margin: float) -> bool:
+        """Whether our claim in Mongo stays live for at least `margin` more seconds."""
+        expires_at = self.agent.claim_expires_at
+        return (self.agent.claimed_by == owner and expires_at is not None
+                and expires_at > datetime.utcnow() + timedelta(seconds=margin))
+
+    def matches(self, agent_id=None, agent_type=None, capabilities: Iterable[str] = ()) -> bool:
+        if agent_id is not None:
+            return str(self.agent.id) == agent_id
+        if agent_type is not None and self.agent.agent_type != agent_type:
+            return False
+        return set(capabilities) <= set(self.agent.capabilities)
+
+    def utilization(self, now: float) -> float:
+        busy = self.busy_seconds + (now - self.busy_since if self.busy else 0.0)
+        elapsed = now - self.tracked_since
+        return round(busy / elapsed, 4) if elapsed > 0 else 0.0
+
+
+class AgentPool:
+    """Live, in-memory view of the registered agents that hands out idle ones.
+
+    Agents are read from Mongo at startup and re-read every
+    AGENT_POOL_REFRESH seconds. `acquire` returns the least-loaded idle
+    agent matching an id, a type and/or capabilities, or queues the caller
+    (FIFO) until one is released.
+
+    Several processes (API and task workers) each have a pool, so an agent
+    is also claimed in Mongo (`claimed_by`) with one conditional update
+    before this process first hands it out. The claim is kept while the
+    agent is in use and for AGENT_CLAIM_LINGER seconds after its release,
+    so back-to-back dispatches here cost no round trip; the flush loop
+    renews live claims and gives up lingering ones in one batch each. The
+    trade-off: another process waits up to linger + `flush_interval` for
+    an agent this one just used, and retries it every `flush_interval`.
+    Claims of a dead process lapse after AGENT_CLAIM_TTL. Status changes
+    are applied in memory right away and written back in batches.
+    """
+
+    def __init__(self, flush_interval=AGENT_STATUS_FLUSH_INTERVAL, refresh_interval=AGENT_POOL_REFRESH,
+                 claim_ttl=AGENT_CLAIM_TTL, claim_linger=AGENT_CLAIM_LINGER):
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self.claim_ttl = claim_ttl
+        self.claim_linger = claim_linger
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._slots: Dict[str, _Slot] = {}
+        self._by_type: Dict[AgentType, List[_Slot]] = {}
+        self._waiters = deque()
+        self._dirty: Dict[str, dict] = {}
+        self._waits = deque(maxlen=1024)
+        self._flusher = None
+        self.claim_round_trips = 0
+        self.claims_reused = 0
+        self.claim_conflicts = 0
+
+    # ---------- lifecycle ----------
+    async def start(self):
+        await self.refresh()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    async def refresh(self):
+        """Pick up agents registered or changed elsewhere (one query)."""
+        for agent in await Agent.find_all().to_list():
+            self.add(agent)
+
+    def add(self, agent: Agent):
+        agent_id = str(agent.id)
+        slot = self._slots.get(agent_id)
+        if slot is None:
+            slot = _Slot(agent)
+            self._slots[agent_id] = slot
+            self._by_type.setdefault(agent.agent_type, []).append(slot)
+            self._hand_off(slot)
+        elif not slot.busy and agent_id not in self._dirty:
+            slot.agent = agent
+            self._hand_off(slot)
+
+    # ---------- dispatch ----------
+    def _candidates(self, agent_id=None, agent_type=None, capabilities=()) -> List[_Slot]:
+        if agent_id is not None:
+            slots = [self._slots[agent_id]] if agent_id in self._slots else []
+        elif agent_type is not None:
+            slots = self._by_type.get(agent_type, [])
+        else:
+            slots = self._slots.values()
+        return [s for s in slots if s.available and s.matches(agent_id, agent_type, capabilities)]
+
+    async def acquire(self, task_id: Optional[str] = None, agent_id: Optional[str] = None,
+                      agent_type: Optional[AgentType] = None, capabilities: Iterable[str] = ()) -> Agent:
+        """Reserve an agent for `task_id`, waiting while all matching agents are busy."""
+        capabilities = tuple(capabilities)
+        requirements = (agent_id, agent_type, capabilities)
+        queued_at = time.monotonic()
+        while True:
+            candidates = self._candidates(*requirements)
+            if not candidates:
+                raise NoMatchingAgent(f"No available agent for id={agent_id} type={agent_type} "
+                                      f"capabilities={list(capabilities)}")
+            now = time.monotonic()
+            idle = [s for s in candidates if s.claimable(self.owner, now)]
+            if idle:
+                slot = min(idle, key=lambda s: (s.busy_seconds, s.dispatched))
+                self._reserve(slot)
+            else:
+                slot = await self._wait(requirements)
+                if slot is None:
+                    continue  # poll again for agents other processes may have released
+            # Still ours from an earlier dispatch (renewed by the flush loop): no round trip
+            if slot.holds_claim(self.owner, 2 * self.flush_interval):
+                self.claims_reused += 1
+                slot.dispatched += 1
+                self._set_status(slot, AgentStatus.BUSY, task_id)
+                self._waits.append(time.monotonic() - queued_at)
+                return slot.agent
+            try:
+                claimed = await self._claim(slot, task_id)
+            except BaseException:
+                self._unreserve(slot)
+                raise
+            if claimed:
+                self._waits.append(time.monotonic() - queued_at)
+                return slot.agent
+            self.claim_conflicts += 1
+            slot.elsewhere_until = time.monotonic() + self.flush_interval
+            self._unreserve(slot)
+
+    async def _wait(self, requirements) -> Optional[_Slot]:
+        """A slot released here (already reserved for us), or None after `flush_interval`."""
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, requirements)
+        self._waiters.append(entry)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), self.flush_interval)
+        except asyncio.TimeoutError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                return None
+            return waiter.result()  # handed over just as the timeout fired
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            elif waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._unreserve(waiter.result())
+            raise
+
+    async def _claim(self, slot: _Slot, task_id) -> bool:
+        """Atomically take the agent in Mongo unless another live process holds it."""
+        self.claim_round_trips += 1
+        now = datetime.utcnow()
+        fields = {"status": AgentStatus.BUSY.value, "current_task_id": task_id,
+                  "claimed_by": self.owner, "claim_expires_at": now + timedelta(seconds=self.claim_ttl)}
+        result = await Agent.get_motor_collection().update_one(
+            {"_id": slot.agent.id, "status": {"$ne": AgentStatus.OFFLINE.value},
+             "$or": [{"claimed_by": {"$in": [None, self.owner]}}, {"claim_expires_at": {"$lt": now}}]},
+            {"$set": fields})
+        if not result.matched_count:
+            return False
+        # This write supersedes any batched one still pending (e.g. our last release)
+        self._dirty.pop(str(slot.agent.id), None)
+        slot.dispatched += 1
+        slot.agent.status = AgentStatus.BUSY
+        slot.agent.current_task_id = task_id
+        slot.agent.claimed_by = self.owner
+        slot.agent.claim_expires_at = fields["claim_expires_at"]
+        return True
+
+    def release(self, agent: Agent, status: AgentStatus = AgentStatus.IDLE):
+        """Return `agent` to the pool with its new status (IDLE, ERROR or OFFLINE)."""
+        slot = self._slots.get(str(agent.id))
+        if slot is None or not slot.busy:
+            return
+        self._unreserve(slot)
+        slot.released_at = time.monotonic()
+        if status == AgentStatus.IDLE and self.claim_linger > 0:
+            self._set_status(slot, status, None)  # the claim lingers, see _drop_lingering_claims
+        else:
+            self._drop_claim(slot)
+            self._set_status(slot, status, None)
+        self._hand_off(slot)
+
+    def set_status(self, agent_id: str, status: AgentStatus):
+        """Change an idle agent's status, e.g. back to IDLE once an OFFLINE agent recovers."""
+        slot = self._slots.get(agent_id)
+        if slot is None or slot.busy:
+            return
+        self._set_status(slot, status, None)
+        self._hand_off(slot)
+
+    def _hand_off(self, slot: _Slot):
+        """Give a freed agent straight to the oldest waiter it can serve."""
+        if not slot.available:
+            self._fail_unservable()
+            return
+        if slot.busy:
+            return
+        for entry in self._waiters:
+            waiter, (agent_id, agent_type, capabilities) = entry
+            if waiter.done() or not slot.matches(agent_id, agent_type, capabilities):
+                continue
+            self._waiters.remove(entry)
+            self._reserve(slot)
+            waiter.set_result(slot)
+            return
+
+    def _fail_unservable(self):
+        """Wake waiters that no available agent can serve any more (e.g. it went OFFLINE)."""
+        for entry in list(self._waiters):
+            waiter, requirements = entry
+            if not waiter.done() and not self._candidates(*requirements):
+                self._waiters.remove(entry)
+                waiter.set_exception(NoMatchingAgent(f"No available agent for {requirements}"))
+
+    @staticmethod
+    def _reserve(slot: _Slot):
+        slot.busy = True
+        slot.busy_since = time.monotonic()
+
+    @staticmethod
+    def _unreserve(slot: _Slot):
+        slot.busy = False
+        slot.busy_seconds += time.monotonic() - slot.busy_since
+
+    def _set_status(self, slot: _Slot, status: AgentStatus, task_id):
+        slot.agent.status = status
+        slot.agent.current_task_id = task_id
+        self._dirty.setdefault(str(slot.agent.id), {}).update(status=status.value, current_task_id=task_id)
+
+    def _drop_claim(self, slot: _Slot):
+        slot.agent.claimed_by = None
+        slot.agent.claim_expires_at = None
+        self._dirty.setdefault(str(slot.agent.id), {}).update(claimed_by=None, claim_expires_at=None)
+
+    def _drop_lingering_claims(self) -> List[_Slot]:
+        """Give up claims idle past the linger time; return the claims still held."""
+        now = time.monotonic()
+        held = []
+        for slot in self._slots.values():
+            if slot.agent.claimed_by != self.owner:
+                continue
+            if slot.busy or now - slot.released_at < self.claim_linger:
+                held.append(slot)
+            else:
+                self._drop_claim(slot)
+        return held
+
+    # ---------- persistence ----------
+    async def flush(self):
+        """Renew our live claims, give up lingering ones and write pending status
+        changes, each in one request."""
+        collection = Agent.get_motor_collection()
+        held = self._drop_lingering_claims()
+        if held:
+            expires_at = datetime.utcnow() + timedelta(seconds=self.claim_ttl)
+            try:
+                result = await collection.update_many(
+                    {"_id": {"$in": [s.agent.id for s in held]}, "claimed_by": self.owner},
+                    {"$set": {"claim_expires_at": expires_at}})
+            except Exception as e:
+                logger.error(f"Failed to renew agent claims: {e}")
+            else:
+                # If one lapsed and was taken over, the next dispatch of each re-claims in Mongo
+                renewed = result.matched_count == len(held)
+                for slot in held:
+                    slot.agent.claim_expires_at = expires_at if renewed else None
+        if not self._dirty:
+            return
+        pending, self._dirty = self._dirty, {}
+        # Never overwrite an agent another process has claimed since
+        ops = [UpdateOne({"_id": ObjectId(agent_id), "claimed_by": {"$in": [None, self.owner]}}, {"$set": fields})
+               for agent_id, fields in pending.items()]
+        try:
+            await collection.bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.error(f"Failed to write agent statuses: {e}")
+            self._dirty = {**pending, **self._dirty}
+
+    async def _flush_loop(self):
+        last_refresh = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - last_refresh >= self.refresh_interval:
+                last_refresh = time.monotonic()
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error(f"Failed to refresh agent pool: {e}")
+
+    # ---------- metrics ----------
+    def stats(self) -> dict:
+        now = time.monotonic()
+        waits = sorted(self._waits)
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2) if waits else None
+
+        return {
+            "agents": len(self._slots),
+            "busy": sum(1 for s in self._slots.values() if s.busy),
+            "queued": len(self._waiters),
+            "claims": {"round_trips": self.claim_round_trips, "reused": self.claims_reused,
+                       "conflicts": self.claim_conflicts},
+            "queue_wait_ms": {"p50": pct(0.5), "p99": pct(0.99), "samples": len(waits)},
+            "pending_writes": len(self._dirty),
+            "per_agent": {
+                agent_id: {
+                    "name": s.agent.name,
+                    "agent_type": s.agent.agent_type,
+                    "status": s.agent.status,
+                    "dispatched": s.dispatched,
+                    "utilization": s.utilization(now),
+                }
+                for agent_id, s in self._slots.items()
+            },
+        }
+
+
+# Global agent pool instance
+agent_pool = AgentPool()
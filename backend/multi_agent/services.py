@@ -1,9 +1,10 @@
 # multi_agent/services.py
 import asyncio
-import httpx
 from typing import Dict, Any, List
 from datetime import datetime
-from .models import Agent, Task, Workflow, AgentStatus
+from .agent_client import AgentClient
+from .models import Agent, AgentStatus, Task, Workflow
+from .scheduler import agent_pool
 from .websocket import manager
 import logging
 
@@ -11,15 +12,15 @@ logger = logging.getLogger(__name__)
 
 class AgentService:
     def __init__(self):
-        self.http_client = httpx.AsyncClient(timeout=30.0)
+        # Pooled per endpoint, with retries and a circuit breaker (AGENT_* env vars)
+        self.client = AgentClient(on_recover=lambda agent_id: agent_pool.set_status(agent_id, AgentStatus.IDLE))
+
+    async def aclose(self):
+        await self.client.aclose()
     
     async def execute_task(self, agent: Agent, task: Task) -> Dict[str, Any]:
-        """Execute task using agent"""
+        """Execute task using agent (reserved via scheduler.agent_pool, which tracks its status)"""
         try:
-            # Update statuses
-            agent.status = AgentStatus.BUSY
-            await agent.save()
-            
             # Notify frontend
             await manager.send_to_workflow(task.workflow_id, {
                 "type": "task_started",
@@ -35,10 +36,6 @@ class AgentService:
             else:
                 result = await self.mock_execution(agent, task)
             
-            # Update completion
-            agent.status = AgentStatus.IDLE
-            await agent.save()
-            
             # Notify completion
             await manager.send_to_workflow(task.workflow_id, {
                 "type": "task_completed",
@@ -52,8 +49,6 @@ class AgentService:
             
         except Exception as e:
             logger.error(f"Task execution failed: {e}")
-            agent.status = AgentStatus.ERROR
-            await agent.save()
             raise e
     
     async def call_langgraph_agent(self, agent: Agent, task: Task) -> Dict[str, Any]:
@@ -63,15 +58,14 @@ class AgentService:
             "task_name": task.name,
             "description": task.description,
             "input_data": task.input_data,
-            "agent_type": agent.agent_type
+            "agent_type": agent.agent_type,
+            # Stable across re-deliveries so the agent can drop duplicate runs
+            "idempotency_key": task.idempotency_key or str(task.id),
+            "attempt": task.attempts
         }
         
-        response = await self.http_client.post(
-            f"{agent.endpoint_url}/execute",
-            json=payload
-        )
-        response.raise_for_status()
-        return response.json()
+        return await self.client.post(agent.endpoint_url, "/execute", payload,
+                                      idempotent=task.idempotent, agent_id=str(agent.id))
     
     async def mock_execution(self, agent: Agent, task: Task) -> Dict[str, Any]:
         """Mock execution for testing"""
@@ -0,0 +1,66 @@
+"""Stand-in for a remote LangGraph agent, for running workflows offline.
+
+    cd backend
+    python -m multi_agent.stub_agent --port 9001 --latency 0.5 --failure-rate 0.1
+
+Register it with endpoint_url=http://localhost:9001. POST /execute answers
+like a real agent after `latency` seconds (plus jitter) and fails with a 503
+at `failure-rate`. POST /admin/down and /admin/up toggle a hard outage, to
+watch the circuit breaker open and recover.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime
+
+from fastapi import FastAPI, HTTPException
+
+
+def create_app(latency=0.2, jitter=0.1, failure_rate=0.0) -> FastAPI:
+    app = FastAPI(title="Stub agent")
+    state = {"down": False, "calls": 0}
+
+    @app.get("/health")
+    async def health():
+        if state["down"]:
+            raise HTTPException(status_code=503, detail="down")
+        return {"status": "ok", "calls": state["calls"]}
+
+    @app.post("/execute")
+    async def execute(payload: dict):
+        state["calls"] += 1
+        if state["down"]:
+            raise HTTPException(status_code=503, detail="down")
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        if random.random() < failure_rate:
+            raise HTTPException(status_code=503, detail="injected failure")
+        return {
+            "status": "success",
+            "message": f"Stub completed {payload.get('task_name')}",
+            "data": {"task_id": payload.get("task_id"), "processed_at": datetime.utcnow().isoformat()},
+        }
+
+    @app.post("/admin/down")
+    async def down():
+        state["down"] = True
+        return state
+
+    @app.post("/admin/up")
+    async def up():
+        state["down"] = False
+        return state
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.jitter, args.failure_rate), host=args.host, port=args.port)
@@ -0,0 +1,297 @@
+# multi_agent/task_queue.py
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from .agent_client import AgentUnavailable
+from .executor import task_keys, topological_order
+from .models import AgentStatus, Task, Workflow
+from .scheduler import NoMatchingAgent, agent_pool
+from .services import agent_service
+from .websocket import manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", 60))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", 3))
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", 0.5))  # seconds, when the queue is empty
+TASK_WORKER_CONCURRENCY = int(os.getenv("TASK_WORKER_CONCURRENCY", 8))
+
+TERMINAL = ("completed", "failed", "skipped")
+
+
+class TaskQueue:
+    """Durable queue over the `tasks` collection.
+
+    A task is `pending` until its dependencies complete, then `queued`.
+    Workers claim it atomically (status `running` plus a lease), renew the
+    lease while it runs, and complete or fail it under that lease. A task
+    whose lease expires (its worker died) is claimed again by another
+    worker, up to TASK_MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, lease_seconds=TASK_LEASE_SECONDS, max_attempts=TASK_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _tasks():
+        return Task.get_motor_collection()
+
+    # ---------- producers ----------
+    async def start_workflow(self, workflow: Workflow) -> bool:
+        """Queue the workflow's root tasks; False if it is already running."""
+        workflow_id = str(workflow.id)
+        tasks = await Task.find(Task.workflow_id == workflow_id).to_list()
+        topological_order(tasks)  # raises WorkflowCycleError before anything is queued
+
+        # Atomic across API processes: only one caller flips the workflow to running
+        claimed = await Workflow.get_motor_collection().update_one(
+            {"_id": workflow.id, "status": {"$ne": "running"}},
+            {"$set": {"status": "running"}})
+        if not claimed.modified_count:
+            return False
+        await self._tasks().update_many(
+            {"workflow_id": workflow_id},
+            {"$set": {"status": "pending", "attempts": 0, "lease_owner": None, "lease_expires_at": None}})
+        await manager.send_to_workflow(workflow_id, {
+            "type": "workflow_started",
+            "workflow_id": workflow_id,
+            "total_tasks": len(tasks),
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        await self.advance(workflow_id)
+        return True
+
+    async def advance(self, workflow_id: str):
+        """Queue tasks whose dependencies completed, skip those whose dependencies
+        failed, and close the workflow once every task is terminal.
+
+        Every write is conditional on the current status, so concurrent
+        workers advancing the same workflow can't double-apply a transition.
+        """
+        tasks = await Task.find(Task.workflow_id == workflow_id).to_list()
+        by_key = task_keys(tasks)
+        changed = True
+        while changed:
+            changed = False
+            for task in tasks:
+                if task.status != "pending":
+                    continue
+                missing = [dep for dep in task.dependencies if dep not in by_key]
+                if missing:
+                    # Added after the start with a reference start_workflow never validated
+                    await self._tasks().update_one(
+                        {"_id": task.id, "status": "pending"},
+                        {"$set": {"status": "failed",
+                                  "output_data": {"error": f"Depends on unknown task {missing[0]}"}}})
+                    task.status = "failed"
+                    changed = True
+                    continue
+                upstream = [by_key[dep].status for dep in task.dependencies]
+                if all(status == "completed" for status in upstream):
+                    new_status = "queued"
+                elif any(status in ("failed", "skipped") for status in upstream):
+                    new_status = "skipped"
+                else:
+                    continue
+                await self._tasks().update_one({"_id": task.id, "status": "pending"},
+                                                {"$set": {"status": new_status}})
+                task.status = new_status
+                changed = True
+
+        # A workflow without tasks completes at once, as in WorkflowExecutor
+        if all(t.status in TERMINAL for t in tasks):
+            completed = sum(1 for t in tasks if t.status == "completed")
+            status = "completed" if completed == len(tasks) else "failed"
+            closed = await Workflow.get_motor_collection().update_one(
+                {"_id": ObjectId(workflow_id), "status": "running"},
+                {"$set": {"status": status}})
+            if closed.modified_count:
+                await manager.send_to_workflow(workflow_id, {
+                    "type": f"workflow_{status}",
+                    "workflow_id": workflow_id,
+                    "completed": completed,
+                    "total": len(tasks),
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+
+    # ---------- consumers ----------
+    async def claim(self, worker_id: str) -> Optional[Task]:
+        """Atomically lease the oldest runnable task, or re-deliver an expired lease."""
+        now = datetime.utcnow()
+        doc = await self._tasks().find_one_and_update(
+            {"$or": [{"status": "queued"},
+                     {"status": "running", "lease_expires_at": {"$lt": now}}]},
+            {"$set": {"status": "running", "lease_owner": worker_id,
+                      "lease_expires_at": now + timedelta(seconds=self.lease_seconds)},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER)
+        return Task.model_validate(doc) if doc else None
+
+    async def renew(self, task: Task, worker_id: str) -> bool:
+        """Extend the lease; False once another worker owns the task or it finished."""
+        result = await self._tasks().update_one(
+            {"_id": task.id, "lease_owner": worker_id, "status": "running"},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}})
+        # matched, not modified: a renewal within the same millisecond changes nothing but still holds
+        return bool(result.matched_count)
+
+    async def complete(self, task: Task, worker_id: str, output: Dict[str, Any]) -> bool:
+        """Record the result; False if the lease was lost and another worker owns the task."""
+        result = await self._tasks().update_one(
+            {"_id": task.id, "lease_owner": worker_id, "status": "running"},
+            {"$set": {"status": "completed", "output_data": output, "lease_expires_at": None}})
+        if result.modified_count:
+            await self.advance(task.workflow_id)
+        return bool(result.modified_count)
+
+    async def fail(self, task: Task, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Put the task back in the queue, or fail it for good after max attempts."""
+        final = not retry or task.attempts >= self.max_attempts
+        result = await self._tasks().update_one(
+            {"_id": task.id, "lease_owner": worker_id, "status": "running"},
+            {"$set": {"status": "failed" if final else "queued", "output_data": {"error": error},
+                      "lease_owner": None, "lease_expires_at": None}})
+        if result.modified_count and final:
+            await manager.send_to_workflow(task.workflow_id, {
+                "type": "task_failed",
+                "task_id": str(task.id),
+                "error": error,
+                "attempts": task.attempts,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+            await self.advance(task.workflow_id)
+        return bool(result.modified_count)
+
+    async def stats(self) -> dict:
+        counts = await self._tasks().aggregate([{"$group": {"_id": "$status", "n": {"$sum": 1}}}]).to_list(None)
+        expired = await self._tasks().count_documents(
+            {"status": "running", "lease_expires_at": {"$lt": datetime.utcnow()}})
+        return {"by_status": {c["_id"]: c["n"] for c in counts}, "expired_leases": expired}
+
+
+class TaskWorker:
+    """Claims tasks from the queue and runs them with AgentService.execute_task.
+
+    Runs inside the API process (see main.py) and/or as separate processes
+    (python -m multi_agent.worker); every worker polls the same collection,
+    so adding workers adds throughput.
+    """
+
+    def __init__(self, queue: "TaskQueue" = None, concurrency=TASK_WORKER_CONCURRENCY,
+                 poll_interval=TASK_POLL_INTERVAL, service=agent_service, pool=agent_pool):
+        self.queue = queue or task_queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.service = service
+        self.pool = pool
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processed = 0
+        self._loop_task = None
+        self._running = set()
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop claiming; in-flight tasks are cancelled and their leases expire for re-delivery."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        for job in list(self._running):
+            job.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            try:
+                task = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Task claim failed: {e}")
+                task = None
+            if task is None:
+                slots.release()
+                await asyncio.sleep(self.poll_interval)
+                continue
+            job = asyncio.create_task(self._process(task))
+            self._running.add(job)
+            job.add_done_callback(lambda j: (self._running.discard(j), slots.release()))
+
+    async def _keep_lease(self, task: Task, job: asyncio.Task):
+        """Renew the lease until cancelled. Renewal errors are retried; once the
+        lease is lost (taken over, or not renewed before it ran out) `job` is
+        cancelled, since its result could no longer be recorded."""
+        interval = self.queue.lease_seconds / 3
+        held_until = time.monotonic() + self.queue.lease_seconds
+        delay = interval
+        while True:
+            await asyncio.sleep(delay)
+            sent_at = time.monotonic()
+            try:
+                if not await self.queue.renew(task, self.worker_id):
+                    logger.warning(f"Lost lease on task {task.id} to another worker; stopping it")
+                    break
+                held_until, delay = sent_at + self.queue.lease_seconds, interval
+            except Exception as e:
+                delay = min(interval, 1.0)
+                if time.monotonic() + delay >= held_until:
+                    logger.error(f"Could not renew the lease on task {task.id} before it expired ({e}); stopping it")
+                    break
+                logger.warning(f"Lease renewal for task {task.id} failed, retrying: {e}")
+        job.cancel()
+
+    async def _process(self, task: Task):
+        if task.attempts > self.queue.max_attempts:
+            await self.queue.fail(task, self.worker_id, "Too many delivery attempts", retry=False)
+            return
+        # Renew from the moment of the claim: waiting for a busy agent can outlast the lease
+        lease = asyncio.create_task(self._keep_lease(task, asyncio.current_task()))
+        error, retry = None, True
+        try:
+            try:
+                agent = await self.pool.acquire(str(task.id), task.agent_id, task.agent_type,
+                                                task.required_capabilities)
+            except NoMatchingAgent as e:
+                error, retry = str(e), False
+            else:
+                agent_status = AgentStatus.IDLE
+                try:
+                    result = await self.service.execute_task(agent, task)
+                except Exception as e:
+                    agent_status = AgentStatus.OFFLINE if isinstance(e, AgentUnavailable) else AgentStatus.ERROR
+                    logger.error(f"Task {task.id} attempt {task.attempts} failed: {e}")
+                    error = str(e)
+                finally:
+                    self.pool.release(agent, agent_status)
+        except asyncio.CancelledError:
+            if lease.done() and not lease.cancelled():
+                return  # cancelled by _keep_lease: another worker owns the task now
+            raise
+        finally:
+            lease.cancel()
+        if error is not None:
+            await self.queue.fail(task, self.worker_id, error, retry)
+            return
+        self.processed += 1
+        if not await self.queue.complete(task, self.worker_id, result):
+            logger.warning(f"Task {task.id} finished after its lease was taken over; result dropped")
+
+    def stats(self) -> dict:
+        return {"worker_id": self.worker_id, "concurrency": self.concurrency,
+                "in_flight": len(self._running), "processed": self.processed}
+
+
+# Global task queue instance
+task_queue = TaskQueue()
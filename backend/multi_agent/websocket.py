@@ -1,57 +1,165 @@
 # multi_agent/websocket.py
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Dict, Set
+import asyncio
 import json
 import logging
+import os
+import time
+from .pubsub import ALL, create_pubsub
+from metrics import WS_SEND_SECONDS
 
 logger = logging.getLogger(__name__)
 
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", 256))  # messages buffered per connection
+# What to do when a client's buffer is full:
+#   "drop_oldest" - discard its oldest pending message (a slow client sees fewer updates)
+#   "disconnect"  - close the client; it can reconnect and resync
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+
+
+class Outbox:
+    """Bounded outbound queue for one WebSocket, drained by its own sender task."""
+
+    def __init__(self, websocket: WebSocket, on_close, maxsize=WS_QUEUE_SIZE):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._on_close = on_close
+        self.sender = asyncio.create_task(self._drain())
+
+    def push(self, text: str) -> bool:
+        """Queue a serialized message without waiting; False if the client is too slow."""
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            if WS_SLOW_CONSUMER_POLICY == "disconnect":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(text)
+            self.dropped += 1
+            return True
+
+    async def _drain(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                start = time.perf_counter()
+                await self.websocket.send_text(text)
+                WS_SEND_SECONDS.observe(time.perf_counter() - start)
+        except asyncio.CancelledError:
+            raise
+        except WebSocketDisconnect:
+            self._on_close(self.websocket)
+        except Exception as e:
+            logger.error(f"Error sending message: {e}")
+            self._on_close(self.websocket)
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-        
+    """Per-process WebSocket registry; events go out through a pub/sub backend
+    (WS_PUBSUB_BACKEND) so every API process delivers to its own clients."""
+
+    def __init__(self, pubsub=None):
+        self.pubsub = pubsub or create_pubsub()
+        self._started = False
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self._outboxes: Dict[WebSocket, Outbox] = {}
+        self._workflow_of: Dict[WebSocket, str] = {}
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+
+    async def start(self):
+        if not self._started:
+            await self.pubsub.start(self._deliver)
+            self._started = True
+
+    async def stop(self):
+        if self._started:
+            await self.pubsub.stop()
+            self._started = False
+
+    def _deliver(self, channel: str, text: str):
+        if channel == ALL:
+            for workflow_id in list(self.active_connections.keys()):
+                self._push(workflow_id, text)
+        elif channel in self.active_connections:
+            self._push(channel, text)
+
+    async def _publish(self, channel: str, text: str):
+        if self._started:
+            await self.pubsub.publish(channel, text)
+        else:
+            self._deliver(channel, text)
+
     async def connect(self, websocket: WebSocket, workflow_id: str):
         await websocket.accept()
-        if workflow_id not in self.active_connections:
-            self.active_connections[workflow_id] = []
-        self.active_connections[workflow_id].append(websocket)
+        self.active_connections.setdefault(workflow_id, set()).add(websocket)
+        self._outboxes[websocket] = Outbox(websocket, self._sender_closed)
+        self._workflow_of[websocket] = workflow_id
         logger.info(f"WebSocket connected to workflow {workflow_id}")
-        
+
         # Send welcome message
-        await websocket.send_text(json.dumps({
+        self._outboxes[websocket].push(json.dumps({
             "type": "connected",
             "message": f"Connected to workflow {workflow_id}",
             "workflow_id": workflow_id
         }))
-        
+
     def disconnect(self, websocket: WebSocket, workflow_id: str):
-        if workflow_id in self.active_connections:
-            if websocket in self.active_connections[workflow_id]:
-                self.active_connections[workflow_id].remove(websocket)
-            if not self.active_connections[workflow_id]:
+        connections = self.active_connections.get(workflow_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
                 del self.active_connections[workflow_id]
+        self._workflow_of.pop(websocket, None)
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is not None:
+            self.dropped_messages += outbox.dropped
+            if outbox.sender is not asyncio.current_task():
+                outbox.sender.cancel()
         logger.info(f"WebSocket disconnected from workflow {workflow_id}")
-            
+
+    def _sender_closed(self, websocket: WebSocket):
+        workflow_id = self._workflow_of.get(websocket)
+        if workflow_id is not None:
+            self.disconnect(websocket, workflow_id)
+
+    def _push(self, workflow_id: str, text: str):
+        slow = []
+        for connection in self.active_connections.get(workflow_id, ()):
+            if not self._outboxes[connection].push(text):
+                slow.append(connection)
+        for connection in slow:
+            self.slow_disconnects += 1
+            self.disconnect(connection, workflow_id)
+            asyncio.create_task(self._close_quietly(connection))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # try again later
+        except Exception:
+            pass
+
     async def send_to_workflow(self, workflow_id: str, message: dict):
-        if workflow_id in self.active_connections:
-            disconnected = []
-            for connection in self.active_connections[workflow_id]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except WebSocketDisconnect:
-                    disconnected.append(connection)
-                except Exception as e:
-                    logger.error(f"Error sending message: {e}")
-                    disconnected.append(connection)
-            
-            # Clean up disconnected connections
-            for conn in disconnected:
-                if conn in self.active_connections[workflow_id]:
-                    self.active_connections[workflow_id].remove(conn)
-    
+        """Serialize once and queue for every subscriber; never waits on a client."""
+        await self._publish(workflow_id, json.dumps(message))
+
     async def send_to_all(self, message: dict):
-        for workflow_id in list(self.active_connections.keys()):
-            await self.send_to_workflow(workflow_id, message)
+        await self._publish(ALL, json.dumps(message))
+
+    def stats(self) -> dict:
+        return {
+            "workflows": len(self.active_connections),
+            "connections": len(self._outboxes),
+            "queued_messages": sum(o.queue.qsize() for o in self._outboxes.values()),
+            "dropped_messages": self.dropped_messages + sum(o.dropped for o in self._outboxes.values()),
+            "slow_disconnects": self.slow_disconnects,
+            "policy": WS_SLOW_CONSUMER_POLICY,
+            "pubsub": type(self.pubsub).__name__,
+        }
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -0,0 +1,64 @@
+"""Standalone task queue worker; run as many as needed next to the API.
+
+    cd backend
+    python -m multi_agent.worker --concurrency 16
+
+Each worker claims tasks from the shared `tasks` collection (see
+task_queue.py), so throughput grows with the number of workers. Set
+TASK_QUEUE_EMBEDDED=false on the API to leave all execution to them.
+
+Progress events reach the API's WebSocket clients only through a shared
+pub/sub backend: set WS_PUBSUB_BACKEND=unix (same host) or mongo on the
+API and on every worker. With the default "local" the tasks still run,
+but their events stay inside the worker process.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from beanie import init_beanie
+
+from database import mongo
+from multi_agent.models import Agent, Task, Workflow
+from multi_agent.pubsub import WS_PUBSUB_BACKEND
+from multi_agent.scheduler import agent_pool
+from multi_agent.services import agent_service
+from multi_agent.websocket import manager
+from multi_agent.task_queue import TASK_WORKER_CONCURRENCY, TaskWorker
+
+logger = logging.getLogger(__name__)
+
+
+async def main(concurrency: int):
+    await init_beanie(database=mongo.connect(), document_models=[Agent, Task, Workflow])
+    # Progress events reach the API processes' WebSocket clients via the relay
+    if WS_PUBSUB_BACKEND not in ("unix", "mongo"):
+        logger.warning(f"WS_PUBSUB_BACKEND={WS_PUBSUB_BACKEND!r}: task events from this worker won't reach "
+                       "WebSocket clients; use unix or mongo here and on the API")
+    await manager.start()
+    await agent_pool.start()
+    worker = TaskWorker(concurrency=concurrency)
+    worker.start()
+    logger.info(f"Worker {worker.worker_id} started with concurrency {concurrency}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info(f"Worker {worker.worker_id} stopping after {worker.processed} tasks")
+    await worker.stop()
+    await agent_pool.stop()
+    await agent_service.aclose()
+    await manager.stop()
+    mongo.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=TASK_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,69 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Score the whole catalog when a bundle loads and answer /analyze from the table
+PREDICTION_TABLE = os.getenv("PREDICTION_TABLE", "false").lower() in ("1", "true", "yes")
+
+
+class PredictionTable:
+    """Demand trend and model price for every product of one bundle.
+
+    Built with one predict call per model over the feature store's
+    pre-encoded matrices, so each entry equals what the demand and price
+    agents would compute. Stored as sorted id / flag / price arrays
+    (17 bytes per product); a lookup is a binary search. Products with a
+    missing numeric feature are left out and go through the models, which
+    report the error as before.
+    """
+
+    def __init__(self, ids, increasing, base_price, version, build_seconds=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        self.increasing = np.asarray(increasing, dtype=bool)[order]
+        self.base_price = np.asarray(base_price, dtype=np.float64)[order]
+        self.version = version
+        self.build_seconds = build_seconds
+        self.built_at = datetime.utcnow()
+
+    @classmethod
+    def build(cls, bundle):
+        """Score every product in `bundle` (whose models must both be loaded)."""
+        start = time.perf_counter()
+        store = bundle.feature_store
+        demand, price = store.matrices["demand"], store.matrices["price"]
+        complete = ~(np.isnan(demand).any(axis=1) | np.isnan(price).any(axis=1))
+        increasing = bundle.demand_model.predict(demand[complete]) == 1
+        base_price = bundle.price_model.predict(price[complete])
+        return cls(store.frame["Product_ID"].to_numpy()[complete], increasing, base_price, bundle.version,
+                   time.perf_counter() - start)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, product_id):
+        """(increasing, base_price) for one product, or None if it isn't in the table."""
+        i = int(np.searchsorted(self.ids, product_id))
+        if i == len(self.ids) or self.ids[i] != product_id:
+            return None
+        return bool(self.increasing[i]), float(self.base_price[i])
+
+    def take(self, product_ids):
+        """(increasing, base_price) arrays in the given order, or None if any id isn't in the table."""
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, product_ids)
+        if len(self.ids) == 0 or (self.ids[np.minimum(positions, len(self.ids) - 1)] != product_ids).any():
+            return None
+        return self.increasing[positions], self.base_price[positions]
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "products": len(self.ids),
+            "bytes": self.ids.nbytes + self.increasing.nbytes + self.base_price.nbytes,
+            "build_seconds": round(self.build_seconds, 4) if self.build_seconds is not None else None,
+            "built_at": self.built_at.isoformat(),
+        }
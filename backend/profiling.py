@@ -0,0 +1,193 @@
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi.routing import APIRoute
+
+from security import bearer, require_role
+
+# Admins can ask for a profile of one request with `X-Profile: 1` or `?profile=1`.
+# With REQUEST_PROFILING=false the hook is never consulted.
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "true").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 1.0))  # share of flagged requests profiled
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 50))  # newest profiles kept on disk
+
+_TRUTHY = ("1", "true", "yes")
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+
+class ProfileStore:
+    """Bounded on-disk ring of cProfile dumps, each with a small JSON sidecar.
+
+    `<id>.prof` is in the standard pstats format (python -m pstats, snakeviz).
+    Saving beyond `keep` profiles deletes the oldest.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        return f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+
+    def _path(self, profile_id: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{ext}")
+
+    def save(self, profile_id: str, stats: bytes, **meta) -> dict:
+        meta = {"id": profile_id, "created_at": time.time(), **meta}
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(profile_id, "prof"), "wb") as f:
+                f.write(stats)
+            with open(self._path(profile_id, "json"), "w") as f:
+                json.dump(meta, f)
+            for old in self._ids()[self.keep:]:
+                for ext in ("prof", "json"):
+                    try:
+                        os.remove(self._path(old, ext))
+                    except FileNotFoundError:
+                        pass
+        return meta
+
+    def _ids(self):
+        """Profile ids, newest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        ids = [name[:-5] for name in names if name.endswith(".prof") and _PROFILE_ID.match(name[:-5])]
+        return sorted(ids, key=lambda i: int(i.split("-")[0]), reverse=True)
+
+    def list(self):
+        entries = []
+        for profile_id in self._ids():
+            try:
+                with open(self._path(profile_id, "json")) as f:
+                    entries.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                entries.append({"id": profile_id})
+        return entries
+
+    def path(self, profile_id: str) -> Optional[str]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = self._path(profile_id, "prof")
+        return path if os.path.exists(path) else None
+
+    def summary(self, profile_id: str, sort="cumulative", limit=40) -> Optional[str]:
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+profile_store = ProfileStore()
+
+# cProfile can't run two sessions at once (3.12+ refuses, older versions
+# replace each other's hook), so one request is profiled at a time. Take it
+# with acquire(blocking=False); a request that can't is served unprofiled.
+profile_session = threading.Lock()
+
+
+def dump_stats(profiler: cProfile.Profile) -> bytes:
+    """The bytes Profile.dump_stats would write."""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+async def profile_requested(request: Request):
+    """Dependency: the admin user when this request should be profiled, else None.
+
+    Unflagged requests cost one header and one query lookup. A flagged
+    request from anyone but an admin is rejected.
+    """
+    if not REQUEST_PROFILING:
+        return None
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not flag or flag.lower() not in _TRUTHY:
+        return None
+    user = await require_role("admin")(await bearer(request))
+    if random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    return user
+
+
+class ProfiledRoute(APIRoute):
+    """Route class whose handler can be profiled on request: `APIRouter(route_class=ProfiledRoute)`.
+
+    cProfile covers the event loop thread while the handler runs (body
+    parsing, dependencies, the endpoint, serialization), so other requests
+    served by the same loop meanwhile appear in the profile too. While
+    another profile is running the request is served unprofiled. With
+    REQUEST_PROFILING off the handler is left unwrapped.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not REQUEST_PROFILING:
+            return handler
+
+        async def profiled_handler(request: Request):
+            user = await profile_requested(request)
+            if user is None or not profile_session.acquire(blocking=False):
+                return await handler(request)
+            try:
+                profile_id = profile_store.new_id()
+                profiler = cProfile.Profile()
+                start = time.perf_counter()
+                profiler.enable()
+                try:
+                    response = await handler(request)
+                finally:
+                    profiler.disable()
+                    profile_store.save(profile_id, dump_stats(profiler), kind="route", user=user["email"],
+                                       label=f"{request.method} {request.url.path}",
+                                       duration_ms=round((time.perf_counter() - start) * 1000, 3))
+            finally:
+                profile_session.release()
+            response.headers["X-Profile-Id"] = profile_id
+            return response
+
+        return profiled_handler
+
+
+# ---------- Retrieval ----------
+router = APIRouter(prefix="/admin/profiles", tags=["profiling"], dependencies=[Depends(require_role("admin"))])
+
+
+@router.get("/")
+def list_profiles():
+    return {"keep": profile_store.keep, "sample_rate": PROFILE_SAMPLE_RATE, "profiles": profile_store.list()}
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, format: str = "prof", sort: str = "cumulative", limit: int = 40):
+    """The raw pstats dump, or `format=text` for the top `limit` functions by `sort`."""
+    if format == "text":
+        try:
+            text = profile_store.summary(profile_id, sort, limit)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+        if text is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return PlainTextResponse(text)
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
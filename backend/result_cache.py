@@ -0,0 +1,158 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 4096))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 3600))  # seconds, 0 disables expiry
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")  # "memory" or "mongo"
+
+
+def file_fingerprint(paths) -> str:
+    """Short digest of the size and mtime of each file; changes whenever one is replaced."""
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except OSError:
+            digest.update(f"{path}:missing;".encode())
+    return digest.hexdigest()[:12]
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+class MongoCacheBackend:
+    """Shared cache in a Mongo collection so several workers reuse each other's results.
+
+    Expiry is left to a TTL index on `expires_at`.
+    """
+
+    def __init__(self, collection=None, ttl=RESULT_CACHE_TTL):
+        if collection is None:
+            from database import mongo
+            collection = mongo.sync_database()["analysis_cache"]
+        self.collection = collection
+        self.ttl = ttl
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def get(self, key):
+        doc = self.collection.find_one({"_id": key})
+        if doc is None:
+            return None
+        if doc.get("expires_at") and doc["expires_at"] < datetime.utcnow():
+            return None  # the TTL monitor only runs once a minute
+        return json.loads(doc["value"])
+
+    def set(self, key, value):
+        doc = {"value": json.dumps(value)}
+        if self.ttl:
+            doc["expires_at"] = datetime.utcnow() + timedelta(seconds=self.ttl)
+        self.collection.replace_one({"_id": key}, doc, upsert=True)
+
+    def clear(self):
+        self.collection.delete_many({})
+
+
+class ResultCache:
+    """In-process LRU/TTL cache for ProductOptimizer results.
+
+    An optional shared backend (get/set/clear) is consulted on local misses.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if not expires_at or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception as e:
+                print("⚠️ Shared result cache read failed:", e)
+                value = None
+            if value is not None:
+                self._store(key, copy.deepcopy(value))
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store(key, copy.deepcopy(value))
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value)
+            except Exception as e:
+                print("⚠️ Shared result cache write failed:", e)
+
+    def _store(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, shared=True):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+        if shared and self.backend is not None:
+            try:
+                self.backend.clear()
+            except Exception as e:
+                print("⚠️ Shared result cache clear failed:", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "backend": type(self.backend).__name__ if self.backend is not None else None,
+            }
+
+
+def default_result_cache() -> ResultCache:
+    backend = None
+    if RESULT_CACHE_BACKEND == "mongo":
+        try:
+            backend = MongoCacheBackend()
+        except Exception as e:
+            print("⚠️ Could not set up shared result cache, using in-process only:", e)
+    return ResultCache(backend=backend)
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from metrics import timed_db
+from user_store import users
+from utils import SECRET_KEY, ALGORITHM
+
+# Off by default so clients that don't send tokens yet keep working; a token
+# that is sent is always verified, and admin routes always require one.
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10_000))
+ROLE_CACHE_TTL = float(os.getenv("ROLE_CACHE_TTL", 30))  # seconds
+ROLE_CACHE_SIZE = int(os.getenv("ROLE_CACHE_SIZE", 10_000))
+
+bearer = HTTPBearer(auto_error=False)
+
+
+class TokenCache:
+    """Bounded LRU of decoded JWT claims, keyed by the raw token.
+
+    Entries are only served until the token's own `exp`.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def set(self, token: str, claims: dict):
+        with self._lock:
+            self._entries[token] = (claims.get("exp"), claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class RoleCache:
+    """Short-lived, bounded LRU of email -> role, so most requests skip the users lookup."""
+
+    def __init__(self, ttl=ROLE_CACHE_TTL, maxsize=ROLE_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            expires_at, role = entry
+            if expires_at <= time.monotonic():
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return role
+
+    def set(self, email: str, role):
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, role)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+token_cache = TokenCache()
+role_cache = RoleCache()
+
+
+def decode_token(token: str) -> dict:
+    """Verify a token issued by utils.create_access_token and return its claims."""
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(token, claims)
+    return claims
+
+
+async def lookup_role(email: str, claimed_role=None):
+    role = role_cache.get(email)
+    if role is not None:
+        return role
+    try:
+        db_user = await timed_db("users.find_by_email", users.find_by_email(email, {"role": 1}))
+    except RuntimeError:
+        return claimed_role  # no user store (e.g. server.py): trust the signed claim
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Unknown user")
+    role = db_user.get("role")
+    role_cache.set(email, role)
+    return role
+
+
+async def current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+    """The caller as {"email", "role"}; None when anonymous access is allowed."""
+    if credentials is None:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Not authenticated",
+                                headers={"WWW-Authenticate": "Bearer"})
+        return None
+    try:
+        claims = decode_token(credentials.credentials)
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {e}",
+                            headers={"WWW-Authenticate": "Bearer"})
+    email = claims.get("sub")
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token: no subject")
+    return {"email": email, "role": await lookup_role(email, claims.get("role"))}
+
+
+def require_role(*roles):
+    """Dependency that always requires a valid token whose user has one of `roles`."""
+    async def dependency(credentials: HTTPAuthorizationCredentials = Depends(bearer)):
+        if credentials is None:
+            raise HTTPException(status_code=401, detail="Not authenticated",
+                                headers={"WWW-Authenticate": "Bearer"})
+        user = await current_user(credentials)
+        if user["role"] not in roles:
+            raise HTTPException(status_code=403, detail="Insufficient role")
+        return user
+    return dependency
@@ -1,16 +1,33 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
 
 from main1 import ProductOptimizer
+from inventory_engine import iter_ndjson
+from security import current_user, require_role
+from export_format import to_item, ndjson_line, csv_header, csv_line
 
-# Create instance (no parameters needed)
-optimizer = ProductOptimizer()
-app = FastAPI(title="Product Intelligence API")
+# Dataset and models load in the background from lifespan
+optimizer = ProductOptimizer(lazy=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().run_in_executor(None, optimizer.load)
+    optimizer.watch()
+    yield
+
+app = FastAPI(title="Product Intelligence API", lifespan=lifespan)
 
 class ProductRequest(BaseModel):
     product_id: int
 
-@app.post("/analyze")
+class BatchProductRequest(BaseModel):
+    product_ids: List[int]
+
+@app.post("/analyze", dependencies=[Depends(current_user)])
 def analyze_product(request: ProductRequest):
     try:
         result = optimizer.run(request.product_id)
@@ -22,12 +39,72 @@ def analyze_product(request: ProductRequest):
             "demand_forecast": result["final_summary"]["demand_forecast"],
             "optimized_price": result["final_summary"]["optimized_price"],
             "inventory": result["final_summary"]["inventory"],
-            "message": result["message"]
+            "message": result["message"],
+            "bundle_version": result.get("bundle_version")
         }
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.post("/analyze/batch", dependencies=[Depends(current_user)])
+def analyze_products(request: BatchProductRequest):
+    try:
+        results = optimizer.run_many(request.product_ids)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    items = [to_item(product_id, result) for product_id, result in zip(request.product_ids, results)]
+    return {"status": "success", "count": len(items), "results": items}
+
+@app.get("/analyze/stream", dependencies=[Depends(current_user)])
+def analyze_stream(format: str = "ndjson", after: Optional[int] = None,
+                   chunk_size: int = Query(500, ge=1, le=5000)):
+    """Analyze the whole catalog in Product_ID order, one line per product.
+
+    Pass the last product_id received as `after` to resume. The whole
+    stream uses the bundle named in X-Bundle-Version.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    line = ndjson_line if format == "ndjson" else csv_line
+    bundle = optimizer.bundle_for()
+
+    def lines():
+        if format == "csv":
+            yield csv_header()
+        chunk = []
+        for product_id, result in optimizer.iter_catalog(after, chunk_size, bundle):
+            chunk.append(line(to_item(product_id, result)))
+            if len(chunk) == chunk_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(lines(), media_type=media_type, headers={"X-Bundle-Version": bundle.version})
+
+@app.get("/inventory/reorder-report", dependencies=[Depends(current_user)])
+def inventory_reorder_report(action: Optional[List[str]] = Query(None), format: str = "json"):
+    try:
+        version, report = optimizer.inventory_report(action)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(report), media_type="application/x-ndjson",
+                                 headers={"X-Bundle-Version": version})
+    return {"status": "success", "bundle_version": version, "count": len(report), "items": report.to_dict("records")}
+
+@app.post("/admin/reload", dependencies=[Depends(require_role("admin"))])
+def reload_models():
+    # Sync endpoint: runs in the threadpool while other requests keep using the old bundle
+    try:
+        bundle = optimizer.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+    return {"status": "reloaded", "bundle": bundle.describe()}
+
 @app.get("/")
 def root():
-    return {"message": "✅ API running. Use POST /analyze with product_id"}
\ No newline at end of file
+    return {"message": "✅ API running. Use POST /analyze with product_id", "models_loaded": optimizer.ready}
\ No newline at end of file
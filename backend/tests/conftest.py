@@ -0,0 +1,73 @@
+"""Shared fixtures. Run from backend/: python -m pytest tests
+
+The ML tests run against the seeded synthetic workspace from
+benchmarks/synthetic.py; the Mongo tests against mongomock-motor.
+"""
+import os
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def workspace(tmp_path_factory):
+    """Synthetic dataset and models, with the process chdir'ed into them like the app expects."""
+    from synthetic import write_workspace
+
+    directory = tmp_path_factory.mktemp("workspace")
+    write_workspace(str(directory), products=300, rows_per_product=3, seed=0)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    yield directory
+    os.chdir(cwd)
+
+
+def _optimizer(prediction_table):
+    from main1 import ProductOptimizer
+    from result_cache import ResultCache
+
+    optimizer = ProductOptimizer(prediction_table=prediction_table)
+    optimizer.result_cache = ResultCache(maxsize=0)  # every call computes
+    return optimizer
+
+
+@pytest.fixture(scope="session")
+def optimizer(workspace):
+    """Optimizer that always goes through the models."""
+    return _optimizer(prediction_table=False)
+
+
+@pytest.fixture(scope="session")
+def table_optimizer(workspace):
+    """Optimizer answering from its prediction table, once built."""
+    optimizer = _optimizer(prediction_table=True)
+    deadline = time.monotonic() + 30
+    while optimizer.prediction_table() is None:
+        assert time.monotonic() < deadline, "prediction table was not built"
+        time.sleep(0.01)
+    return optimizer
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def mongo():
+    """Fresh in-memory database with the multi-agent documents initialised."""
+    from beanie import init_beanie
+    from mongomock_motor import AsyncMongoMockClient
+
+    from multi_agent.models import Agent, Task, Workflow
+
+    database = AsyncMongoMockClient()["test"]
+    await init_beanie(database=database, document_models=[Agent, Task, Workflow])
+    # mongomock ignores partialFilterExpression, which would make the idempotency index reject null keys
+    await Task.get_motor_collection().drop_indexes()
+    return database
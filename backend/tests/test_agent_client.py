@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+import pytest
+
+from multi_agent import agent_client
+from multi_agent.agent_client import AgentClient, AgentUnavailable, CircuitBreaker
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(agent_client, "AGENT_RETRY_BACKOFF", 0)
+
+
+def _client(handler):
+    """AgentClient whose endpoint answers through `handler` instead of the network."""
+    client = AgentClient()
+    endpoint = client.endpoint("http://agent")
+    endpoint.http = httpx.AsyncClient(base_url="http://agent", transport=httpx.MockTransport(handler))
+    return client, endpoint
+
+
+def _responses(*outcomes):
+    """Handler replaying `outcomes` in order: a status code, or an exception to raise."""
+    calls = []
+
+    async def handler(request):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"n": len(calls)})
+
+    return handler, calls
+
+
+async def test_idempotent_calls_retry_server_errors():
+    handler, calls = _responses(503, 502, 200)
+    client, endpoint = _client(handler)
+    assert await client.post("http://agent", "/run", {}, idempotent=True) == {"n": 3}
+    assert endpoint.retries == 2
+
+
+async def test_other_calls_retry_only_when_nothing_was_sent():
+    handler, calls = _responses(httpx.ConnectError("refused"), 503)
+    client, endpoint = _client(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.post("http://agent", "/run", {})
+    assert len(calls) == 2  # the 503 may have run the task, so it is not retried
+
+
+async def test_slow_call_is_hedged(monkeypatch):
+    monkeypatch.setattr(agent_client, "AGENT_HEDGE_AFTER", 0.01)
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"n": len(calls)})
+
+    client, endpoint = _client(handler)
+    assert await client.post("http://agent", "/run", {}, idempotent=True) == {"n": 2}
+    assert endpoint.hedges == 1
+
+
+async def test_breaker_opens_after_consecutive_failures():
+    handler, calls = _responses(500)
+    client, endpoint = _client(handler)
+    endpoint.breaker = CircuitBreaker(threshold=2, reset=60)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.post("http://agent", "/run", {})
+    with pytest.raises(AgentUnavailable):
+        await client.post("http://agent", "/run", {})
+    with pytest.raises(AgentUnavailable):
+        await client.post("http://agent", "/run", {})
+    assert len(calls) == 2  # the open circuit fails fast
+    await client.aclose()
+
+
+def test_breaker_half_opens_and_closes_on_success(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(agent_client.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, reset=30)
+    assert breaker.record_failure() and breaker.state == "open" and not breaker.allow()
+    now[0] = 30
+    assert breaker.state == "half_open" and breaker.allow()
+    assert breaker.record_failure() and breaker.state == "open"  # the trial call failed
+    now[0] = 60
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+async def test_recovered_endpoint_is_reported():
+    recovered = []
+    handler, calls = _responses(500)
+    client, endpoint = _client(handler)
+    client.on_recover = recovered.append
+    endpoint.breaker = CircuitBreaker(threshold=1, reset=0.01)
+    with pytest.raises(AgentUnavailable):
+        await client.post("http://agent", "/run", {}, agent_id="a1")
+    endpoint.http = httpx.AsyncClient(base_url="http://agent",
+                                      transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    await asyncio.wait_for(client._probes["a1"], 1)
+    assert recovered == ["a1"] and endpoint.breaker.state == "closed"
@@ -0,0 +1,28 @@
+def _without_version(result):
+    return {k: v for k, v in result.items() if k != "bundle_version"}
+
+
+def test_run_many_matches_run(optimizer):
+    ids = optimizer.feature_store.sorted_ids.tolist()
+    batch = optimizer.run_many(ids)
+    assert len(batch) == len(ids)
+    for product_id, result in zip(ids, batch):
+        assert "final_summary" in result
+        assert _without_version(result) == _without_version(optimizer.run(product_id))
+
+
+def test_run_many_keeps_order_and_reports_bad_ids(optimizer):
+    ids = [1005, "abc", 10**9, 1001, 1005]
+    batch = optimizer.run_many(ids)
+    assert [r.get("final_summary", {}).get("product_id") for r in batch] == [1005, None, None, 1001, 1005]
+    assert batch[1]["error"] == "Invalid product_id: abc"
+    assert "error" in batch[2]
+    assert batch[0]["bundle_version"] == optimizer.bundle.version
+
+
+def test_run_many_fused_matches_graph(workspace, optimizer):
+    from main1 import ProductOptimizer
+
+    fused = ProductOptimizer(execution="fused")
+    ids = optimizer.feature_store.sorted_ids.tolist()[:50]
+    assert [fused.run(pid)["final_summary"] for pid in ids] == [optimizer.run(pid)["final_summary"] for pid in ids]
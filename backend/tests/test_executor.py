@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from multi_agent.executor import WorkflowExecutor
+from multi_agent.models import Agent, Task, Workflow
+from multi_agent.scheduler import AgentPool
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeService:
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.busy_agents = []
+
+    async def execute_task(self, agent, task):
+        if self.pool is not None:
+            self.busy_agents.append(self.pool.stats()["busy"])
+        await asyncio.sleep(0.01)
+        if task.name == "bad":
+            raise RuntimeError("boom")
+        return {"ok": task.name}
+
+
+async def _setup(agents, *tasks):
+    for i in range(agents):
+        await Agent(name=f"a{i}", agent_type="analyzer").create()
+    pool = AgentPool()
+    await pool.refresh()
+    workflow = await Workflow(name="w", description="d", goal="g").create()
+    for name, dependencies in tasks:
+        await Task(workflow_id=str(workflow.id), agent_type="analyzer", name=name, description="",
+                   dependencies=dependencies).create()
+    return pool, workflow
+
+
+async def _statuses(workflow):
+    return {t.name: t.status for t in await Task.find(Task.workflow_id == str(workflow.id)).to_list()}
+
+
+async def test_dag_runs_and_skips_after_failure(mongo):
+    pool, workflow = await _setup(2, ("root", []), ("a", ["root"]), ("b", ["root"]), ("bad", []),
+                                  ("after_bad", ["bad"]))
+    status = await WorkflowExecutor(service=FakeService(), pool=pool).run(workflow)
+    assert status == "failed"
+    assert await _statuses(workflow) == {"root": "completed", "a": "completed", "b": "completed",
+                                         "bad": "failed", "after_bad": "skipped"}
+
+
+async def test_waiting_for_a_slot_holds_no_agent(mongo):
+    pool, workflow = await _setup(3, ("a", []), ("b", []), ("c", []))
+    service = FakeService(pool)
+    assert await WorkflowExecutor(service=service, pool=pool, per_workflow=1).run(workflow) == "completed"
+    assert service.busy_agents == [1, 1, 1]
+
+
+async def test_database_error_finishes_workflow(mongo):
+    pool, workflow = await _setup(1, ("a", []), ("b", ["a"]))
+    executor = WorkflowExecutor(service=FakeService(), pool=pool)
+    set_status = executor._set_status
+
+    async def failing_set_status(task, status, output=None):
+        if task.name == "b" and status == "running":
+            raise ConnectionError("database unavailable")
+        await set_status(task, status, output)
+
+    executor._set_status = failing_set_status
+    with pytest.raises(ConnectionError):
+        await executor.run(workflow)
+    assert (await Workflow.get(workflow.id)).status == "failed"
+    assert pool.stats()["busy"] == 0
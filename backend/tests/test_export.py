@@ -0,0 +1,32 @@
+import copy
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+
+def test_server_stream_names_its_bundle(optimizer):
+    import server
+
+    response = TestClient(server.app).get("/analyze/stream", params={"chunk_size": 64})
+    assert response.status_code == 200
+    assert response.headers["x-bundle-version"] == server.optimizer.bundle.version
+    ids = [json.loads(line)["product_id"] for line in response.text.splitlines()]
+    assert ids == optimizer.feature_store.sorted_ids.tolist()
+
+
+def test_analyze_page_stays_on_its_bundle(optimizer, monkeypatch):
+    from result_cache import ResultCache
+
+    monkeypatch.setattr(optimizer, "result_cache", ResultCache(maxsize=100))
+    version, ids, results = optimizer.analyze_page(None, 5)
+    assert len(ids) == len(results) == 5
+    assert optimizer.result_cache.get(optimizer.cache_key(ids[0])) is None  # exports skip the cache
+
+    current = optimizer._bundle
+    replacement = copy.copy(current)
+    replacement.version = "replacement"
+    monkeypatch.setattr(optimizer, "_bundle", replacement)
+    monkeypatch.setitem(optimizer._retired, current.version, [current, time.monotonic()])
+    assert optimizer.analyze_page(ids[-1], 5, version)[0] == version
+    assert optimizer.analyze_page(ids[-1], 5)[0] == "replacement"
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def fresh_optimizer(tmp_path, monkeypatch):
+    """Optimizer over its own workspace, so its files can be replaced."""
+    from synthetic import write_workspace
+
+    from main1 import ProductOptimizer
+    from result_cache import ResultCache
+
+    write_workspace(str(tmp_path), products=50, rows_per_product=3, seed=1)
+    monkeypatch.chdir(tmp_path)
+    optimizer = ProductOptimizer(prediction_table=False)
+    optimizer.result_cache = ResultCache()
+    return optimizer
+
+
+def _replace(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reload_swaps_the_bundle_and_clears_the_cache(fresh_optimizer):
+    old = fresh_optimizer.bundle
+    product_id = old.feature_store.sorted_ids[0]
+    assert fresh_optimizer.run(product_id)["bundle_version"] == old.version
+    _replace("price_optimization.joblib")
+
+    new = fresh_optimizer.reload()
+    assert new.version != old.version
+    assert fresh_optimizer.bundle is new
+    assert fresh_optimizer.result_cache.stats()["size"] == 0
+    assert fresh_optimizer.run(product_id)["bundle_version"] == new.version
+
+
+def test_run_in_progress_keeps_its_bundle(fresh_optimizer):
+    with fresh_optimizer.pinned_bundle() as pinned:
+        _replace("price_optimization.joblib")
+        fresh_optimizer.reload()
+        assert fresh_optimizer.bundle is pinned
+        with fresh_optimizer.pinned_bundle() as nested:
+            assert nested is pinned
+    assert fresh_optimizer.bundle is not pinned
+
+
+def test_replaced_bundle_stays_reachable_until_retired(fresh_optimizer, monkeypatch):
+    old = fresh_optimizer.bundle
+    _replace("demand_trend_classifier.pkl")
+    fresh_optimizer.reload()
+    assert fresh_optimizer.bundle_for(old.version) is old
+    with pytest.raises(LookupError):
+        fresh_optimizer.bundle_for("unknown")
+
+    monkeypatch.setattr("main1.BUNDLE_RETAIN_SECONDS", 0)
+    fresh_optimizer.load()
+    with pytest.raises(LookupError):
+        fresh_optimizer.bundle_for(old.version)
+
+
+def test_reload_keeps_a_working_bundle_when_models_fail_to_load(fresh_optimizer):
+    current = fresh_optimizer.bundle
+    os.remove("price_optimization.joblib")
+    with pytest.raises(RuntimeError):
+        fresh_optimizer.reload()
+    assert fresh_optimizer.bundle is current
@@ -0,0 +1,27 @@
+REPORT_FIELDS = ["demand_forecast", "avg_daily_demand", "safety_stock", "reorder_point", "current_stock",
+                 "inventory_action", "suggested_reorder_qty"]
+
+
+def _agent_row(result):
+    """The inventory agent's numbers for one run, named like the report's columns."""
+    summary = result["final_summary"]
+    row = {"demand_forecast": summary["demand_forecast"], **summary["inventory"]}
+    row["inventory_action"] = row.pop("action")
+    return row
+
+
+def test_catalog_plan_matches_inventory_agent(optimizer):
+    version, report = optimizer.inventory_report()
+    assert version == optimizer.bundle.version
+    assert len(report) == len(optimizer.feature_store.sorted_ids)
+    for record in report.to_dict("records"):
+        row = _agent_row(optimizer.run(record["product_id"]))
+        assert {k: row[k] for k in REPORT_FIELDS} == {k: record[k] for k in REPORT_FIELDS}
+
+
+def test_catalog_plan_filters_actions(optimizer):
+    _, report = optimizer.inventory_report()
+    action = report["inventory_action"].iloc[0]
+    _, filtered = optimizer.inventory_report([action])
+    assert len(filtered) == (report["inventory_action"] == action).sum()
+    assert set(filtered["inventory_action"]) == {action}
@@ -0,0 +1,95 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Histogram
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty registry, so the metrics made here don't show up in the app's."""
+    monkeypatch.setattr(metrics, "_registry", {})
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = Histogram("work_seconds", "Work.", ("node",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, node='a"b')
+    lines = metrics.render().splitlines()
+    assert lines[:2] == ["# HELP work_seconds Work.", "# TYPE work_seconds histogram"]
+    assert lines[2:] == [
+        'work_seconds_bucket{node="a\\"b",le="0.1"} 2',
+        'work_seconds_bucket{node="a\\"b",le="1.0"} 3',
+        'work_seconds_bucket{node="a\\"b",le="+Inf"} 4',
+        'work_seconds_sum{node="a\\"b"} 3.65',
+        'work_seconds_count{node="a\\"b"} 4',
+    ]
+
+
+def test_counter_renders_a_series_per_label(registry):
+    counter = Counter("lookups", "Lookups.", ("result",))
+    counter.inc(result="hit")
+    counter.inc(2, result="hit")
+    counter.inc(result="miss")
+    assert metrics.render().splitlines()[2:] == ['lookups_total{result="hit"} 3', 'lookups_total{result="miss"} 1']
+
+
+def test_collected_events_are_recorded_on_replay(registry):
+    histogram = Histogram("work_seconds", "Work.", buckets=(1.0,))
+    counter = Counter("lookups", "Lookups.")
+    with metrics.collect() as events:
+        metrics.observe(histogram, 0.5, "work")
+        metrics.inc(counter)
+    assert histogram._series == {} and counter._series == {}
+
+    with metrics.capture_spans() as spans:
+        metrics.replay(events)
+    assert histogram._series[()][0] == [1, 0] and counter._series[()] == 1
+    assert spans == [("work", 0.5)]
+
+
+def test_spans_are_recorded_only_when_captured(registry):
+    histogram = Histogram("work_seconds", "Work.")
+    metrics.observe(histogram, 0.1, "work")
+    with metrics.capture_spans() as spans:
+        metrics.observe(histogram, 0.2, "work")
+        metrics.observe(histogram, 0.3)
+    assert spans == [("work", 0.2)]
+
+
+def test_timing_header_sums_repeated_spans():
+    header = metrics.timing_header([("db.find", 0.001), ("agent", 0.002), ("db.find", 0.003)], 0.01)
+    assert header == "total;dur=10.000, db.find;dur=4.000, agent;dur=2.000"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        metrics.observe(metrics.DB_SECONDS, 0.002, "db.find", op="find")
+        return {"id": item_id}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("value", ["1", "true", "YES"])
+def test_x_timing_is_sent_when_asked_for(client, value):
+    response = client.get("/items/1", headers={"X-Timing": value})
+    total, span = response.headers["X-Timing"].split(", ")
+    assert total.startswith("total;dur=") and span == "db.find;dur=2.000"
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Timing": "0"}, {"X-Timing": "false"}])
+def test_x_timing_is_not_sent_otherwise(client, headers):
+    assert "X-Timing" not in client.get("/items/1", headers=headers).headers
+
+
+def test_requests_are_timed_by_route_template(client):
+    client.get("/items/1")
+    client.get("/items/2")
+    key = ("GET", "/items/{item_id}", "200")
+    assert sum(metrics.HTTP_SECONDS._series[key][0]) >= 2
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import metrics
+from micro_batcher import MicroBatcher
+
+pytestmark = pytest.mark.anyio
+
+
+class Recorder:
+    def __init__(self, delay=0.01, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.calls.append(list(keys))
+        metrics.observe(metrics.NODE_SECONDS, 0.001, "batch_work", node="test")
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model failed")
+        return [key * 10 for key in keys]
+
+
+async def test_concurrent_calls_share_one_batch():
+    run_many = Recorder()
+    batcher = MicroBatcher(run_many, window_ms=5, max_size=64)
+    results = await asyncio.gather(*(batcher.submit(key) for key in (1, 2, 3, 2, 1)))
+    assert results == [10, 20, 30, 20, 10]
+    assert run_many.calls == [[1, 2, 3]]
+    stats = batcher.stats()
+    assert (stats["requests"], stats["coalesced"], stats["batches"]) == (5, 2, 1)
+
+
+async def test_max_size_splits_batches():
+    run_many = Recorder()
+    batcher = MicroBatcher(run_many, window_ms=50, max_size=2)
+    assert await asyncio.gather(*(batcher.submit(key) for key in range(5))) == [0, 10, 20, 30, 40]
+    assert sorted(len(call) for call in run_many.calls) == [1, 2, 2]
+
+
+async def test_keys_arriving_during_a_batch_wait_for_the_window():
+    run_many = Recorder(delay=0.02)
+    batcher = MicroBatcher(run_many, window_ms=5)
+    first = asyncio.create_task(batcher.submit(1))
+    await asyncio.sleep(0.005)  # first batch is running
+    second = await asyncio.gather(batcher.submit(2), batcher.submit(3))
+    assert await first == 10 and second == [20, 30]
+    assert run_many.calls == [[1], [2, 3]]
+
+
+async def test_failure_reaches_every_caller():
+    batcher = MicroBatcher(Recorder(fail=True), window_ms=1)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+async def test_a_cancelled_caller_does_not_cancel_the_batch():
+    batcher = MicroBatcher(Recorder(delay=0.02), window_ms=1)
+    impatient = asyncio.create_task(batcher.submit(1))
+    patient = asyncio.create_task(batcher.submit(1))
+    await asyncio.sleep(0.005)
+    impatient.cancel()
+    assert await patient == 10
+    assert not batcher._tasks
+
+
+async def test_every_caller_gets_the_batch_spans():
+    batcher = MicroBatcher(Recorder(), window_ms=1)
+
+    async def timed(key):
+        with metrics.capture_spans() as spans:
+            await batcher.submit(key)
+        return spans
+
+    for spans in await asyncio.gather(timed(1), timed(2)):
+        assert [name for name, _ in spans] == ["batch_work"]
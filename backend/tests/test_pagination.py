@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from starlette.requests import Request
+
+from multi_agent.pagination import decode_cursor, encode_cursor, page_response, paginate, parse_fields
+
+pytestmark = pytest.mark.anyio
+
+
+def _request(headers=()):
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                    "headers": [(k.encode(), v.encode()) for k, v in headers]})
+
+
+def test_cursor_round_trip():
+    doc = {"created_at": datetime(2024, 5, 1, 12, 30, 0, 123000), "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == (doc["created_at"], doc["_id"])
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_parse_fields():
+    assert parse_fields(None, {"name"}) is None
+    assert parse_fields("name, status", {"name", "status"}) == {"name": 1, "status": 1, "created_at": 1}
+    with pytest.raises(ValueError):
+        parse_fields("name,secret", {"name"})
+
+
+async def test_keyset_walk_visits_every_document_once():
+    collection = AsyncMongoMockClient()["test"]["agents"]
+    start = datetime(2024, 1, 1)
+    # Groups of three share a created_at, so pages must break ties on _id
+    await collection.insert_many([{"name": f"a{i}", "created_at": start + timedelta(seconds=i // 3)}
+                                  for i in range(25)])
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        items, cursor = await paginate(collection, {}, limit=4, cursor=cursor)
+        seen += items
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 7
+    assert len({item["id"] for item in seen}) == 25
+    keys = [(item["created_at"], item["id"]) for item in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+async def test_last_full_page_has_no_cursor():
+    collection = AsyncMongoMockClient()["test"]["agents"]
+    await collection.insert_many([{"name": f"a{i}", "created_at": datetime(2024, 1, 1, 0, 0, i)} for i in range(4)])
+    items, cursor = await paginate(collection, {}, limit=4)
+    assert len(items) == 4 and cursor is None
+
+
+def test_page_response_etag():
+    items = [{"id": "1", "created_at": datetime(2024, 1, 1)}]
+    first = page_response(_request(), items, "next")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["x-next-cursor"] == "next"
+
+    cached = page_response(_request([("if-none-match", etag)]), items, "next")
+    assert cached.status_code == 304 and cached.body == b"" and cached.headers["etag"] == etag
+
+    changed = page_response(_request([("if-none-match", etag)]), items + [{"id": "2"}], None)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert "x-next-cursor" not in changed.headers
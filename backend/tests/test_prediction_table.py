@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from prediction_table import PredictionTable
+
+
+def _without_version(result):
+    return {k: v for k, v in result.items() if k != "bundle_version"}
+
+
+def test_table_run_matches_models(optimizer, table_optimizer):
+    for product_id in optimizer.feature_store.sorted_ids.tolist():
+        assert _without_version(table_optimizer.run(product_id)) == _without_version(optimizer.run(product_id))
+
+
+def test_table_run_many_matches_models(optimizer, table_optimizer):
+    ids = optimizer.feature_store.sorted_ids.tolist() + [10**9]
+    assert table_optimizer.run_many(ids) == optimizer.run_many(ids)
+
+
+def test_lookup_and_take():
+    table = PredictionTable([30, 10, 20], [True, False, True], [3.0, 1.0, 2.0], "v")
+    assert table.lookup(10) == (False, 1.0)
+    assert table.lookup(15) is None
+    increasing, price = table.take([30, 10])
+    assert increasing.tolist() == [True, False] and price.tolist() == [3.0, 1.0]
+    assert table.take([10, 40]) is None
+
+
+def test_build_leaves_out_rows_with_missing_numbers(optimizer):
+    bundle = optimizer.bundle
+    matrices = {name: matrix.copy() for name, matrix in bundle.feature_store.matrices.items()}
+    matrices["price"][0, 1] = np.nan
+    frame = bundle.feature_store.frame
+    incomplete = SimpleNamespace(feature_store=SimpleNamespace(frame=frame, matrices=matrices),
+                                 demand_model=bundle.demand_model, price_model=bundle.price_model,
+                                 version=bundle.version)
+    table = PredictionTable.build(incomplete)
+    assert len(table) == len(frame) - 1
+    assert table.lookup(int(frame["Product_ID"].iloc[0])) is None
+    assert table.lookup(int(frame["Product_ID"].iloc[1])) is not None
@@ -0,0 +1,97 @@
+import cProfile
+import os
+import pstats
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+import security
+from profiling import ProfiledRoute, ProfileStore, dump_stats
+from security import RoleCache, TokenCache
+from user_store import users
+from utils import create_access_token
+
+
+def _profile() -> bytes:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    sorted(range(1000), key=lambda n: -n)
+    profiler.disable()
+    return dump_stats(profiler)
+
+
+def test_store_keeps_the_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=2)
+    ids = [f"{n}-0000000{n}" for n in (1, 2, 3)]
+    for profile_id in ids:
+        store.save(profile_id, _profile(), label=profile_id)
+    assert [entry["id"] for entry in store.list()] == ["3-00000003", "2-00000002"]
+    assert store.path("1-00000001") is None
+    assert sorted(os.listdir(tmp_path)) == ["2-00000002.json", "2-00000002.prof",
+                                            "3-00000003.json", "3-00000003.prof"]
+
+
+def test_saved_profile_is_a_pstats_dump(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    profile_id = store.new_id()
+    store.save(profile_id, _profile())
+    assert pstats.Stats(store.path(profile_id)).total_calls > 0
+    assert "function calls" in store.summary(profile_id, limit=5)
+
+
+def test_ids_outside_the_store_are_refused(tmp_path):
+    (tmp_path / "secret.prof").write_bytes(b"")
+    store = ProfileStore(str(tmp_path / "profiles"))
+    for profile_id in ("../secret", "1-abc", "1-0000000g"):
+        assert store.path(profile_id) is None and store.summary(profile_id) is None
+    assert store.list() == []
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "profile_store", ProfileStore(str(tmp_path)))
+    monkeypatch.setattr(security, "token_cache", TokenCache())
+    monkeypatch.setattr(security, "role_cache", RoleCache())
+    monkeypatch.setattr(users, "collection", None)  # no user store: the signed role is trusted
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/work")
+    async def work():
+        return {"total": sum(range(1000))}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.include_router(profiling.router)
+    return TestClient(app)
+
+
+def _auth(role):
+    return {"Authorization": "Bearer " + create_access_token({"sub": f"{role}@b.com", "role": role})}
+
+
+def test_admin_can_profile_a_request_and_fetch_it(app):
+    response = app.get("/work", headers={"X-Profile": "1", **_auth("admin")})
+    profile_id = response.headers["X-Profile-Id"]
+    assert response.json() == {"total": 499500}
+
+    listed = app.get("/admin/profiles/", headers=_auth("admin")).json()["profiles"]
+    assert [(p["id"], p["label"], p["user"]) for p in listed] == [(profile_id, "GET /work", "admin@b.com")]
+    text = app.get(f"/admin/profiles/{profile_id}?format=text", headers=_auth("admin"))
+    assert text.status_code == 200 and "function calls" in text.text
+    assert app.get(f"/admin/profiles/{profile_id}?format=text&sort=bogus", headers=_auth("admin")).status_code == 400
+    assert app.get("/admin/profiles/1-00000000", headers=_auth("admin")).status_code == 404
+
+
+def test_only_admins_may_ask_for_a_profile(app):
+    assert "X-Profile-Id" not in app.get("/work").headers
+    assert app.get("/work?profile=1").status_code == 401
+    assert app.get("/work?profile=1", headers=_auth("user")).status_code == 403
+    assert app.get("/admin/profiles/", headers=_auth("user")).status_code == 403
+
+
+def test_one_request_is_profiled_at_a_time(app):
+    with profiling.profile_session:
+        response = app.get("/work", headers={"X-Profile": "1", **_auth("admin")})
+    assert response.status_code == 200 and "X-Profile-Id" not in response.headers
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from multi_agent.pubsub import LocalPubSub, MongoPubSub, UnixSocketPubSub, create_pubsub
+
+pytestmark = pytest.mark.anyio
+
+
+async def _eventually(check, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not check():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+async def _relay(path):
+    received = []
+    relay = UnixSocketPubSub(str(path))
+    await relay.start(lambda channel, text: received.append((channel, text)))
+    return relay, received
+
+
+def test_backend_is_chosen_by_name():
+    assert type(create_pubsub("unix")) is UnixSocketPubSub
+    assert type(create_pubsub("mongo")) is MongoPubSub
+    assert type(create_pubsub("local")) is LocalPubSub
+
+
+async def test_unix_relay_reaches_every_process(tmp_path):
+    path = tmp_path / "relay.sock"
+    first, first_received = await _relay(path)
+    await _eventually(lambda: first.is_hub)
+    second, second_received = await _relay(path)
+    third, third_received = await _relay(path)
+    try:
+        await _eventually(lambda: len(first._peers) == 2)
+        await second.publish("w1", '{"n": 1}')
+        await first.publish("*", '{"n": 2}')
+        expected = [("w1", '{"n": 1}'), ("*", '{"n": 2}')]
+        for received in (first_received, second_received, third_received):
+            await _eventually(lambda: sorted(received) == sorted(expected))
+    finally:
+        for relay in (first, second, third):
+            await relay.stop()
+
+
+async def test_unix_relay_elects_a_new_hub(tmp_path):
+    path = tmp_path / "relay.sock"
+    hub, _ = await _relay(path)
+    await _eventually(lambda: hub.is_hub)
+    first, first_received = await _relay(path)
+    second, second_received = await _relay(path)
+    try:
+        await _eventually(lambda: len(hub._peers) == 2)
+        await hub.stop()
+        await _eventually(lambda: first.is_hub or second.is_hub)
+        await first.publish("w1", "{}")
+        await _eventually(lambda: second_received == [("w1", "{}")])
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.alive = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.docs:
+            self.alive = False  # like a tailable cursor whose collection was dropped
+            raise StopAsyncIteration
+        return self.docs.pop(0)
+
+
+class FakeEvents:
+    """Capped collection stand-in: every find() replays everything at or after `at`."""
+
+    def __init__(self):
+        self.docs = []
+        self.queries = []
+
+    def find(self, query, **kwargs):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if doc["at"] >= query["at"]["$gte"]])
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc, _id=len(self.docs)))
+
+
+async def test_mongo_relay_delivers_other_processes_events_once():
+    at = datetime(2026, 1, 1)
+    received = []
+    relay = MongoPubSub()
+    relay.deliver = lambda channel, text: received.append(text)
+    relay.collection = FakeEvents()
+    await relay.publish("w1", "mine")
+    relay.collection.docs[0]["at"] = at  # all three events share a timestamp
+    relay.collection.docs += [{"_id": "a", "channel": "w1", "text": "a", "origin": "other", "at": at},
+                              {"_id": "b", "channel": "w1", "text": "b", "origin": "other", "at": at}]
+
+    tail = asyncio.create_task(relay._tail(at))
+    await _eventually(lambda: len(relay.collection.queries) >= 2)  # the cursor was reopened
+    tail.cancel()
+    await asyncio.gather(tail, return_exceptions=True)
+    assert received == ["mine", "a", "b"]
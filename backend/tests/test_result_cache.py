@@ -0,0 +1,93 @@
+import copy
+
+from result_cache import ResultCache, file_fingerprint
+
+
+class DictBackend:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def clear(self):
+        self.values.clear()
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2, ttl=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("result_cache.time.monotonic", lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.set("a", 1)
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_callers_get_their_own_copy():
+    cache = ResultCache()
+    value = {"summary": {"price": 1.0}}
+    cache.set("a", value)
+    value["summary"]["price"] = 2.0
+    cache.get("a")["summary"]["price"] = 3.0
+    assert cache.get("a") == {"summary": {"price": 1.0}}
+
+
+def test_shared_backend_fills_local_misses_and_is_cleared():
+    backend = DictBackend()
+    ResultCache(backend=backend).set("a", 1)
+    other = ResultCache(backend=backend)
+    assert other.get("a") == 1 and other.get("a") == 1
+    assert (other.shared_hits, other.hits) == (1, 1)
+    other.invalidate()
+    assert other.get("a") is None and backend.values == {}
+
+
+def test_backend_errors_fall_back_to_a_miss():
+    class Broken(DictBackend):
+        def get(self, key):
+            raise ConnectionError("down")
+
+    cache = ResultCache(backend=Broken())
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+
+def test_file_fingerprint_changes_when_a_file_is_replaced(tmp_path):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(b"one")
+    before = file_fingerprint([str(path)])
+    path.write_bytes(b"three")
+    assert file_fingerprint([str(path)]) != before
+    assert file_fingerprint([str(tmp_path / "missing")]) != before
+
+
+def test_run_is_cached_per_bundle_version(optimizer, monkeypatch):
+    monkeypatch.setattr(optimizer, "result_cache", ResultCache())
+    product_id = optimizer.feature_store.sorted_ids[0]
+    first = optimizer.run(product_id)
+    assert optimizer.run(product_id) == first
+    assert optimizer.result_cache.hits == 1
+
+    retrained = copy.copy(optimizer.bundle)
+    retrained.model_fingerprint = "retrained"
+    with optimizer.pinned_bundle(retrained):
+        key = optimizer.cache_key(product_id)
+        optimizer._run(product_id)
+    assert key != optimizer.cache_key(product_id)
+    assert optimizer.result_cache.misses == 2
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from multi_agent.models import Agent, AgentStatus
+from multi_agent.scheduler import AgentPool, NoMatchingAgent
+
+pytestmark = pytest.mark.anyio
+
+
+async def _agents(count, agent_type="analyzer"):
+    return [await Agent(name=f"a{i}", agent_type=agent_type).create() for i in range(count)]
+
+
+async def _pool(**kwargs):
+    pool = AgentPool(flush_interval=0.05, **kwargs)
+    await pool.refresh()
+    return pool
+
+
+async def test_least_loaded_agent_and_fifo_hand_off(mongo):
+    await _agents(2)
+    pool = await _pool()
+    first = await pool.acquire("t1", agent_type="analyzer")
+    second = await pool.acquire("t2", agent_type="analyzer")
+    assert first.id != second.id
+
+    waiter = asyncio.create_task(pool.acquire("t3", agent_type="analyzer"))
+    await asyncio.sleep(0.01)
+    assert not waiter.done() and pool.stats()["queued"] == 1
+    pool.release(first)
+    assert (await waiter).id == first.id
+
+
+async def test_no_matching_agent(mongo):
+    await _agents(1)
+    pool = await _pool()
+    with pytest.raises(NoMatchingAgent):
+        await pool.acquire("t1", agent_type="coordinator")
+
+
+async def test_offline_agent_fails_waiters(mongo):
+    await _agents(1)
+    pool = await _pool()
+    agent = await pool.acquire("t1", agent_type="analyzer")
+    waiter = asyncio.create_task(pool.acquire("t2", agent_type="analyzer"))
+    await asyncio.sleep(0.01)
+    pool.release(agent, AgentStatus.OFFLINE)
+    with pytest.raises(NoMatchingAgent):
+        await waiter
+
+
+async def test_claim_is_reused_without_a_round_trip(mongo):
+    [agent] = await _agents(1)
+    pool = await _pool()
+    for task_id in ("t1", "t2", "t3"):
+        pool.release(await pool.acquire(task_id, agent_type="analyzer"))
+    assert pool.stats()["claims"] == {"round_trips": 1, "reused": 2, "conflicts": 0}
+    doc = await Agent.get_motor_collection().find_one({"_id": agent.id})
+    assert doc["claimed_by"] == pool.owner
+
+
+async def test_another_process_cannot_take_a_claimed_agent(mongo):
+    await _agents(1)
+    owner, other = await _pool(claim_ttl=0.3), await _pool()
+    await owner.acquire("t1", agent_type="analyzer")
+    for _ in range(6):  # the flush loop keeps renewing past the TTL
+        await owner.flush()
+        await asyncio.sleep(0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(other.acquire("t2", agent_type="analyzer"), 0.2)
+    assert other.stats()["claims"]["conflicts"] >= 1
+
+
+async def test_claim_of_a_dead_process_lapses(mongo):
+    [agent] = await _agents(1)
+    dead, other = await _pool(claim_ttl=0.1), await _pool()
+    await dead.acquire("t1", agent_type="analyzer")  # never renewed or released
+    claimed = await asyncio.wait_for(other.acquire("t2", agent_type="analyzer"), 2)
+    assert claimed.id == agent.id
+    doc = await Agent.get_motor_collection().find_one({"_id": agent.id})
+    assert (doc["claimed_by"], doc["current_task_id"]) == (other.owner, "t2")
+
+
+async def test_lingering_claim_is_given_up(mongo):
+    await _agents(1)
+    pool = await _pool(claim_linger=0.05)
+    agent = await pool.acquire("t1", agent_type="analyzer")
+    pool.release(agent)
+    assert pool._drop_lingering_claims()  # still lingering
+    await asyncio.sleep(0.06)
+    assert pool._drop_lingering_claims() == []
+    assert pool._dirty[str(agent.id)]["claimed_by"] is None
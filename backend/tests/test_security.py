@@ -0,0 +1,123 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import security
+from security import RoleCache, TokenCache, current_user, decode_token, require_role
+from user_store import users
+from utils import ALGORITHM, SECRET_KEY, create_access_token
+
+pytestmark = pytest.mark.anyio
+
+
+def _credentials(email="a@b.com", role="user"):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": email, "role": role}))
+
+
+@pytest.fixture
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(security, "token_cache", TokenCache())
+    monkeypatch.setattr(security, "role_cache", RoleCache())
+
+
+@pytest.fixture
+def user_store(monkeypatch):
+    """The shared user repository bound to an empty in-memory database."""
+    monkeypatch.setattr(users, "collection", AsyncMongoMockClient()["test"]["users"])
+    return users
+
+
+def test_token_cache_is_a_bounded_lru_honouring_exp():
+    cache = TokenCache(maxsize=2)
+    cache.set("a", {"sub": "a"})
+    cache.set("b", {"sub": "b"})
+    assert cache.get("a") == {"sub": "a"}  # a is now most recent
+    cache.set("c", {"sub": "c"})
+    assert cache.get("b") is None and cache.get("a") is not None
+    cache.set("old", {"sub": "old", "exp": time.time() - 1})
+    assert cache.get("old") is None
+
+
+def test_role_cache_expires_and_is_bounded():
+    cache = RoleCache(ttl=0.05, maxsize=2)
+    for email in ("a", "b", "c"):
+        cache.set(email, "user")
+    assert cache.get("a") is None and cache.get("c") == "user"
+    time.sleep(0.06)
+    assert cache.get("c") is None
+
+
+def test_decode_token_caches_and_rejects_bad_tokens(fresh_caches):
+    token = create_access_token({"sub": "a@b.com"})
+    assert decode_token(token)["sub"] == "a@b.com"
+    assert security.token_cache.get(token)["sub"] == "a@b.com"
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_token(jwt.encode({"sub": "a@b.com"}, "wrong-key", algorithm=ALGORITHM))
+
+
+async def test_anonymous_access_follows_auth_required(monkeypatch):
+    monkeypatch.setattr(security, "AUTH_REQUIRED", False)
+    assert await current_user(None) is None
+    monkeypatch.setattr(security, "AUTH_REQUIRED", True)
+    with pytest.raises(HTTPException) as error:
+        await current_user(None)
+    assert error.value.status_code == 401
+
+
+async def test_invalid_and_subjectless_tokens_are_rejected(fresh_caches):
+    bad = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-jwt")
+    nosub = HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt.encode(
+        {"exp": time.time() + 60}, SECRET_KEY, algorithm=ALGORITHM))
+    for credentials in (bad, nosub):
+        with pytest.raises(HTTPException) as error:
+            await current_user(credentials)
+        assert error.value.status_code == 401
+
+
+async def test_role_comes_from_the_user_store_and_is_cached(fresh_caches, user_store):
+    await user_store.insert({"email": "a@b.com", "role": "admin"})
+    # The stored role wins over the one claimed in the token
+    assert await current_user(_credentials(role="user")) == {"email": "a@b.com", "role": "admin"}
+    await user_store.collection.update_one({"email": "a@b.com"}, {"$set": {"role": "user"}})
+    assert (await current_user(_credentials()))["role"] == "admin"  # cached until ROLE_CACHE_TTL
+    with pytest.raises(HTTPException) as error:
+        await current_user(_credentials(email="ghost@b.com"))
+    assert error.value.status_code == 401
+
+
+async def test_require_role(fresh_caches, user_store):
+    await user_store.insert({"email": "admin@b.com", "role": "admin"})
+    await user_store.insert({"email": "user@b.com", "role": "user"})
+    admin_only = require_role("admin")
+    assert (await admin_only(_credentials("admin@b.com")))["email"] == "admin@b.com"
+    for credentials, status in ((None, 401), (_credentials("user@b.com"), 403)):
+        with pytest.raises(HTTPException) as error:
+            await admin_only(credentials)
+        assert error.value.status_code == status
+
+
+def test_operational_endpoints_need_an_admin(workspace, fresh_caches, monkeypatch):
+    import main
+
+    monkeypatch.setattr(users, "collection", None)  # no user store: the signed role is trusted
+    client = TestClient(main.app)
+    user = {"Authorization": "Bearer " + _credentials(role="user").credentials}
+    admin = {"Authorization": "Bearer " + _credentials(role="admin").credentials}
+    for path in ("/metrics", "/analyze/stats"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=user).status_code == 403
+        assert client.get(path, headers=admin).status_code == 200
+
+
+def test_server_data_routes_honour_auth_required(workspace, monkeypatch):
+    import server
+
+    monkeypatch.setattr(security, "AUTH_REQUIRED", True)
+    client = TestClient(server.app)
+    assert client.post("/analyze", json={"product_id": 1000}).status_code == 401
+    assert client.get("/inventory/reorder-report").status_code == 401
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from multi_agent.models import Agent, Task, Workflow
+from multi_agent.scheduler import AgentPool
+from multi_agent.task_queue import TaskQueue, TaskWorker
+
+pytestmark = pytest.mark.anyio
+
+
+async def _workflow(*tasks):
+    """A workflow with tasks given as (name, dependencies) pairs; returns (workflow, {name: task})."""
+    workflow = await Workflow(name="w", description="d", goal="g").create()
+    created = {}
+    for name, dependencies in tasks:
+        created[name] = await Task(workflow_id=str(workflow.id), agent_type="analyzer", name=name,
+                                   description="", dependencies=dependencies).create()
+    return workflow, created
+
+
+async def _statuses(workflow):
+    tasks = await Task.find(Task.workflow_id == str(workflow.id)).to_list()
+    return {task.name: task.status for task in tasks}
+
+
+async def _workflow_status(workflow):
+    return (await Workflow.get(workflow.id)).status
+
+
+async def test_start_queues_roots_once(mongo):
+    queue = TaskQueue()
+    workflow, _ = await _workflow(("root", []), ("child", ["root"]))
+    assert await queue.start_workflow(workflow)
+    assert not await queue.start_workflow(workflow)
+    assert await _statuses(workflow) == {"root": "queued", "child": "pending"}
+
+
+async def test_claim_leases_and_complete_advances(mongo):
+    queue = TaskQueue(lease_seconds=30)
+    workflow, _ = await _workflow(("root", []), ("child", ["root"]))
+    await queue.start_workflow(workflow)
+
+    task = await queue.claim("w1")
+    assert (task.name, task.status, task.lease_owner, task.attempts) == ("root", "running", "w1", 1)
+    assert task.lease_expires_at > datetime.utcnow()
+    assert await queue.claim("w2") is None  # child is still pending
+    assert await queue.renew(task, "w1")
+    assert not await queue.renew(task, "w2")
+
+    assert await queue.complete(task, "w1", {"ok": True})
+    assert await _statuses(workflow) == {"root": "completed", "child": "queued"}
+
+    child = await queue.claim("w2")
+    assert await queue.complete(child, "w2", {})
+    assert await _workflow_status(workflow) == "completed"
+
+
+async def test_expired_lease_is_claimed_again(mongo):
+    queue = TaskQueue(lease_seconds=30)
+    workflow, _ = await _workflow(("root", []))
+    await queue.start_workflow(workflow)
+    stale = await queue.claim("dead-worker")
+    await Task.get_motor_collection().update_one(
+        {"_id": stale.id}, {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+    task = await queue.claim("w2")
+    assert (task.id, task.lease_owner, task.attempts) == (stale.id, "w2", 2)
+    assert not await queue.complete(stale, "dead-worker", {})  # lost its lease
+    assert await queue.complete(task, "w2", {})
+
+
+async def test_fail_retries_then_skips_dependents(mongo):
+    queue = TaskQueue(max_attempts=2)
+    workflow, _ = await _workflow(("root", []), ("child", ["root"]))
+    await queue.start_workflow(workflow)
+
+    task = await queue.claim("w1")
+    assert await queue.fail(task, "w1", "flaky")
+    assert (await _statuses(workflow))["root"] == "queued"
+
+    task = await queue.claim("w1")
+    assert task.attempts == 2
+    assert await queue.fail(task, "w1", "broken")
+    assert await _statuses(workflow) == {"root": "failed", "child": "skipped"}
+    assert await _workflow_status(workflow) == "failed"
+
+
+async def test_fail_without_retry_is_final(mongo):
+    queue = TaskQueue(max_attempts=3)
+    workflow, _ = await _workflow(("root", []))
+    await queue.start_workflow(workflow)
+    task = await queue.claim("w1")
+    assert await queue.fail(task, "w1", "no agent", retry=False)
+    assert await _statuses(workflow) == {"root": "failed"}
+
+
+async def test_empty_workflow_completes_on_start(mongo):
+    workflow, _ = await _workflow()
+    assert await TaskQueue().start_workflow(workflow)
+    assert await _workflow_status(workflow) == "completed"
+
+
+async def test_unknown_dependency_fails_task(mongo):
+    queue = TaskQueue()
+    workflow, _ = await _workflow(("root", []))
+    await queue.start_workflow(workflow)
+    await Task(workflow_id=str(workflow.id), agent_type="analyzer", name="late", description="",
+               dependencies=["missing"]).create()
+
+    task = await queue.claim("w1")
+    assert await queue.complete(task, "w1", {})
+    late = await Task.find_one(Task.name == "late")
+    assert late.status == "failed" and "missing" in late.output_data["error"]
+    assert await _workflow_status(workflow) == "failed"
+
+
+class SlowService:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def execute_task(self, agent, task):
+        self.started.set()
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"ok": True}
+
+
+async def _worker(queue, service):
+    await Agent(name="a", agent_type="analyzer").create()
+    pool = AgentPool()
+    await pool.refresh()
+    return TaskWorker(queue=queue, poll_interval=0.01, service=service, pool=pool)
+
+
+async def test_worker_retries_failed_renewals(mongo):
+    queue = TaskQueue(lease_seconds=0.3)
+    workflow, _ = await _workflow(("root", []))
+    await queue.start_workflow(workflow)
+    worker = await _worker(queue, SlowService(0.5))
+    renew, failures = queue.renew, []
+
+    async def flaky_renew(task, worker_id):
+        if not failures:
+            failures.append(1)
+            raise ConnectionError("timeout")
+        return await renew(task, worker_id)
+
+    queue.renew = flaky_renew
+    await worker._process(await queue.claim(worker.worker_id))
+    assert failures and worker.processed == 1
+    assert await _statuses(workflow) == {"root": "completed"}
+
+
+async def test_worker_stops_task_when_lease_is_lost(mongo):
+    queue = TaskQueue(lease_seconds=0.15)
+    workflow, _ = await _workflow(("root", []))
+    await queue.start_workflow(workflow)
+    service = SlowService(5)
+    worker = await _worker(queue, service)
+    task = await queue.claim(worker.worker_id)
+    job = asyncio.create_task(worker._process(task))
+    await service.started.wait()
+    await Task.get_motor_collection().update_one({"_id": task.id}, {"$set": {"lease_owner": "other"}})
+
+    await asyncio.wait_for(job, 2)
+    assert service.cancelled and worker.processed == 0
+    assert worker.pool.stats()["busy"] == 0
+    assert await _statuses(workflow) == {"root": "running"}
@@ -0,0 +1,24 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from user_store import UserRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_duplicate_emails_block_the_unique_index():
+    repository = UserRepository()
+    repository.bind(AsyncMongoMockClient()["test"])
+    await repository.collection.insert_many([{"email": "a@b.com"}, {"email": "a@b.com"}, {"email": "c@d.com"}])
+    assert await repository.duplicate_emails() == ["a@b.com"]
+    with pytest.raises(Exception):
+        await repository.ensure_indexes()
+
+
+async def test_unique_index_rejects_second_signup():
+    repository = UserRepository()
+    repository.bind(AsyncMongoMockClient()["test"])
+    await repository.ensure_indexes()
+    assert await repository.insert({"email": "a@b.com"})
+    assert not await repository.insert({"email": "a@b.com"})
+    assert await repository.duplicate_emails() == []
@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from multi_agent import websocket
+from multi_agent.pubsub import LocalPubSub
+from multi_agent.websocket import ConnectionManager
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSocket:
+    """Records what was sent; `stuck` holds every send, like a client that stopped reading."""
+
+    def __init__(self, stuck=False):
+        self.sent = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        if not stuck:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_message_reaches_every_subscriber_of_the_workflow():
+    manager = ConnectionManager(LocalPubSub())
+    a, b, other = FakeSocket(), FakeSocket(), FakeSocket()
+    await manager.connect(a, "w1")
+    await manager.connect(b, "w1")
+    await manager.connect(other, "w2")
+    await manager.send_to_workflow("w1", {"type": "task_completed"})
+    await manager.send_to_all({"type": "shutdown"})
+    await _settle()
+    assert [m["type"] for m in a.sent] == [m["type"] for m in b.sent] == ["connected", "task_completed", "shutdown"]
+    assert [m["type"] for m in other.sent] == ["connected", "shutdown"]
+
+
+async def test_slow_client_loses_its_oldest_messages(monkeypatch):
+    monkeypatch.setattr(websocket, "WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+    monkeypatch.setattr(websocket, "Outbox", functools.partial(websocket.Outbox, maxsize=2))
+    manager = ConnectionManager(LocalPubSub())
+    slow = FakeSocket(stuck=True)
+    await manager.connect(slow, "w1")
+    await _settle()  # the slow sender is now stuck on "connected"
+    for n in range(5):
+        await manager.send_to_workflow("w1", {"type": "progress", "n": n})
+    slow.gate.set()
+    await _settle()
+    assert [m.get("n") for m in slow.sent] == [None, 3, 4]
+    assert manager.stats()["dropped_messages"] == 3
+
+
+async def test_slow_client_is_disconnected(monkeypatch):
+    monkeypatch.setattr(websocket, "WS_SLOW_CONSUMER_POLICY", "disconnect")
+    monkeypatch.setattr(websocket, "Outbox", functools.partial(websocket.Outbox, maxsize=1))
+    manager = ConnectionManager(LocalPubSub())
+    slow = FakeSocket(stuck=True)
+    await manager.connect(slow, "w1")
+    await _settle()
+    await manager.send_to_workflow("w1", {"type": "progress"})
+    await manager.send_to_workflow("w1", {"type": "progress"})
+    await _settle()
+    assert slow.closed_with == 1013
+    assert manager.stats()["connections"] == 0 and manager.slow_disconnects == 1
+
+
+async def test_failed_send_unregisters_the_connection():
+    class Gone(FakeSocket):
+        async def send_text(self, text):
+            raise WebSocketDisconnect()
+
+    manager = ConnectionManager(LocalPubSub())
+    await manager.connect(Gone(), "w1")
+    await _settle()
+    assert manager.active_connections == {} and manager.stats()["connections"] == 0
@@ -0,0 +1,46 @@
+from pymongo.errors import DuplicateKeyError
+
+
+class UserRepository:
+    """Async access to the users collection over the app's shared Motor client.
+
+    Bound to a database at startup (see main.py); `email` has a unique
+    index, so lookups by email are index hits and duplicate signups fail
+    atomically.
+    """
+
+    def __init__(self, collection_name="users"):
+        self.collection_name = collection_name
+        self.collection = None
+
+    def bind(self, database):
+        self.collection = database[self.collection_name]
+
+    def _users(self):
+        if self.collection is None:
+            raise RuntimeError("User store is not connected")
+        return self.collection
+
+    async def ensure_indexes(self):
+        await self._users().create_index("email", unique=True)
+
+    async def duplicate_emails(self, limit=20):
+        """Emails registered more than once, which block the unique index."""
+        pipeline = [{"$group": {"_id": "$email", "count": {"$sum": 1}}},
+                    {"$match": {"count": {"$gt": 1}}},
+                    {"$limit": limit}]
+        return [doc["_id"] async for doc in self._users().aggregate(pipeline)]
+
+    async def find_by_email(self, email: str, projection=None):
+        return await self._users().find_one({"email": email}, projection)
+
+    async def insert(self, user: dict) -> bool:
+        """Insert a new user; False if the email is already registered."""
+        try:
+            await self._users().insert_one(user)
+        except DuplicateKeyError:
+            return False
+        return True
+
+
+users = UserRepository()
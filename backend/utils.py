@@ -1,4 +1,6 @@
 import jwt, os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from passlib.hash import bcrypt
@@ -8,6 +10,18 @@ SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = os.getenv("JWT_ALGORITHM")
 EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", 60))
 
+# bcrypt is deliberately slow; it gets its own small pool so hashing can't
+# starve the default threadpool, and a cap on waiting calls.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 1))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", 256))
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_pending = 0
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already waiting."""
+
+
 def create_access_token(data: dict):
     expire = datetime.utcnow() + timedelta(minutes=EXPIRE_MINUTES)
     data.update({"exp": expire})
@@ -18,3 +32,19 @@ def verify_password(password: str, hashed: str):
 
 def hash_password(password: str):
     return bcrypt.hash(password)
+
+async def _run_bcrypt(fn, *args):
+    global _bcrypt_pending
+    if _bcrypt_pending >= BCRYPT_WORKERS + BCRYPT_MAX_PENDING:
+        raise PasswordHasherBusy("Too many concurrent password checks")
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, fn, *args)
+    finally:
+        _bcrypt_pending -= 1
+
+async def verify_password_async(password: str, hashed: str):
+    return await _run_bcrypt(verify_password, password, hashed)
+
+async def hash_password_async(password: str):
+    return await _run_bcrypt(hash_password, password)